@@ -0,0 +1,452 @@
+from __future__ import annotations
+
+import asyncio
+import bisect
+import secrets
+import threading
+import zlib
+from typing import Any
+
+from fastapi import HTTPException, WebSocket
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from .config import WORKER_COUNT, WORKER_INDEX
+from .db import get_session
+from .metrics import competition_score_updates, registry
+from .models import CompetitionParticipant, CompetitionRoom
+
+# Broadcast at most once per tick, however many score updates arrive in between
+BROADCAST_INTERVAL_SECONDS = 0.25
+# Dirty participant scores are written back to competition_participants this often
+PERSIST_INTERVAL_SECONDS = 2.0
+PERSIST_BATCH_SIZE = 500
+
+JOIN_CODE_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"  # no 0/O or 1/I lookalikes
+JOIN_CODE_LENGTH = 6
+# CompetitionRoom columns mirrored in RoomState that admins can change
+SETTINGS_FIELDS = ("name", "join_code", "game_time", "difficulty", "is_active", "started_at")
+
+
+def generate_join_code() -> str:
+    return "".join(secrets.choice(JOIN_CODE_ALPHABET) for _ in range(JOIN_CODE_LENGTH))
+
+
+def room_worker(room_id: int) -> int:
+    """Index of the worker process that owns ``room_id``'s in-memory state.
+
+    The same function as nginx's ``hash $room_id`` (non-consistent, the
+    Cache::Memcached scheme), so the proxy config written by
+    run_workers.py sends each room's requests to its owner.
+    """
+    if WORKER_COUNT <= 1:
+        return 0
+    return ((zlib.crc32(str(room_id).encode()) >> 16) & 0x7FFF) % WORKER_COUNT
+
+
+def require_room_owner(room_id: int) -> None:
+    """Answer 421 (with the owner in X-Room-Worker) unless this worker serves the room."""
+    owner = room_worker(room_id)
+    if owner != WORKER_INDEX:
+        raise HTTPException(status_code=421, detail="Room is served by another worker", headers={"X-Room-Worker": str(owner)})
+
+
+class ParticipantState:
+    __slots__ = ("id", "user_id", "user_name", "score", "is_connected")
+
+    def __init__(self, id: int, user_id: int, user_name: str, score: int, is_connected: bool) -> None:
+        self.id = id
+        self.user_id = user_id
+        self.user_name = user_name
+        self.score = score
+        self.is_connected = is_connected
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"id": self.id, "user_name": self.user_name, "score": self.score, "is_connected": self.is_connected}
+
+
+class RoomState:
+    """Authoritative in-memory state of one competition room.
+
+    Participants are indexed by user id and ranked in a list kept sorted by
+    (-score, participant id), so a score change is a binary search to drop
+    the old key plus an insort of the new one, and the leaderboard is
+    already in order when it is read.
+    """
+
+    def __init__(self, room: CompetitionRoom, participants: list[CompetitionParticipant]) -> None:
+        self.id = room.id
+        self.name = room.name
+        self.join_code = room.join_code
+        self.game_time = room.game_time
+        self.difficulty = room.difficulty
+        self.is_active = room.is_active
+        self.started_at = room.started_at
+        self.lock = threading.Lock()
+        self.join_lock = threading.Lock()
+        self._by_user: dict[int, ParticipantState] = {}
+        self._ranking: list[tuple[int, int]] = []
+        self._by_id: dict[int, ParticipantState] = {}
+        self._unsaved: set[int] = set()
+        for p in participants:
+            self._add(ParticipantState(p.id, p.user_id, p.user_name, p.score, p.is_connected))
+
+    def _add(self, participant: ParticipantState) -> None:
+        self._by_user[participant.user_id] = participant
+        self._by_id[participant.id] = participant
+        bisect.insort(self._ranking, (-participant.score, participant.id))
+
+    def room_dict(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "join_code": self.join_code,
+            "game_time": self.game_time,
+            "difficulty": self.difficulty,
+            "is_active": self.is_active,
+        }
+
+    def apply_settings(self, settings: dict[str, Any]) -> None:
+        with self.lock:
+            for field, value in settings.items():
+                setattr(self, field, value)
+
+    @property
+    def word_seed(self) -> int:
+        """Seed of the current game's word stream; every start of the room draws a new one."""
+        started = self.started_at.isoformat() if self.started_at else ""
+        return zlib.crc32(f"{self.id}:{self.join_code}:{started}".encode())
+
+    def participant(self, user_id: int) -> ParticipantState | None:
+        return self._by_user.get(user_id)
+
+    def add_participant(self, participant: ParticipantState) -> None:
+        with self.lock:
+            existing = self._by_user.get(participant.user_id)
+            if existing is not None:
+                existing.is_connected = True
+                self._unsaved.add(existing.id)
+                return
+            self._add(participant)
+
+    def set_score(self, user_id: int, score: int) -> bool:
+        with self.lock:
+            participant = self._by_user.get(user_id)
+            if participant is None:
+                return False
+            if participant.score != score:
+                old_key = (-participant.score, participant.id)
+                del self._ranking[bisect.bisect_left(self._ranking, old_key)]
+                participant.score = score
+                bisect.insort(self._ranking, (-score, participant.id))
+                self._unsaved.add(participant.id)
+            return True
+
+    def leaderboard(self, include_user_id: bool = False) -> list[dict[str, Any]]:
+        with self.lock:
+            rows = []
+            for _, participant_id in self._ranking:
+                participant = self._by_id[participant_id]
+                row = participant.as_dict()
+                if include_user_id:
+                    row["user_id"] = participant.user_id
+                rows.append(row)
+            return rows
+
+    def snapshot(self) -> dict[str, Any]:
+        return {"room": self.room_dict(), "participants": self.leaderboard()}
+
+    def take_unsaved(self) -> list[dict[str, Any]]:
+        with self.lock:
+            rows = [
+                {"id": pid, "score": self._by_id[pid].score, "is_connected": self._by_id[pid].is_connected}
+                for pid in self._unsaved
+            ]
+            self._unsaved.clear()
+            return rows
+
+    def restore_unsaved(self, participant_ids: list[int]) -> None:
+        with self.lock:
+            self._unsaved.update(participant_ids)
+
+
+class CompetitionEngine:
+    """Owns the RoomState of every room this process serves.
+
+    Rooms are loaded from the database on first use. Score updates only
+    touch memory; a background thread writes changed participants back in
+    batches every PERSIST_INTERVAL_SECONDS, and ``persist`` can be called
+    to write a room through immediately (on stop and at shutdown).
+
+    Each room has its own locks, so rooms never contend with each other.
+    With APP_WORKER_COUNT > 1 (processes started by run_workers.py behind
+    the nginx config it writes) every room belongs to exactly one worker
+    (see ``room_worker``), and the proxy sends the room's traffic there.
+    A request that reaches another worker anyway gets a 421 with an
+    X-Room-Worker header instead of being served from stale state. That
+    includes the admin routes that change a room (settings, start, stop,
+    delete): only the owner's in-memory state would see the change.
+    """
+
+    def __init__(self) -> None:
+        self._rooms: dict[int, RoomState] = {}
+        self._lock = threading.Lock()
+        self._persist_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def room(self, room_id: int) -> RoomState:
+        state = self._rooms.get(room_id)
+        if state is not None:
+            return state
+        require_room_owner(room_id)
+        # Load without the engine lock so a cold room never stalls the others; if two
+        # requests race here, the first state stored wins and the other load is discarded
+        with get_session() as session:
+            room = session.get(CompetitionRoom, room_id)
+            if not room:
+                raise HTTPException(status_code=404, detail="Room not found")
+            participants = session.execute(
+                select(CompetitionParticipant).where(CompetitionParticipant.room_id == room_id)
+            ).scalars().all()
+            loaded = RoomState(room, participants)
+        with self._lock:
+            state = self._rooms.setdefault(room_id, loaded)
+            self._ensure_persister()
+        return state
+
+    def join(self, room_id: int, user_id: int, user_name: str) -> RoomState:
+        state = self.room(room_id)
+        with state.join_lock:
+            existing = state.participant(user_id)
+            if existing is None:
+                with get_session() as session:
+                    participant = CompetitionParticipant(room_id=room_id, user_id=user_id, user_name=user_name, score=0, is_connected=True)
+                    session.add(participant)
+                    session.flush()
+                    state.add_participant(ParticipantState(participant.id, user_id, user_name, 0, True))
+            else:
+                state.add_participant(existing)
+        leaderboard_hub.mark_dirty(room_id)
+        return state
+
+    def update_score(self, room_id: int, user_id: int, score: int) -> None:
+        state = self.room(room_id)
+        if not state.is_active:
+            raise HTTPException(status_code=400, detail="No active competition")
+        if not state.set_score(user_id, score):
+            raise HTTPException(status_code=404, detail="Participant not found")
+        competition_score_updates.inc()
+        leaderboard_hub.mark_dirty(room_id)
+
+    def apply_settings_after_commit(self, session: Session, room: CompetitionRoom) -> None:
+        """Copy ``room``'s settings into its in-memory state once ``session`` commits.
+
+        Applied any earlier, a failed commit would leave the live room (and
+        what the ticker broadcasts) out of step with the database.
+        """
+        settings = {field: getattr(room, field) for field in SETTINGS_FIELDS}
+        session.info.setdefault("room_settings", {})[room.id] = settings
+
+    def apply_settings(self, room_id: int, settings: dict[str, Any]) -> None:
+        state = self._rooms.get(room_id)
+        if state is not None:
+            state.apply_settings(settings)
+        leaderboard_hub.mark_dirty(room_id)
+
+    def drop(self, room_id: int) -> None:
+        """Forget a room's in-memory state (after it was deleted)."""
+        with self._lock:
+            self._rooms.pop(room_id, None)
+        leaderboard_hub.mark_dirty(room_id)
+
+    def loaded_rooms(self) -> list[int]:
+        return list(self._rooms)
+
+    def loaded_room(self, room_id: int) -> RoomState | None:
+        return self._rooms.get(room_id)
+
+    def participant_count(self) -> int:
+        return sum(len(state._by_user) for state in list(self._rooms.values()))
+
+    def persist(self, room_id: int | None = None, session: Session | None = None) -> int:
+        """Write unsaved participant changes to the database; returns rows written.
+
+        Pass the caller's ``session`` when it already holds SQLite's write
+        lock (e.g. inside a request that just updated the room), otherwise a
+        separate session would wait on that lock.
+        """
+        if room_id is None:
+            rooms = list(self._rooms.values())
+        else:
+            rooms = [self._rooms[room_id]] if room_id in self._rooms else []
+        written = 0
+        with self._persist_lock:
+            for state in rooms:
+                rows = state.take_unsaved()
+                if not rows:
+                    continue
+                try:
+                    if session is not None:
+                        self._write_rows(session, rows)
+                    else:
+                        with get_session() as own_session:
+                            self._write_rows(own_session, rows)
+                except Exception:
+                    # Keep the changes queued for the next attempt
+                    state.restore_unsaved([row["id"] for row in rows])
+                    raise
+                written += len(rows)
+        return written
+
+    @staticmethod
+    def _write_rows(session: Session, rows: list[dict[str, Any]]) -> None:
+        for start in range(0, len(rows), PERSIST_BATCH_SIZE):
+            session.execute(update(CompetitionParticipant), rows[start:start + PERSIST_BATCH_SIZE])
+
+    def _ensure_persister(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._persist_loop, name="competition-persist", daemon=True)
+            self._thread.start()
+
+    def _persist_loop(self) -> None:
+        while not self._stop.wait(PERSIST_INTERVAL_SECONDS):
+            try:
+                self.persist()
+            except Exception:
+                # Keep the loop alive; unsaved rows were re-queued and are retried next tick
+                pass
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        self.persist()
+
+
+def diff_snapshots(old: dict[str, Any], new: dict[str, Any]) -> dict[str, Any] | None:
+    """Leaderboard delta between two snapshots, or None when nothing changed."""
+    message: dict[str, Any] = {"type": "diff"}
+    if old["room"] != new["room"]:
+        message["room"] = new["room"]
+    old_rows = {p["id"]: p for p in old["participants"]}
+    new_rows = {p["id"]: p for p in new["participants"]}
+    upsert = [p for pid, p in new_rows.items() if old_rows.get(pid) != p]
+    remove = [pid for pid in old_rows if pid not in new_rows]
+    if upsert:
+        message["upsert"] = upsert
+    if remove:
+        message["remove"] = remove
+    return message if len(message) > 1 else None
+
+
+class LeaderboardHub:
+    """Pushes leaderboard and room-state changes to WebSocket subscribers.
+
+    Request handlers (running in the threadpool) only call ``mark_dirty``.
+    A single ticker task on the event loop snapshots each dirty room once
+    per tick from the in-memory RoomState and sends the same diff to every
+    subscriber, so broadcast cost does not grow with the update rate.
+    """
+
+    def __init__(self) -> None:
+        self._subscribers: dict[int, set[WebSocket]] = {}
+        self._snapshots: dict[int, dict[str, Any]] = {}
+        self._dirty: set[int] = set()
+        self._lock = threading.Lock()
+        self._ticker: asyncio.Task | None = None
+
+    def mark_dirty(self, room_id: int) -> None:
+        with self._lock:
+            self._dirty.add(room_id)
+
+    async def subscribe(self, room_id: int, websocket: WebSocket) -> None:
+        snapshot = self._snapshots.get(room_id)
+        if snapshot is None:
+            snapshot = competition_engine.room(room_id).snapshot()
+            self._snapshots[room_id] = snapshot
+        self._subscribers.setdefault(room_id, set()).add(websocket)
+        await websocket.send_json({"type": "snapshot", **snapshot})
+        if self._ticker is None or self._ticker.done():
+            self._ticker = asyncio.create_task(self._run())
+
+    def unsubscribe(self, room_id: int, websocket: WebSocket) -> None:
+        subscribers = self._subscribers.get(room_id)
+        if subscribers is None:
+            return
+        subscribers.discard(websocket)
+        if not subscribers:
+            del self._subscribers[room_id]
+            self._snapshots.pop(room_id, None)
+
+    def subscriber_count(self, room_id: int | None = None) -> int:
+        if room_id is None:
+            return sum(len(subscribers) for subscribers in list(self._subscribers.values()))
+        return len(self._subscribers.get(room_id, ()))
+
+    async def _run(self) -> None:
+        while self._subscribers:
+            await asyncio.sleep(BROADCAST_INTERVAL_SECONDS)
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+            for room_id in dirty:
+                if room_id in self._subscribers:
+                    await self._broadcast(room_id)
+
+    async def _broadcast(self, room_id: int) -> None:
+        try:
+            state = competition_engine.loaded_room(room_id) or await run_in_threadpool(competition_engine.room, room_id)
+        except HTTPException:
+            # The room was deleted (or moved to another worker): tell clients and let them go
+            subscribers = self._subscribers.pop(room_id, set())
+            self._snapshots.pop(room_id, None)
+            await asyncio.gather(*(self._close(websocket) for websocket in subscribers))
+            return
+        snapshot = state.snapshot()
+        message = diff_snapshots(self._snapshots.get(room_id, snapshot), snapshot)
+        self._snapshots[room_id] = snapshot
+        subscribers = self._subscribers.get(room_id)
+        if message is None or not subscribers:
+            return
+        await asyncio.gather(*(self._send(room_id, websocket, message) for websocket in list(subscribers)))
+
+    @staticmethod
+    async def _close(websocket: WebSocket) -> None:
+        try:
+            await websocket.send_json({"type": "closed"})
+            await websocket.close()
+        except Exception:
+            pass
+
+    async def _send(self, room_id: int, websocket: WebSocket, message: dict[str, Any]) -> None:
+        try:
+            await websocket.send_json(message)
+        except Exception:
+            self.unsubscribe(room_id, websocket)
+
+
+competition_engine = CompetitionEngine()
+leaderboard_hub = LeaderboardHub()
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed_settings(session: Session) -> None:
+    for room_id, settings in session.info.pop("room_settings", {}).items():
+        competition_engine.apply_settings(room_id, settings)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_settings(session: Session) -> None:
+    session.info.pop("room_settings", None)
+
+registry.gauge(
+    "app_competition_connected_clients", "Open leaderboard WebSocket connections across all rooms.",
+    leaderboard_hub.subscriber_count,
+)
+registry.gauge(
+    "app_competition_participants", "Participants of the rooms loaded in this process.", competition_engine.participant_count,
+)
+registry.gauge(
+    "app_competition_rooms_loaded", "Competition rooms held in memory by this process.",
+    lambda: len(competition_engine.loaded_rooms()),
+)
@@ -8,3 +8,60 @@ ADMIN_USERNAME = os.getenv("ADMIN_USERNAME", "admin")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "2211")
 
 
+
+# Responses smaller than this many bytes are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+
+# Verified token -> user snapshots kept by get_current_user
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "10000"))
+
+# Competition rooms are pinned to one worker process (app.competition.room_worker). Set per
+# process by run_workers.py; a plain uvicorn launch, including --workers N, must keep the defaults
+WORKER_COUNT = int(os.getenv("APP_WORKER_COUNT", "1"))
+WORKER_INDEX = int(os.getenv("APP_WORKER_INDEX", "0"))
+
+# Dictionary for the competition word stream, one word per line (defaults to app/data/words.txt)
+COMPETITION_WORDS_FILE = os.getenv("COMPETITION_WORDS_FILE", "")
+
+# Uploaded language images (and their variants) live here; served under /uploads
+UPLOAD_DIR = os.getenv("APP_UPLOAD_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads"))
+
+# Largest accepted language image upload
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(2 * 1024 * 1024)))
+
+# When set, GET /metrics requires "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Development aid: per-request statement counts, N+1 and slow-query reports (see app/profiler.py)
+QUERY_PROFILING = os.getenv("APP_QUERY_PROFILING", "").lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+# A request running the same statement shape this many times is reported as a likely N+1
+QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", "5"))
+
+# Opt-in request trace recording for replay_trace.py (".gz" suffix compresses); empty disables it
+TRACE_FILE = os.getenv("APP_TRACE_FILE", "")
+# Users are only recorded as one of this many hashed buckets
+TRACE_USER_BUCKETS = int(os.getenv("TRACE_USER_BUCKETS", "1000"))
+
+# Opt-in span tracing of requests, statements, auth and checker runs as Chrome trace events
+# (open the file in ui.perfetto.dev or chrome://tracing); empty disables it
+TRACING_FILE = os.getenv("APP_TRACING_FILE", "")
+# Share of requests traced; an incoming W3C traceparent header's sampled flag takes precedence
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "1.0"))
+
+# Per-user request budgets by route class, "class=requests/seconds" (burst, refilled over the period);
+# "grading" covers quiz/code submissions and test-success records, "score" competition score updates.
+# Empty disables rate limiting.
+RATE_LIMITS = os.getenv("RATE_LIMITS", "grading=20/60,score=20/2")
+# New code submissions are refused with 503 while this many wait for review; 0 disables the check
+GRADING_QUEUE_MAX = int(os.getenv("GRADING_QUEUE_MAX", "10000"))
+
+# Structured (JSON) logging of the app.* loggers, see app/logs.py
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Per-logger overrides, e.g. "app.profiler=DEBUG,app.images=WARNING"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+# Share of INFO/DEBUG records kept for hot loggers, e.g. "app.profiler=0.1"
+LOG_SAMPLING = os.getenv("LOG_SAMPLING", "")
+# Records waiting for the writer thread; more are dropped rather than blocking a request
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
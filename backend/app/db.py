@@ -1,13 +1,18 @@
 from __future__ import annotations
 
+import os
+import zlib
 from contextlib import contextmanager
 from typing import Iterator
 
 from sqlalchemy import create_engine, event
 from sqlalchemy.orm import declarative_base, sessionmaker, Session
 
+from .metrics import instrument_engine
+from .tracing import span
 
-DATABASE_URL = "sqlite:///./backend_data.sqlite3"
+
+DATABASE_URL = os.getenv("APP_DATABASE_URL", "sqlite:///./backend_data.sqlite3")
 
 engine = create_engine(
     DATABASE_URL,
@@ -21,6 +26,9 @@ def set_sqlite_pragma(dbapi_connection, connection_record):
     cursor = dbapi_connection.cursor()
     cursor.execute("PRAGMA foreign_keys=ON")
     cursor.close()
+
+
+instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, future=True)
 Base = declarative_base()
 
@@ -30,12 +38,45 @@ def init_db() -> None:
     Base.metadata.create_all(bind=engine)
 
 
+def schema_version(extra: str = "") -> int:
+    """31-bit fingerprint of the declared tables, columns and indexes.
+
+    Stored in SQLite's ``PRAGMA user_version`` after a successful startup, so
+    the next start can tell that create_all and seeding have nothing to do.
+    ``extra`` folds in anything else that should force a full run (the
+    seed data version).
+    """
+    from . import models  # noqa: F401 - ensure models are imported for metadata
+    parts = [extra]
+    for table in Base.metadata.sorted_tables:
+        parts.append(table.name)
+        parts.extend(f"{column.name}:{column.type}:{column.nullable}" for column in table.columns)
+        parts.extend(sorted(index.name for index in table.indexes))
+    return zlib.crc32("\n".join(parts).encode()) & 0x7FFFFFFF
+
+
+def stored_schema_version() -> int | None:
+    if engine.dialect.name != "sqlite":
+        return None  # no cheap place to keep it; always take the full path
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def store_schema_version(version: int) -> None:
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"PRAGMA user_version = {int(version)}")
+
+
 @contextmanager
 def get_session() -> Iterator[Session]:
     session: Session = SessionLocal()
     try:
         yield session
-        session.commit()
+        # Traced separately: a commit is where SQLite waits for the write lock and syncs to disk
+        with span("db.commit", "db"):
+            session.commit()
     except Exception:
         session.rollback()
         raise
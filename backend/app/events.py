@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from datetime import datetime
+from typing import Any, AsyncIterator
+
+import orjson
+from fastapi.responses import StreamingResponse
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .metrics import registry
+
+# Events buffered per subscriber before it is told to resync instead
+SUBSCRIBER_QUEUE_SIZE = 100
+# Comment line sent on idle streams so proxies keep the connection open
+HEARTBEAT_SECONDS = 15.0
+# Subscription key of the admin feed (user ids are ints, so it cannot clash)
+ADMIN_CHANNEL = "admin"
+
+
+def submission_event(
+    submission_id: int,
+    task_id: int,
+    status: str,
+    is_correct: bool,
+    result: str | None,
+    created_at: datetime | None,
+) -> dict[str, Any]:
+    """Payload of a submission state change; same fields as GET /tasks/{id}/submission."""
+    return {
+        "type": "submission",
+        "id": submission_id,
+        "task_id": task_id,
+        "status": status,
+        "is_correct": is_correct,
+        "result": result,
+        "created_at": created_at,
+    }
+
+
+class EventBus:
+    """In-process pub/sub keyed by user id (or ADMIN_CHANNEL).
+
+    Subscribers are asyncio queues read on the server's event loop. Sync
+    handlers run in the threadpool, so ``publish`` hands events over with
+    ``call_soon_threadsafe`` and never blocks the caller. A subscriber that
+    falls SUBSCRIBER_QUEUE_SIZE events behind gets its backlog replaced by
+    a single ``resync`` event.
+    """
+
+    def __init__(self) -> None:
+        self._subscribers: dict[int | str, set[asyncio.Queue]] = {}
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def subscribe(self, key: int | str) -> asyncio.Queue:
+        self._loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(key, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, key: int | str, queue: asyncio.Queue) -> None:
+        with self._lock:
+            queues = self._subscribers.get(key)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[key]
+
+    def subscriber_count(self, key: int | str | None = None) -> int:
+        with self._lock:
+            if key is not None:
+                return len(self._subscribers.get(key, ()))
+            return sum(len(queues) for queues in self._subscribers.values())
+
+    def publish(self, key: int | str, payload: dict[str, Any]) -> None:
+        with self._lock:
+            queues = list(self._subscribers.get(key, ()))
+        if not queues or self._loop is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._deliver, queues, payload)
+        except RuntimeError:
+            pass  # loop already closed (shutdown)
+
+    def publish_after_commit(self, session: Session, key: int | str, payload: dict[str, Any]) -> None:
+        """Queue an event that is published only once ``session`` commits."""
+        session.info.setdefault("pending_events", []).append((key, payload))
+
+    @staticmethod
+    def _deliver(queues: list[asyncio.Queue], payload: dict[str, Any]) -> None:
+        for queue in queues:
+            try:
+                queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "resync"})
+
+
+event_bus = EventBus()
+registry.gauge("app_sse_subscribers", "Open Server-Sent Events streams (users and admins).", event_bus.subscriber_count)
+
+
+async def sse_stream(key: int | str) -> AsyncIterator[bytes]:
+    """Subscribe to ``key`` and yield its events as a Server-Sent Events body."""
+    queue = event_bus.subscribe(key)
+    try:
+        yield b"retry: 3000\n\n"
+        while True:
+            try:
+                payload = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield b": ping\n\n"
+                continue
+            yield b"event: " + payload["type"].encode() + b"\ndata: " + orjson.dumps(payload) + b"\n\n"
+    finally:
+        event_bus.unsubscribe(key, queue)
+
+
+def sse_response(key: int | str) -> StreamingResponse:
+    return StreamingResponse(
+        sse_stream(key),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def publish_submission_change(session: Session, user_id: int, payload: dict[str, Any]) -> None:
+    """Tell the submission's owner and the admin feed about a change, after commit.
+
+    Admins only get a ``submissions_changed`` nudge, once per transaction;
+    they fetch the rows from /admin/submissions/changes.
+    """
+    event_bus.publish_after_commit(session, user_id, payload)
+    session.info["notify_admins"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending_events(session: Session) -> None:
+    for user_id, payload in session.info.pop("pending_events", ()):
+        event_bus.publish(user_id, payload)
+    if session.info.pop("notify_admins", False):
+        event_bus.publish(ADMIN_CHANNEL, {"type": "submissions_changed"})
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_events(session: Session) -> None:
+    session.info.pop("pending_events", None)
+    session.info.pop("notify_admins", None)
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import warnings
+
+from .db import get_session
+from .models import Language
+from .tracing import traced
+
+# Longest side of each generated variant, in pixels
+VARIANT_SIZES = (64, 128, 256)
+VARIANT_FORMAT = "WEBP"
+VARIANT_EXTENSION = ".webp"
+VARIANT_QUALITY = 82
+# Vector images scale by themselves
+SKIP_EXTENSIONS = {".svg"}
+
+logger = logging.getLogger(__name__)
+
+
+def _pillow():
+    """Import Pillow on first use; it is optional and slow to import.
+
+    Without it languages keep serving the original image only.
+    """
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:  # pragma: no cover - depends on the environment
+        return None, None
+    return Image, ImageOps
+
+
+def pillow_available() -> bool:
+    return _pillow()[0] is not None
+
+
+def variant_filename(filename: str, size: int) -> str:
+    """``<hash>.png`` -> ``<hash>_128.webp``; derived from the content hash, so also immutable."""
+    return f"{os.path.splitext(filename)[0]}_{size}{VARIANT_EXTENSION}"
+
+
+def check_image(path: str) -> None:
+    """Raise ValueError unless the file at ``path`` is an image Pillow can safely decode.
+
+    Only the header is parsed, so this is cheap enough to run inside the
+    upload request. Images past Pillow's MAX_IMAGE_PIXELS (decompression
+    bombs: a small file that decodes to gigabytes) are refused. Without
+    Pillow, and for vector images, every file passes.
+    """
+    Image, _ = _pillow()
+    if Image is None or os.path.splitext(path)[1].lower() in SKIP_EXTENSIONS:
+        return
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", Image.DecompressionBombWarning)
+            with Image.open(path) as image:
+                image.verify()
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning) as e:
+        raise ValueError("Image dimensions are too large") from e
+    except (OSError, SyntaxError) as e:
+        raise ValueError("File is not a readable image") from e
+
+
+def make_variants(directory: str, filename: str) -> dict[str, str]:
+    """Write the downscaled variants of an uploaded image; returns {size: url}.
+
+    Images are never upscaled: sizes at or above the original's longest
+    side are left out. Existing variant files are reused. Raises ValueError
+    for decompression bombs.
+    """
+    Image, ImageOps = _pillow()
+    if Image is None or os.path.splitext(filename)[1].lower() in SKIP_EXTENSIONS:
+        return {}
+    variants: dict[str, str] = {}
+    try:
+        original = Image.open(os.path.join(directory, filename))
+    except Image.DecompressionBombError as e:
+        raise ValueError(str(e)) from e
+    with original:
+        image = ImageOps.exif_transpose(original)
+        image = image.convert("RGBA" if "A" in image.getbands() or image.mode == "P" else "RGB")
+        longest = max(image.size)
+        for size in VARIANT_SIZES:
+            if size >= longest:
+                continue
+            name = variant_filename(filename, size)
+            path = os.path.join(directory, name)
+            if not os.path.exists(path):
+                thumb = image.copy()
+                thumb.thumbnail((size, size), Image.Resampling.LANCZOS)
+                tmp_path = f"{path}.tmp"
+                thumb.save(tmp_path, VARIANT_FORMAT, quality=VARIANT_QUALITY, method=4)
+                os.replace(tmp_path, path)
+            variants[str(size)] = f"/uploads/{name}"
+    return variants
+
+
+@traced("images.variants", "background")
+def generate_language_variants(directory: str, lang_id: str, image_url: str) -> None:
+    """Background task: build variants for a language's freshly uploaded image.
+
+    The result is only stored if the language still shows that image, so a
+    slow run never overwrites the variants of a newer upload.
+    """
+    try:
+        variants = make_variants(directory, os.path.basename(image_url))
+    except (OSError, ValueError) as e:
+        logger.warning("Could not build image variants", extra={"image_url": image_url, "error": str(e)})
+        return
+    if not variants:
+        return
+    with get_session() as session:
+        language = session.get(Language, lang_id)
+        if language is not None and language.image_url == image_url:
+            language.image_variants = json.dumps(variants)
+
+
+def variant_urls(image_variants: str | None) -> dict[str, str]:
+    if not image_variants:
+        return {}
+    try:
+        return json.loads(image_variants)
+    except ValueError:
+        return {}
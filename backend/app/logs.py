@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+import orjson
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .metrics import registry
+
+# Incoming X-Request-ID values are reused only if they look like an id, not arbitrary text
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+# LogRecord attributes that are not user-supplied ``extra`` fields
+_RECORD_FIELDS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "request_id"}
+
+# The package's own logger: "app" when started from backend/, "backend.app" from the repo root
+PACKAGE_LOGGER = __name__.rpartition(".")[0]
+
+request_id: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+log_records_dropped = registry.counter("app_log_records_dropped_total", "Log records dropped because the log queue was full.")
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request id and ``extra`` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return orjson.dumps(entry, default=str).decode()
+
+
+class _RequestContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only ``rate`` of a logger's records below WARNING; warnings and errors always pass."""
+
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of waiting when the queue is full.
+
+    Only the message is rendered on the caller's thread; JSON encoding and
+    the write happen on the listener thread.
+    """
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_records_dropped.inc()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+def _parse_pairs(value: str) -> dict[str, str]:
+    """``"app.sql=0.1, app.images=DEBUG"`` -> {"app.sql": "0.1", "app.images": "DEBUG"}."""
+    pairs = {}
+    for part in value.split(","):
+        name, sep, setting = part.strip().partition("=")
+        if sep and name.strip():
+            pairs[name.strip()] = setting.strip()
+    return pairs
+
+
+def _logger_name(name: str) -> str:
+    """Overrides name loggers as ``app.x`` whichever directory the app was started from."""
+    if name == "app" or name.startswith("app."):
+        return PACKAGE_LOGGER + name[len("app"):]
+    return name
+
+
+def setup_logging(level: str = "INFO", levels: str = "", sampling: str = "", queue_size: int = 10000) -> None:
+    """Route the package's loggers through a bounded queue to a JSON stdout writer thread.
+
+    ``levels`` and ``sampling`` are comma-separated ``logger=value`` lists
+    (LOG_LEVELS / LOG_SAMPLING). Calling it again is a no-op.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    handler = _NonBlockingQueueHandler(log_queue)
+    handler.addFilter(_RequestContextFilter())
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter())
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=False)
+    _listener.start()
+
+    root = logging.getLogger(PACKAGE_LOGGER)
+    root.setLevel(level.upper())
+    root.addHandler(handler)
+    root.propagate = False
+    for name, logger_level in _parse_pairs(levels).items():
+        logging.getLogger(_logger_name(name)).setLevel(logger_level.upper())
+    for name, rate in _parse_pairs(sampling).items():
+        logging.getLogger(_logger_name(name)).addFilter(SamplingFilter(float(rate)))
+
+
+def shutdown_logging() -> None:
+    """Flush what is queued and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestIdMiddleware:
+    """Give every request an id, visible in its log records and the X-Request-ID header.
+
+    A well-formed incoming X-Request-ID (from a proxy) is kept, so one id
+    follows the request across services.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        incoming = Headers(scope=scope).get("x-request-id", "")
+        rid = incoming if _REQUEST_ID.match(incoming) else os.urandom(8).hex()
+        token = request_id.set(rid)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Request-ID"] = rid
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id.reset(token)
@@ -1,14 +1,27 @@
-from fastapi import FastAPI
+from typing import Annotated
+
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 import os
 
-from .db import init_db
-from .seed import seed_initial_data
+from .competition import competition_engine
+from .compression import CompressionMiddleware
+from .config import (
+    COMPRESSION_MIN_SIZE, LOG_LEVEL, LOG_LEVELS, LOG_QUEUE_SIZE, LOG_SAMPLING, METRICS_TOKEN, QUERY_PROFILING,
+    QUERY_REPEAT_THRESHOLD, SLOW_QUERY_MS, TRACE_FILE, TRACE_USER_BUCKETS, TRACING_FILE, TRACING_SAMPLE_RATE, UPLOAD_DIR,
+    UPLOAD_MAX_BYTES,
+)
+from .db import engine, init_db, schema_version, store_schema_version, stored_schema_version
+from .logs import RequestIdMiddleware, setup_logging, shutdown_logging
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, registry
+from .seed import SEED_VERSION, seed_initial_data
+from .uploads import MULTIPART_OVERHEAD_BYTES, ImmutableStaticFiles, UploadSizeLimitMiddleware
 from .routers import public, admin
 
+setup_logging(LOG_LEVEL, LOG_LEVELS, LOG_SAMPLING, LOG_QUEUE_SIZE)
 
-app = FastAPI(title="Learning Platform", version="0.1.0")
+app = FastAPI(title="Learning Platform", version="0.1.0", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,22 +30,59 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+# Caps what an image upload can make the server receive and spool, before the form is parsed
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    path_pattern=r"^/api/admin/languages/[^/]+/upload-image$",
+    max_bytes=UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD_BYTES,
+)
+if QUERY_PROFILING:
+    from .profiler import QueryProfiler, QueryProfilerMiddleware
 
-# Create uploads directory if it doesn't exist - use absolute path from backend/app
-# BASE_DIR should point to backend/ folder (parent of app/)
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-uploads_dir = os.path.join(BASE_DIR, "uploads")
-os.makedirs(uploads_dir, exist_ok=True)
-print(f"[MAIN] Static files served from: {uploads_dir}")
+    app.add_middleware(QueryProfilerMiddleware, profiler=QueryProfiler(engine, SLOW_QUERY_MS, QUERY_REPEAT_THRESHOLD))
+trace_writer = None
+if TRACE_FILE:
+    from .recorder import TraceRecorderMiddleware, TraceWriter
 
-# Serve static files from uploads directory
-app.mount("/uploads", StaticFiles(directory=uploads_dir), name="uploads")
+    trace_writer = TraceWriter(TRACE_FILE)
+    app.add_middleware(TraceRecorderMiddleware, writer=trace_writer, user_buckets=TRACE_USER_BUCKETS)
+span_exporter = None
+if TRACING_FILE:
+    from .tracing import TracingMiddleware, setup_tracing
+
+    span_exporter = setup_tracing(TRACING_FILE, engine)
+    app.add_middleware(TracingMiddleware, sample_rate=TRACING_SAMPLE_RATE)
+# Outermost, so latency includes CORS and compression
+app.add_middleware(MetricsMiddleware)
+# Wraps everything else so every log record of a request carries its id
+app.add_middleware(RequestIdMiddleware)
+
+# Serve static files from uploads directory; content-hashed names are cached immutably.
+# The directory is created at startup rather than at import time.
+app.mount("/uploads", ImmutableStaticFiles(directory=UPLOAD_DIR, check_dir=False), name="uploads")
 
 
 @app.on_event("startup")
 def on_startup() -> None:
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    # Reflection and seeding only run when the models or the seed data changed since the last start
+    version = schema_version(str(SEED_VERSION))
+    if stored_schema_version() == version:
+        return
     init_db()
     seed_initial_data()
+    store_schema_version(version)
+
+
+@app.on_event("shutdown")
+def on_shutdown() -> None:
+    competition_engine.shutdown()
+    if trace_writer is not None:
+        trace_writer.close()
+    if span_exporter is not None:
+        span_exporter.close()
+    shutdown_logging()
 
 
 app.include_router(public.router, prefix="/api")
@@ -44,3 +94,9 @@ def root():
     return {"status": "ok"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics(authorization: Annotated[str | None, Header()] = None):
+    """Prometheus text exposition of this process's metrics."""
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(registry.expose(), media_type=METRICS_CONTENT_TYPE)
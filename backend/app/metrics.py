@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Iterable, Sequence
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Every metric keeps at most this many label combinations; later ones are folded into "other"
+MAX_SERIES_PER_METRIC = 500
+OVERFLOW_LABEL = "other"
+# Requests that matched no route share one label instead of one per raw path
+UNMATCHED_ROUTE = "<unmatched>"
+KNOWN_METHODS = frozenset({"GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"})
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: dict[tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Sequence[str]) -> tuple[str, ...]:
+        key = tuple(str(v) for v in labels)
+        if key not in self._series and len(self._series) >= MAX_SERIES_PER_METRIC:
+            return (OVERFLOW_LABEL,) * len(self.labelnames)
+        return key
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def expose(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            key = self._key(labels)
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def expose(self) -> list[str]:
+        with self._lock:
+            series = list(self._series.items())
+        lines = self.header()
+        for key, value in sorted(series):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """A gauge read from ``collect`` at scrape time (current values, not events)."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, collect: Callable[[], float]) -> None:
+        super().__init__(name, documentation)
+        self._collect = collect
+
+    def expose(self) -> list[str]:
+        return self.header() + [f"{self.name} {_format_value(self._collect())}"]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram; each series is [bucket counts..., +Inf count, sum]."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            key = self._key(labels)
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def expose(self) -> list[str]:
+        with self._lock:
+            series = [(key, list(values)) for key, values in self._series.items()]
+        lines = self.header()
+        for key, values in sorted(series):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(values[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, collect: Callable[[], float]) -> Gauge:
+        return self.register(Gauge(name, documentation, collect))
+
+    def expose(self) -> str:
+        lines: list[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "app_http_requests_total", "HTTP requests by route template, method and status.", ("route", "method", "status"),
+)
+http_latency = registry.histogram(
+    "app_http_request_duration_seconds", "Time from request to the last response byte, by route template.", ("route", "method"),
+)
+db_queries_per_request = registry.histogram(
+    "app_http_request_db_queries", "Database statements executed while handling a request.", ("route",), QUERY_COUNT_BUCKETS,
+)
+db_time_per_request = registry.histogram(
+    "app_http_request_db_seconds", "Time spent in database statements while handling a request.", ("route",),
+)
+db_queries = registry.counter("app_db_queries_total", "Database statements executed, inside or outside requests.")
+db_query_seconds = registry.counter("app_db_query_seconds_total", "Total time spent in database statements.")
+competition_score_updates = registry.counter(
+    "app_competition_score_updates_total", "Accepted competition score updates; use rate() for updates per second.",
+)
+
+
+class _RequestStats:
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.seconds = 0.0
+
+
+# Per-request database counters; threadpool handlers and background tasks run in a copy of
+# the request's context, so they see (and add to) the same object.
+_request_stats: ContextVar[_RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+def instrument_engine(engine) -> None:
+    """Count and time every statement run on ``engine``."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        db_queries.inc()
+        db_query_seconds.inc(amount=elapsed)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.seconds += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _failed(exception_context):
+        # after_cursor_execute never runs for a failed statement; drop its start time so
+        # the next statement on this pooled connection is not timed against it
+        conn = exception_context.connection
+        starts = conn.info.get("query_start") if conn is not None else None
+        if starts:
+            starts.pop()
+
+
+def route_template(scope: Scope) -> str:
+    """The path pattern the request matched (``/api/lessons/{lesson_id}``), never the raw path."""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if "app_root_path" in scope:
+        # Matched a Mount (e.g. /uploads): its prefix is the template
+        return scope["root_path"][len(scope["app_root_path"]):] or UNMATCHED_ROUTE
+    return UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """Record request count, latency and database usage per route template.
+
+    Labels use the matched route's path pattern, a fixed method set and the
+    status code, so the number of series is bounded by the routes the app
+    declares. Event streams are counted but left out of the latency
+    histogram: their duration is the client's session length.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        stats = _RequestStats()
+        token = _request_stats.set(stats)
+        status = 500
+        streaming = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                streaming = Headers(raw=message["headers"]).get("content-type", "").startswith("text/event-stream")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
+            elapsed = time.perf_counter() - start
+            route = route_template(scope)
+            method = scope["method"] if scope["method"] in KNOWN_METHODS else OVERFLOW_LABEL
+            http_requests.inc(route, method, str(status))
+            if not streaming:
+                http_latency.observe(elapsed, route, method)
+            db_queries_per_request.observe(stats.queries, route)
+            db_time_per_request.observe(stats.seconds, route)
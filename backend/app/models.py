@@ -1,9 +1,10 @@
 from __future__ import annotations
 
 from datetime import datetime
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Text
-from sqlalchemy.orm import relationship, Mapped, mapped_column
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, LargeBinary, String, Text, event, func, select
+from sqlalchemy.orm import Session, relationship, Mapped, mapped_column, object_session
 
+from .auth import user_cache
 from .db import Base
 
 
@@ -18,6 +19,27 @@ class User(Base):
     submissions: Mapped[list[Submission]] = relationship("Submission", back_populates="user")
 
 
+@event.listens_for(User, "after_delete")
+def _note_deleted_user(mapper, connection, target: User) -> None:
+    # Fires at flush; the cache is only cleared once the delete commits (below), otherwise a
+    # concurrent request could re-cache the still-visible row, or a rollback would evict for nothing
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("deleted_user_ids", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _drop_cached_users(session: Session) -> None:
+    # Tokens of a deleted user must stop resolving as soon as the delete is visible
+    for user_id in session.info.pop("deleted_user_ids", ()):
+        user_cache.invalidate_user(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_deleted_users(session: Session) -> None:
+    session.info.pop("deleted_user_ids", None)
+
+
 class Language(Base):
     __tablename__ = "languages"
 
@@ -25,6 +47,7 @@ class Language(Base):
     name: Mapped[str] = mapped_column(String(100))  # display name like "Python", "C#", "My Custom Language"
     is_custom: Mapped[bool] = mapped_column(Boolean, default=False)  # True for user-created languages
     image_url: Mapped[str | None] = mapped_column(String(500), nullable=True)  # URL or path to language icon/image
+    image_variants: Mapped[str | None] = mapped_column(Text, nullable=True)  # JSON {"64": url, ...} of downscaled copies of image_url
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     lessons: Mapped[list[Lesson]] = relationship("Lesson", back_populates="language_obj", cascade="all, delete-orphan")
@@ -32,6 +55,9 @@ class Language(Base):
 
 class Lesson(Base):
     __tablename__ = "lessons"
+    __table_args__ = (
+        Index("ix_lessons_language_order_index", "language", "order_index"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     language: Mapped[str] = mapped_column(String(20), index=True)  # "python" | "csharp"
@@ -46,6 +72,9 @@ class Lesson(Base):
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        Index("ix_tasks_lesson_id_order_index", "lesson_id", "order_index"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     lesson_id: Mapped[int] = mapped_column(ForeignKey("lessons.id", ondelete="CASCADE"))
@@ -61,6 +90,12 @@ class Task(Base):
 
 class Submission(Base):
     __tablename__ = "submissions"
+    __table_args__ = (
+        # Serves the pending-review queue: filter by status, keyset-paginate by (created_at, id)
+        Index("ix_submissions_status_created_at", "status", "created_at", "id"),
+        # Serves the admin change feed: WHERE change_seq > :since ORDER BY change_seq
+        Index("ix_submissions_change_seq", "change_seq", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True)
@@ -71,19 +106,62 @@ class Submission(Base):
     result: Mapped[str | None] = mapped_column(Text, nullable=True)
     status: Mapped[str] = mapped_column(String(20), default="completed")  # "pending", "completed"
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    change_seq: Mapped[int | None] = mapped_column(Integer, nullable=True)  # bumped on every write, see next_change_seq
 
     user: Mapped[User] = relationship("User", back_populates="submissions")
     task: Mapped[Task] = relationship("Task", back_populates="submissions")
 
 
+def next_change_seq():
+    """SQL expression for the next submission change sequence number.
+
+    Evaluated inside the INSERT/UPDATE itself, i.e. while SQLite holds the
+    write lock, so numbers grow in commit order across processes. A bulk
+    UPDATE gives all of its rows the same number.
+    """
+    previous = Submission.__table__.alias("previous")
+    return select(func.coalesce(func.max(previous.c.change_seq), 0) + 1).scalar_subquery()
+
+
+@event.listens_for(Submission, "before_insert")
+@event.listens_for(Submission, "before_update")
+def _bump_change_seq(mapper, connection, target: Submission) -> None:
+    target.change_seq = next_change_seq()
+
+
+class SubmissionFingerprint(Base):
+    """MinHash signature of a code submission, see app/similarity.py."""
+
+    __tablename__ = "submission_fingerprints"
+
+    submission_id: Mapped[int] = mapped_column(ForeignKey("submissions.id", ondelete="CASCADE"), primary_key=True)
+    task_id: Mapped[int] = mapped_column(Integer, index=True)
+    signature: Mapped[bytes] = mapped_column(LargeBinary)
+
+
+class SubmissionLshBand(Base):
+    """One LSH bucket a fingerprinted submission falls into; submissions sharing a bucket are candidates."""
+
+    __tablename__ = "submission_lsh_bands"
+    __table_args__ = (
+        # Serves ON DELETE CASCADE from submissions
+        Index("ix_submission_lsh_bands_submission_id", "submission_id"),
+    )
+
+    bucket: Mapped[int] = mapped_column(Integer, primary_key=True)
+    submission_id: Mapped[int] = mapped_column(ForeignKey("submissions.id", ondelete="CASCADE"), primary_key=True)
+
+
 class CompetitionRoom(Base):
     __tablename__ = "competition_rooms"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(100), default="Typing Competition")
+    join_code: Mapped[str | None] = mapped_column(String(12), unique=True, index=True, nullable=True)  # short code students enter to join
     game_time: Mapped[int] = mapped_column(Integer, default=60)  # seconds
     difficulty: Mapped[int] = mapped_column(Integer, default=2)  # 0-5
     is_active: Mapped[bool] = mapped_column(Boolean, default=False)
+    started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)  # last start; seeds that game's word stream
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     participants: Mapped[list[CompetitionParticipant]] = relationship("CompetitionParticipant", back_populates="room", cascade="all, delete-orphan")
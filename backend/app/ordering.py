@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from typing import Any, Optional, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+# Distance between neighbouring order keys. Moving an item takes the midpoint
+# of its new neighbours, so a scope absorbs ~10 moves into the same slot
+# before it has to be renormalized.
+ORDER_GAP = 1024
+
+
+def next_order_index(db: Session, model: Any, scope_column: Any, scope_value: Any) -> int:
+    """Order key for appending to the end of a scope (one index-backed MAX lookup)."""
+    last = db.execute(select(func.max(model.order_index)).where(scope_column == scope_value)).scalar()
+    return (last or 0) + ORDER_GAP
+
+
+def renormalize(db: Session, model: Any, scope_column: Any, scope_value: Any) -> None:
+    """Rewrite a scope's keys as ORDER_GAP, 2*ORDER_GAP, ... keeping the current order."""
+    ids = db.execute(
+        select(model.id).where(scope_column == scope_value).order_by(model.order_index, model.id)
+    ).scalars().all()
+    _write_order(db, model, ids)
+
+
+def reorder(db: Session, model: Any, scope_column: Any, scope_value: Any, ordered_ids: Sequence[int]) -> None:
+    """Apply a full ordering given as the complete list of ids in the scope."""
+    existing = set(db.execute(select(model.id).where(scope_column == scope_value)).scalars())
+    if len(ordered_ids) != len(existing) or set(ordered_ids) != existing:
+        raise HTTPException(status_code=400, detail="ids must list every item in the scope exactly once")
+    _write_order(db, model, ordered_ids)
+
+
+def move_after(db: Session, item: Any, scope_column: Any, scope_value: Any, after_id: Optional[int]) -> None:
+    """Place ``item`` directly after ``after_id`` (or first when it is None).
+
+    Only the new neighbours are looked up and only ``item`` is rewritten,
+    unless the gap between the neighbours is exhausted, in which case the
+    scope is renormalized once and the move retried. If there is still no
+    room (a concurrent writer changed the scope), the move fails with 409
+    rather than leaving the item where it was.
+    """
+    model = type(item)
+    if after_id == item.id:
+        return
+    for attempt in range(2):
+        if after_id is None:
+            lower = None
+        else:
+            lower = db.execute(
+                select(model.order_index).where(model.id == after_id, scope_column == scope_value)
+            ).scalar()
+            if lower is None:
+                raise HTTPException(status_code=400, detail="after_id is not in the same scope")
+        upper_stmt = select(func.min(model.order_index)).where(scope_column == scope_value, model.id != item.id)
+        if lower is not None:
+            upper_stmt = upper_stmt.where(model.order_index > lower)
+        upper = db.execute(upper_stmt).scalar()
+
+        if lower is None and upper is None:
+            return
+        if lower is None:
+            item.order_index = upper - ORDER_GAP
+        elif upper is None:
+            item.order_index = lower + ORDER_GAP
+        elif upper - lower > 1:
+            item.order_index = (lower + upper) // 2
+        elif attempt == 0:
+            renormalize(db, model, scope_column, scope_value)
+            db.refresh(item)
+            continue
+        else:
+            break
+        db.flush()
+        return
+    raise HTTPException(status_code=409, detail="Could not find a free position; retry the move")
+
+
+def id_at_position(db: Session, model: Any, scope_column: Any, scope_value: Any, position: int, exclude_id: int) -> Optional[int]:
+    """Id of the item a moved item should follow to end up at 0-based ``position``."""
+    if position <= 0:
+        return None
+    others = select(model.id).where(scope_column == scope_value, model.id != exclude_id)
+    after_id = db.execute(others.order_by(model.order_index, model.id).offset(position - 1).limit(1)).scalar()
+    if after_id is None:
+        # Past the end: follow the current last item
+        after_id = db.execute(others.order_by(model.order_index.desc(), model.id.desc()).limit(1)).scalar()
+    return after_id
+
+
+def _write_order(db: Session, model: Any, ordered_ids: Sequence[int]) -> None:
+    if not ordered_ids:
+        return
+    db.execute(
+        update(model),
+        [{"id": item_id, "order_index": (i + 1) * ORDER_GAP} for i, item_id in enumerate(ordered_ids)],
+        execution_options={"synchronize_session": False},
+    )
+    db.flush()
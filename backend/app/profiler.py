@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .metrics import route_template
+
+# Literals and expanded IN lists differ between calls of the same query; strip them to get its shape
+_NUMBER = re.compile(r"\b\d+\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|__\[POSTCOMPILE_\w+\])(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+logger = logging.getLogger(__name__)
+
+
+def statement_shape(statement: str) -> str:
+    shape = _STRING.sub("?", statement)
+    shape = _NUMBER.sub("?", shape)
+    shape = _PLACEHOLDER_LIST.sub("(?)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+class RequestProfile:
+    """Statements run on behalf of one request."""
+
+    __slots__ = ("queries", "seconds", "shapes", "slow")
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.seconds = 0.0
+        self.shapes: Counter[str] = Counter()
+        self.slow: list[tuple[float, str]] = []
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """Shapes issued at least ``threshold`` times: the usual sign of an N+1 loop."""
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+
+_profile: ContextVar[RequestProfile | None] = ContextVar("query_profile", default=None)
+
+
+class QueryProfiler:
+    """Opt-in statement profiler (APP_QUERY_PROFILING=1).
+
+    Hooks the engine's cursor events and charges each statement to the
+    request running it. Statements slower than ``slow_ms`` are logged with
+    SQLite's EXPLAIN QUERY PLAN; requests that repeat one statement shape
+    ``repeat_threshold`` times or more are logged as likely N+1.
+    """
+
+    def __init__(self, engine: Engine, slow_ms: float, repeat_threshold: int) -> None:
+        self.engine = engine
+        self.slow_seconds = slow_ms / 1000
+        self.repeat_threshold = repeat_threshold
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+        event.listen(engine, "handle_error", self._failed)
+
+    @staticmethod
+    def _before(conn, cursor, statement, parameters, context, executemany) -> None:
+        conn.info.setdefault("profile_start", []).append(time.perf_counter())
+
+    @staticmethod
+    def _failed(exception_context) -> None:
+        # A failed statement never reaches _after; drop its start time so later ones are timed correctly
+        conn = exception_context.connection
+        starts = conn.info.get("profile_start") if conn is not None else None
+        if starts:
+            starts.pop()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        elapsed = time.perf_counter() - conn.info["profile_start"].pop()
+        profile = _profile.get()
+        if profile is not None:
+            profile.queries += 1
+            profile.seconds += elapsed
+            profile.shapes[statement_shape(statement)] += 1
+        if elapsed >= self.slow_seconds:
+            if profile is not None:
+                profile.slow.append((elapsed, statement))
+            logger.warning("Slow statement", extra={
+                "duration_ms": round(elapsed * 1000, 2),
+                "statement": _WHITESPACE.sub(" ", statement).strip(),
+                "plan": self.explain(cursor, statement, parameters, executemany),
+            })
+
+    def explain(self, cursor, statement: str, parameters, executemany: bool) -> list[str]:
+        if self.engine.dialect.name != "sqlite" or executemany or not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            return []
+        plan_cursor = cursor.connection.cursor()
+        try:
+            rows = plan_cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ()).fetchall()
+        except Exception as e:
+            return [f"unavailable: {e}"]
+        finally:
+            plan_cursor.close()
+        return [row[-1] for row in rows]
+
+
+class QueryProfilerMiddleware:
+    """Attach a RequestProfile to every HTTP request and report it.
+
+    The summary goes into a ``Server-Timing`` header (shown by browser dev
+    tools) and ``X-Query-Count`` / ``X-Query-Repeated`` headers; requests
+    with N+1 patterns are also logged. Only statements that ran before
+    the response headers were sent can be counted in the headers.
+    """
+
+    def __init__(self, app: ASGIApp, profiler: QueryProfiler) -> None:
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        profile = RequestProfile()
+        token = _profile.set(profile)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", f'db;dur={profile.seconds * 1000:.2f};desc="{profile.queries} queries"')
+                headers["X-Query-Count"] = str(profile.queries)
+                headers["X-Query-Repeated"] = str(len(profile.repeated(self.profiler.repeat_threshold)))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _profile.reset(token)
+            self.report(scope, profile)
+
+    def report(self, scope: Scope, profile: RequestProfile) -> None:
+        repeated = profile.repeated(self.profiler.repeat_threshold)
+        if not repeated:
+            return
+        logger.warning("Possible N+1 query pattern", extra={
+            "route": f"{scope['method']} {route_template(scope)}",
+            "statements": profile.queries,
+            "db_ms": round(profile.seconds * 1000, 2),
+            "repeated": [{"count": count, "shape": shape[:200]} for shape, count in repeated],
+        })
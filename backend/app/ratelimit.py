@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+from .metrics import registry
+
+requests_limited = registry.counter(
+    "app_requests_limited_total", "Requests refused by rate limiting (429) or admission control (503).", ("route_class", "reason"),
+)
+
+
+def parse_budgets(value: str) -> dict[str, tuple[float, float]]:
+    """``"grading=20/60, score=20/2"`` -> {"grading": (20.0, 60.0), "score": (20.0, 2.0)}.
+
+    Each budget is ``requests/seconds``: a burst of up to ``requests``,
+    refilled evenly over ``seconds``.
+    """
+    budgets = {}
+    for part in value.split(","):
+        name, sep, budget = part.strip().partition("=")
+        if not sep or not name.strip():
+            continue
+        requests, _, seconds = budget.partition("/")
+        budgets[name.strip()] = (float(requests), float(seconds or 1))
+    return budgets
+
+
+class RateLimiter:
+    """In-process token buckets keyed by route class and caller.
+
+    Route classes without a budget are never limited. Buckets of callers
+    that went quiet are evicted LRU-first beyond ``max_keys``; a fresh
+    bucket starts full, so eviction can only make the limiter more lenient.
+    Limits are per process: with several workers each one keeps its own.
+    """
+
+    def __init__(self, budgets: dict[str, tuple[float, float]], max_keys: int = 100000) -> None:
+        self.budgets = budgets
+        self.max_keys = max_keys
+        # (route class, key) -> [tokens, last refill]
+        self._buckets: OrderedDict[tuple[str, Hashable], list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, route_class: str, key: Hashable) -> float:
+        """Take one token; returns 0 on success, else seconds until one is available."""
+        budget = self.budgets.get(route_class)
+        if budget is None:
+            return 0.0
+        capacity, period = budget
+        rate = capacity / period
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get((route_class, key))
+            if bucket is None:
+                bucket = self._buckets[(route_class, key)] = [capacity, now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end((route_class, key))
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            retry_after = (1 - bucket[0]) / rate
+        requests_limited.inc(route_class, "rate")
+        return retry_after
+
+
+class QueueAdmission:
+    """Refuse new work while a queue is deeper than ``max_depth``.
+
+    ``probe`` measures the depth (a COUNT query); its result is reused for
+    ``ttl_seconds`` so a burst of requests costs one query, not one each.
+    ``max_depth`` <= 0 disables the check.
+    """
+
+    def __init__(self, name: str, probe: Callable[[], int], max_depth: int, ttl_seconds: float = 2.0) -> None:
+        self.name = name
+        self.probe = probe
+        self.max_depth = max_depth
+        self.ttl_seconds = ttl_seconds
+        self._depth = 0
+        self._measured = float("-inf")
+        self._lock = threading.Lock()
+
+    def depth(self) -> int:
+        with self._lock:
+            if time.monotonic() - self._measured >= self.ttl_seconds:
+                self._depth = self.probe()
+                self._measured = time.monotonic()
+            return self._depth
+
+    def admit(self) -> bool:
+        if self.max_depth <= 0 or self.depth() < self.max_depth:
+            return True
+        requests_limited.inc(self.name, "queue_full")
+        return False
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import hmac
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any
+from urllib.parse import parse_qsl
+
+import jwt
+import orjson
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .metrics import route_template
+
+TRACE_FORMAT_VERSION = 1
+# Request bodies above this size are not kept (uploads); replay skips those requests
+MAX_RECORDED_BODY = 64 * 1024
+# Values of these keys never reach the trace, wherever they appear
+SECRET_KEYS = frozenset({"token", "password", "access_token", "authorization"})
+# String values kept verbatim because replay needs them to hit the same code path
+KEEP_STRING_KEYS = frozenset({"language", "kind", "answer", "cursor", "status"})
+
+
+def anonymize(value: Any, key: str = "") -> Any:
+    """Same shape and sizes, no content: strings become runs of "x" of equal length.
+
+    Integers (including numeric query strings such as offsets and ids) are kept.
+    """
+    if key in SECRET_KEYS:
+        return None
+    if isinstance(value, dict):
+        return {k: anonymize(v, k) for k, v in value.items()}
+    if isinstance(value, list):
+        return [anonymize(v, key) for v in value]
+    if isinstance(value, str) and key not in KEEP_STRING_KEYS and not value.lstrip("-").isdigit():
+        return "x" * len(value)
+    return value
+
+
+def user_bucket(subject: str, buckets: int, key: bytes) -> int:
+    """Keyed hash of a user id: stable within one recording, not reversible from the trace.
+
+    An unkeyed hash of sequential ids could be inverted by hashing every
+    plausible id; without ``key`` (never written out) that is not possible.
+    """
+    digest = hmac.new(key, subject.encode(), hashlib.sha256).digest()
+    return int.from_bytes(digest[:8], "big") % buckets
+
+
+class TraceWriter:
+    """Appends trace records to a file from a background thread.
+
+    Records are one JSON document per line after a header line; a path
+    ending in ``.gz`` is written gzip-compressed. ``record`` only enqueues,
+    so the request path never waits on disk. Each recording gets a fresh
+    random ``bucket_key`` for user buckets; it stays in memory only.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.started = time.monotonic()
+        self.bucket_key = os.urandom(32)
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        opener = gzip.open if path.endswith(".gz") else open
+        self._file = opener(path, "ab")
+        header = {"v": TRACE_FORMAT_VERSION, "started": datetime.now(timezone.utc).isoformat()}
+        self._file.write(orjson.dumps(header) + b"\n")
+        self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+        self._thread.start()
+
+    def record(self, entry: dict[str, Any]) -> None:
+        self._queue.put(entry)
+
+    def _run(self) -> None:
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                break
+            lines = [orjson.dumps(entry)]
+            # Drain whatever else is waiting so a burst becomes one write
+            while True:
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is None:
+                    self._file.write(b"\n".join(lines) + b"\n")
+                    return
+                lines.append(orjson.dumps(entry))
+            self._file.write(b"\n".join(lines) + b"\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+        self._file.close()
+
+
+class TraceRecorderMiddleware:
+    """Record every HTTP request as an anonymized trace entry (opt-in, APP_TRACE_FILE).
+
+    An entry holds the arrival offset, method, route template and path
+    parameters, query parameters and JSON body run through ``anonymize``,
+    the caller's role and a keyed-hash user bucket, and the response status and
+    duration. User ids (from the token or a ``user_id`` path parameter) are
+    only kept as their bucket, which the replay tool maps to its own users.
+    """
+
+    def __init__(self, app: ASGIApp, writer: TraceWriter, user_buckets: int = 1000) -> None:
+        self.app = app
+        self.writer = writer
+        self.user_buckets = user_buckets
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        arrived = time.monotonic()
+        headers = Headers(scope=scope)
+        body = bytearray()
+        body_complete = True
+        status = 500
+        stream = False
+
+        async def receive_wrapper() -> Message:
+            nonlocal body_complete
+            message = await receive()
+            if message["type"] == "http.request" and body_complete:
+                if len(body) + len(message.get("body", b"")) > MAX_RECORDED_BODY:
+                    body_complete = False
+                    body.clear()
+                else:
+                    body.extend(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, stream
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                stream = Headers(raw=message["headers"]).get("content-type", "").startswith("text/event-stream")
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            query = dict(parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True))
+            token = query.get("token") or headers.get("authorization", "").partition(" ")[2]
+            entry: dict[str, Any] = {
+                "t": round(arrived - self.writer.started, 4),
+                "m": scope["method"],
+                "r": route_template(scope),
+                "pp": self._path_params(scope),
+                "q": anonymize({k: v for k, v in query.items() if k not in SECRET_KEYS}, "query"),
+                "s": status,
+                "d": round((time.monotonic() - arrived) * 1000, 2),
+            }
+            entry.update(self._caller(token))
+            if stream:
+                entry["sse"] = 1
+            if body:
+                entry.update(self._body(bytes(body), headers.get("content-type", "")))
+            elif not body_complete:
+                entry["skip"] = "large body"
+            self.writer.record(entry)
+
+    def _path_params(self, scope: Scope) -> dict[str, Any]:
+        params = dict(scope.get("path_params") or {})
+        if "user_id" in params:
+            params["user_id"] = user_bucket(str(params["user_id"]), self.user_buckets, self.writer.bucket_key)
+        return params
+
+    def _caller(self, token: str) -> dict[str, Any]:
+        if not token:
+            return {}
+        try:
+            # Attribution only; the app itself verifies the signature
+            payload = jwt.decode(token, options={"verify_signature": False})
+        except jwt.InvalidTokenError:
+            return {"role": "invalid"}
+        role = payload.get("role", "user")
+        if role == "admin":
+            return {"role": "admin"}
+        return {"role": role, "u": user_bucket(str(payload.get("sub")), self.user_buckets, self.writer.bucket_key)}
+
+    @staticmethod
+    def _body(body: bytes, content_type: str) -> dict[str, Any]:
+        if not content_type.startswith("application/json"):
+            return {"skip": content_type.split(";")[0] or "body"}
+        try:
+            return {"b": anonymize(orjson.loads(body))}
+        except orjson.JSONDecodeError:
+            return {"skip": "invalid json"}
@@ -1,33 +1,34 @@
 from __future__ import annotations
 
 import json
+import logging
 import os
-import shutil
+from datetime import datetime
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Header, Response, UploadFile, File
-from sqlalchemy import select, func, delete
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Header, Request, Response, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import select, func, delete, insert, tuple_, update
 from sqlalchemy.orm import Session
 
 from ..auth import create_access_token, decode_token
-from ..config import ADMIN_USERNAME, ADMIN_PASSWORD
+from ..competition import competition_engine, generate_join_code, require_room_owner, room_worker
+from ..config import ADMIN_USERNAME, ADMIN_PASSWORD, UPLOAD_DIR, UPLOAD_MAX_BYTES
 from ..db import get_session
-from ..models import Language, Lesson, Task, Submission, User, CompetitionRoom, CompetitionParticipant
-from ..schemas import AdminLogin, LessonOut, TaskOut, UserOut
-
-# Upload directory for language images - save to backend/uploads
-# __file__ is backend/app/routers/admin.py
-# We need to go: admin.py -> routers/ -> app/ -> backend/ (this is where uploads/ should be)
-CURRENT_FILE = os.path.abspath(__file__)
-# Get the backend directory (3 levels up from admin.py: routers/app/backend)
-BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(CURRENT_FILE)))
-# Use absolute path to backend/uploads
-UPLOAD_DIR = os.path.abspath(os.path.join(BACKEND_DIR, "uploads"))
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-print(f"[ADMIN] Upload directory: {UPLOAD_DIR}")
+from ..events import ADMIN_CHANNEL, publish_submission_change, sse_response, submission_event
+from ..models import Language, Lesson, Task, Submission, User, CompetitionRoom, CompetitionParticipant, next_change_seq
+from ..ordering import ORDER_GAP, id_at_position, move_after, next_order_index, reorder
+from ..schemas import AdminLogin, LessonImport, LessonOut, MoveRequest, ReorderRequest, ReviewBatch, TaskOut, UserOut
+from ..images import check_image, generate_language_variants
+from ..similarity import similar_submissions, task_clusters
+from ..tracing import span
+from ..uploads import remove_unreferenced_upload, save_upload
 
 
 router = APIRouter(tags=["admin"])
+logger = logging.getLogger(__name__)
 
 
 def get_db() -> Session:
@@ -38,8 +39,12 @@ def get_db() -> Session:
 def get_current_admin(authorization: Annotated[str | None, Header()] = None) -> dict:
     if not authorization or not authorization.lower().startswith("bearer "):
         raise HTTPException(status_code=401, detail="Missing token")
-    token = authorization.split(" ", 1)[1]
-    payload = decode_token(token)
+    return _admin_payload(authorization.split(" ", 1)[1])
+
+
+def _admin_payload(token: str) -> dict:
+    with span("auth.admin", "auth"):
+        payload = decode_token(token)
     if payload.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Not admin")
     return payload
@@ -55,10 +60,15 @@ def admin_login(payload: AdminLogin, db: Session = Depends(get_db)):
 
 @router.get("/users", response_model=list[UserOut])
 def list_users(_: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
-    return db.execute(select(User).order_by(User.created_at.desc())).scalars().all()
+    # Column select rendered straight to JSON, skipping ORM hydration and response_model validation
+    stmt = select(User.id, User.name, User.is_admin, User.created_at).order_by(User.created_at.desc())
+    return ORJSONResponse([row._asdict() for row in db.execute(stmt)])
+
+
 @router.get("/tasks", response_model=list[TaskOut])
 def list_all_tasks(_: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
-    return db.execute(select(Task).order_by(Task.id)).scalars().all()
+    stmt = select(Task.id, Task.lesson_id, Task.title, Task.description, Task.kind, Task.test_spec, Task.order_index).order_by(Task.id)
+    return ORJSONResponse([row._asdict() for row in db.execute(stmt)])
 
 @router.get("/tasks/{task_id}", response_model=TaskOut)
 def get_task(task_id: int, _: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
@@ -70,65 +80,205 @@ def get_task(task_id: int, _: dict = Depends(get_current_admin), db: Session = D
 
 @router.get("/submissions")
 def list_submissions(user_name: str = "", page: int = 1, page_size: int = 50, _: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
-    # Join to fetch user name, lesson title, and task title
+    # Join to fetch user name, lesson title, and task title as plain columns
     base_stmt = (
-        select(Submission, User.name, Task.lesson_id, Task.title.label('task_title'), Lesson.title.label('lesson_title'))
+        select(
+            Submission.id,
+            User.name.label('user_name'),
+            Task.lesson_id,
+            Lesson.title.label('lesson_title'),
+            Submission.task_id,
+            Task.title.label('task_title'),
+            Submission.is_correct,
+            Submission.result,
+            Submission.status,
+            Submission.code,
+            Submission.created_at,
+        )
         .join(User, User.id == Submission.user_id)
         .join(Task, Task.id == Submission.task_id)
         .join(Lesson, Lesson.id == Task.lesson_id)
-        .order_by(Submission.created_at.desc())
     )
     if user_name:
         base_stmt = base_stmt.where(User.name == user_name)
+    # Read before the page so changes racing with it are re-sent by /submissions/changes
+    sync_cursor = _current_change_seq(db)
+    # Feed rows above this id are new submissions, whichever page the client is on
+    max_id = db.execute(select(func.max(Submission.id))).scalar() or 0
     # Count total
     count_stmt = select(func.count()).select_from(base_stmt.subquery())
     total = db.execute(count_stmt).scalar()
     # Paginate
-    stmt = base_stmt.offset((page - 1) * page_size).limit(page_size)
-    rows = db.execute(stmt).all()
-    out = []
-    for s, user_name_val, lesson_id, task_title, lesson_title in rows:
-        # Handle missing status field for existing records
-        status = getattr(s, 'status', 'completed')
-        out.append({
-            "id": s.id,
-            "user_name": user_name_val,
-            "lesson_id": int(lesson_id),
-            "lesson_title": lesson_title,
-            "task_id": s.task_id,
-            "task_title": task_title,
-            "is_correct": s.is_correct,
-            "result": s.result,
-            "status": status,
-            "code": s.code,
-            "created_at": s.created_at,
-        })
-    return {"data": out, "total": total, "page_size": page_size}
+    stmt = base_stmt.order_by(Submission.created_at.desc()).offset((page - 1) * page_size).limit(page_size)
+    out = [row._asdict() for row in db.execute(stmt)]
+    return ORJSONResponse({"data": out, "total": total, "page_size": page_size, "sync_cursor": sync_cursor, "max_id": max_id})
+
+def _decode_pending_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, submission_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(created_at), int(submission_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 
 @router.get("/submissions/pending")
-def list_pending_submissions(_: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
-    # Get only pending code submissions
+def list_pending_submissions(cursor: str = "", limit: int = 50, _: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
+    # Compact queue rows only; code and task description come from GET /submissions/{id}
+    limit = max(1, min(limit, 500))
     stmt = (
-        select(Submission, User.name, Task.title.label('task_title'), Task.description.label('task_description'), Lesson.title.label('lesson_title'))
+        select(
+            Submission.id,
+            Submission.user_id,
+            User.name.label('user_name'),
+            Submission.task_id,
+            Task.title.label('task_title'),
+            Lesson.title.label('lesson_title'),
+            Submission.created_at,
+        )
         .join(User, User.id == Submission.user_id)
         .join(Task, Task.id == Submission.task_id)
         .join(Lesson, Lesson.id == Task.lesson_id)
         .where(Submission.status == "pending")
-        .order_by(Submission.created_at.asc())
+        .order_by(Submission.created_at.asc(), Submission.id.asc())
+        .limit(limit + 1)
     )
+    if cursor:
+        after_created_at, after_id = _decode_pending_cursor(cursor)
+        stmt = stmt.where(tuple_(Submission.created_at, Submission.id) > tuple_(after_created_at, after_id))
+    sync_cursor = _current_change_seq(db)
     rows = db.execute(stmt).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = f"{last.created_at.isoformat()}_{last.id}"
+    total = db.execute(select(func.count()).select_from(Submission).where(Submission.status == "pending")).scalar()
+    now = datetime.utcnow()
     out = []
-    for s, user_name_val, task_title, task_description, lesson_title in rows:
-        out.append({
-            "id": s.id,
-            "user_name": user_name_val,
-            "lesson_title": lesson_title,
-            "task_title": task_title,
-            "task_description": task_description,
-            "code": s.code,
-            "created_at": s.created_at,
-        })
-    return out
+    for row in rows:
+        item = row._asdict()
+        item["age_seconds"] = int((now - row.created_at).total_seconds())
+        out.append(item)
+    return ORJSONResponse({"data": out, "total": total, "next_cursor": next_cursor, "sync_cursor": sync_cursor})
+
+
+def _current_change_seq(db: Session) -> int:
+    return db.execute(select(func.max(Submission.change_seq))).scalar() or 0
+
+
+CHANGES_MAX_LIMIT = 1000
+
+
+@router.get("/submissions/changes")
+def list_submission_changes(since: int = 0, limit: int = 200, _: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
+    """Submissions written after change cursor ``since``, oldest change first.
+
+    Start from the ``sync_cursor`` of /submissions or /submissions/pending
+    and pass back ``cursor`` each time; ``has_more`` means call again right
+    away. Rows come with the same columns as /submissions; ``pending_total``
+    is the current size of the review queue. Deleted submissions are not
+    reported.
+    """
+    limit = max(1, min(limit, CHANGES_MAX_LIMIT))
+    columns = (
+        Submission.id,
+        Submission.user_id,
+        User.name.label('user_name'),
+        Task.lesson_id,
+        Lesson.title.label('lesson_title'),
+        Submission.task_id,
+        Task.title.label('task_title'),
+        Submission.is_correct,
+        Submission.result,
+        Submission.status,
+        Submission.code,
+        Submission.created_at,
+        Submission.change_seq,
+    )
+    base_stmt = (
+        select(*columns)
+        .join(User, User.id == Submission.user_id)
+        .join(Task, Task.id == Submission.task_id)
+        .join(Lesson, Lesson.id == Task.lesson_id)
+    )
+    rows = db.execute(
+        base_stmt.where(Submission.change_seq > since)
+        .order_by(Submission.change_seq, Submission.id)
+        .limit(limit + 1)
+    ).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if has_more:
+        # A bulk review shares one sequence number across its rows; never stop halfway through it
+        last = rows[-1]
+        rows += db.execute(
+            base_stmt.where(Submission.change_seq == last.change_seq, Submission.id > last.id).order_by(Submission.id)
+        ).all()
+    cursor = rows[-1].change_seq if rows else since
+    pending_total = db.execute(select(func.count()).select_from(Submission).where(Submission.status == "pending")).scalar()
+    return ORJSONResponse({
+        "data": [row._asdict() for row in rows],
+        "cursor": cursor,
+        "has_more": has_more,
+        "pending_total": pending_total,
+    })
+
+
+@router.get("/submissions/stream")
+async def submission_change_stream(token: str):
+    """SSE nudges (``submissions_changed``) whenever submissions are written.
+
+    Carries no rows: on each event, fetch /submissions/changes?since=cursor.
+    EventSource cannot send headers, so the admin token comes in the query.
+    """
+    _admin_payload(token)
+    return sse_response(ADMIN_CHANNEL)
+
+
+@router.get("/submissions/{submission_id}")
+def get_submission_detail(submission_id: int, _: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
+    row = db.execute(
+        select(
+            Submission.id,
+            Submission.user_id,
+            User.name.label('user_name'),
+            Submission.task_id,
+            Task.title.label('task_title'),
+            Task.description.label('task_description'),
+            Task.kind.label('task_kind'),
+            Lesson.title.label('lesson_title'),
+            Submission.code,
+            Submission.answer,
+            Submission.is_correct,
+            Submission.result,
+            Submission.status,
+            Submission.created_at,
+        )
+        .join(User, User.id == Submission.user_id)
+        .join(Task, Task.id == Submission.task_id)
+        .join(Lesson, Lesson.id == Task.lesson_id)
+        .where(Submission.id == submission_id)
+    ).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Submission not found")
+    return ORJSONResponse(row._asdict())
+
+
+@router.get("/submissions/{submission_id}/similar")
+def get_similar_submissions(
+    submission_id: int,
+    threshold: float = 0.5,
+    limit: int = 20,
+    include_same_user: bool = False,
+    _: dict = Depends(get_current_admin),
+    db: Session = Depends(get_db),
+):
+    """Other students' submissions to the same task with near-duplicate code, most similar first."""
+    matches = similar_submissions(db, submission_id, threshold, max(1, min(limit, 100)), include_same_user)
+    if matches is None:
+        raise HTTPException(status_code=404, detail="Submission not found")
+    return ORJSONResponse({"data": matches})
+
 
 @router.post("/submissions/{submission_id}/review")
 def review_submission(submission_id: int, data: dict, _: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
@@ -144,9 +294,63 @@ def review_submission(submission_id: int, data: dict, _: dict = Depends(get_curr
     submission.result = comment if comment else ("Правильно" if is_correct else "Неправильно")
     
     db.flush()
+    publish_submission_change(db, submission.user_id, submission_event(
+        submission.id, submission.task_id, submission.status, submission.is_correct, submission.result, submission.created_at,
+    ))
     return {"status": "reviewed", "is_correct": is_correct}
 
 
+REVIEW_BATCH_MAX_ITEMS = 5000
+
+
+@router.post("/submissions/review-batch")
+def review_submissions_batch(payload: ReviewBatch, _: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
+    if len(payload.items) > REVIEW_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {REVIEW_BATCH_MAX_ITEMS} items per batch")
+
+    # Last verdict wins when the same submission appears twice
+    verdicts = {item.id: item for item in payload.items}
+    existing = {
+        row.id: row
+        for row in db.execute(
+            select(Submission.id, Submission.user_id, Submission.task_id, Submission.created_at)
+            .where(Submission.id.in_(verdicts))
+        )
+    }
+
+    # One UPDATE per distinct (is_correct, result) pair instead of one per submission
+    groups: dict[tuple[bool, str], list[int]] = {}
+    for submission_id, item in verdicts.items():
+        if submission_id in existing:
+            result = item.comment if item.comment else ("Правильно" if item.is_correct else "Неправильно")
+            groups.setdefault((item.is_correct, result), []).append(submission_id)
+    for (is_correct, result), ids in groups.items():
+        db.execute(
+            update(Submission)
+            .where(Submission.id.in_(ids))
+            .values(is_correct=is_correct, status="completed", result=result, change_seq=next_change_seq())
+            .execution_options(synchronize_session=False)
+        )
+        for submission_id in ids:
+            row = existing[submission_id]
+            publish_submission_change(db, row.user_id, submission_event(
+                submission_id, row.task_id, "completed", is_correct, result, row.created_at,
+            ))
+    db.flush()
+
+    # Earlier entries for a repeated id were overridden and are reported as such,
+    # so every "reviewed" outcome matches what is stored
+    outcomes = [
+        {"id": item.id, "status": "not_found"}
+        if item.id not in existing
+        else {"id": item.id, "status": "superseded"}
+        if verdicts[item.id] is not item
+        else {"id": item.id, "status": "reviewed", "is_correct": item.is_correct}
+        for item in payload.items
+    ]
+    return {"reviewed": sum(len(ids) for ids in groups.values()), "results": outcomes}
+
+
 @router.post("/languages")
 def create_language(data: dict, _: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
     lang_id = str(data.get("id", "")).lower().replace(" ", "_")
@@ -183,7 +387,6 @@ def list_languages_admin(_: dict = Depends(get_current_admin), db: Session = Dep
             "is_custom": is_custom,
             "image_url": image_url or ""
         })
-        print(f"Language {lang_id}: image_url = {image_url!r}")
     return output
 
 
@@ -197,28 +400,24 @@ def update_language(lang_id: str, data: dict, _: dict = Depends(get_current_admi
         language.name = str(data["name"]).strip()
     if "image_url" in data:
         # Only update if not empty string (to avoid overwriting uploaded image)
-        if data["image_url"]:
+        if data["image_url"] and data["image_url"] != language.image_url:
             language.image_url = data["image_url"]
-        print(f"PUT /languages/{lang_id}: image_url in data = {data.get('image_url')!r}, saved = {language.image_url!r}")
+            language.image_variants = None
+        logger.debug("Language image_url update", extra={"language": lang_id, "requested": data.get("image_url"), "saved": language.image_url})
 
     db.flush()
     return {"id": language.id, "name": language.name, "is_custom": language.is_custom, "image_url": language.image_url}
 
 
 @router.delete("/languages/{lang_id}")
-def delete_language(lang_id: str, _: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
+def delete_language(lang_id: str, background_tasks: BackgroundTasks, _: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
     language = db.get(Language, lang_id)
     if not language:
         raise HTTPException(status_code=404, detail="Language not found")
 
-    # Delete associated image file if exists
-    if language.image_url and language.image_url.startswith("/uploads/"):
-        try:
-            file_path = os.path.join(UPLOAD_DIR, os.path.basename(language.image_url))
-            if os.path.exists(file_path):
-                os.remove(file_path)
-        except Exception:
-            pass  # Ignore errors when deleting files
+    # Delete the image file after the commit, unless another language still uses it
+    if language.image_url:
+        background_tasks.add_task(remove_unreferenced_upload, UPLOAD_DIR, language.image_url)
 
     db.delete(language)
     db.flush()
@@ -226,14 +425,15 @@ def delete_language(lang_id: str, _: dict = Depends(get_current_admin), db: Sess
 
 
 @router.post("/languages/{lang_id}/upload-image")
-def upload_language_image(
+async def upload_language_image(
     lang_id: str,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     _: dict = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
     """Upload an image file for a language."""
-    language = db.get(Language, lang_id)
+    language = await run_in_threadpool(db.get, Language, lang_id)
     if not language:
         raise HTTPException(status_code=404, detail="Language not found")
 
@@ -242,46 +442,35 @@ def upload_language_image(
     if file.content_type not in allowed_types:
         raise HTTPException(status_code=400, detail=f"Invalid file type. Allowed: {', '.join(allowed_types)}")
 
-    # Generate unique filename
-    file_ext = os.path.splitext(file.filename)[1].lower()
-    if not file_ext:
-        # Determine extension from content type
-        ext_map = {
-            "image/jpeg": ".jpg",
-            "image/png": ".png",
-            "image/gif": ".gif",
-            "image/webp": ".webp",
-            "image/svg+xml": ".svg"
-        }
-        file_ext = ext_map.get(file.content_type, ".png")
-    
-    filename = f"lang_{lang_id}_{os.urandom(4).hex()}{file_ext}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
+    ext_map = {
+        "image/jpeg": ".jpg",
+        "image/png": ".png",
+        "image/gif": ".gif",
+        "image/webp": ".webp",
+        "image/svg+xml": ".svg"
+    }
+    file_ext = ext_map[file.content_type]
 
-    # Save file
+    # Named by content hash: identical uploads share one file
+    filename = await save_upload(file, UPLOAD_DIR, file_ext, UPLOAD_MAX_BYTES)
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
-    finally:
-        file.file.close()
-
-    # Delete old image if exists
-    if language.image_url and language.image_url.startswith("/uploads/"):
-        try:
-            old_file_path = os.path.join(UPLOAD_DIR, os.path.basename(language.image_url))
-            if os.path.exists(old_file_path) and old_file_path != file_path:
-                os.remove(old_file_path)
-        except Exception:
-            pass
+        await run_in_threadpool(check_image, os.path.join(UPLOAD_DIR, filename))
+    except ValueError as e:
+        await run_in_threadpool(remove_unreferenced_upload, UPLOAD_DIR, f"/uploads/{filename}")
+        raise HTTPException(status_code=400, detail=str(e))
 
-    # Update language with new image URL
+    old_image_url = language.image_url
     image_url = f"/uploads/{filename}"
     language.image_url = image_url
-    db.flush()  # Flush changes to the session
+    language.image_variants = None
+    await run_in_threadpool(db.flush)
 
-    print(f"Updated language {language.id}: image_url = {language.image_url!r}")
+    # Thumbnails are built after the response; until then clients fall back to the original
+    background_tasks.add_task(generate_language_variants, UPLOAD_DIR, language.id, image_url)
+
+    # Remove the previous image after the commit, unless another language still uses it
+    if old_image_url and old_image_url != image_url:
+        background_tasks.add_task(remove_unreferenced_upload, UPLOAD_DIR, old_image_url)
 
     return {"id": language.id, "name": language.name, "image_url": image_url}
 
@@ -303,8 +492,7 @@ def create_lesson(data: dict, _: dict = Depends(get_current_admin), db: Session
     if provided_order is not None:
         order_index = int(provided_order)
     else:
-        last = db.execute(select(Lesson).where(Lesson.language == language).order_by(Lesson.order_index.desc())).scalars().first()
-        order_index = (last.order_index + 1) if last else 1
+        order_index = next_order_index(db, Lesson, Lesson.language, language)
     lesson = Lesson(language=language, language_id=language, title=title, order_index=order_index)
     db.add(lesson)
     db.flush()
@@ -312,7 +500,8 @@ def create_lesson(data: dict, _: dict = Depends(get_current_admin), db: Session
 
 @router.get("/lessons", response_model=list[LessonOut])
 def list_lessons_admin(_: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
-    return db.execute(select(Lesson).order_by(Lesson.language, Lesson.order_index)).scalars().all()
+    stmt = select(Lesson.id, Lesson.language, Lesson.title, Lesson.order_index).order_by(Lesson.language, Lesson.order_index)
+    return ORJSONResponse([row._asdict() for row in db.execute(stmt)])
 
 @router.get("/lessons/{lesson_id}/additional-info")
 def get_lesson_additional_info(lesson_id: int, _: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
@@ -343,41 +532,64 @@ def update_lesson(lesson_id: int, data: dict, _: dict = Depends(get_current_admi
     db.flush()
     return {"id": lesson.id, "title": lesson.title}
 
-@router.post("/lessons/{lesson_id}/move")
-def move_lesson(lesson_id: int, data: dict, _: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
-    lesson = db.get(Lesson, lesson_id)
-    if not lesson:
-        raise HTTPException(status_code=404, detail="Lesson not found")
-    
-    direction = data.get("direction")  # "up" or "down"
-    if direction not in ["up", "down"]:
-        raise HTTPException(status_code=400, detail="Direction must be 'up' or 'down'")
-    
-    # Find adjacent lesson with same language
+def _apply_move(db: Session, item, scope_column, scope_value, data: MoveRequest) -> dict:
+    """Shared body of the lesson/task move endpoints.
+
+    Accepts {"direction": "up"|"down"} (swap with the neighbour),
+    {"after_id": id|null} or {"position": n} (0-based).
+    """
+    model = type(item)
+    if "after_id" in data.model_fields_set:
+        move_after(db, item, scope_column, scope_value, data.after_id)
+        return {"status": "moved", "order_index": item.order_index}
+    if data.position is not None:
+        after_id = id_at_position(db, model, scope_column, scope_value, data.position, item.id)
+        move_after(db, item, scope_column, scope_value, after_id)
+        return {"status": "moved", "order_index": item.order_index}
+
+    direction = data.direction
+    if direction is None:
+        raise HTTPException(status_code=400, detail="Provide after_id, position, or direction 'up'/'down'")
+
+    # Find adjacent item in the same scope
     if direction == "up":
         adjacent = db.execute(
-            select(Lesson)
-            .where(Lesson.language == lesson.language)
-            .where(Lesson.order_index < lesson.order_index)
-            .order_by(Lesson.order_index.desc())
+            select(model)
+            .where(scope_column == scope_value)
+            .where(model.order_index < item.order_index)
+            .order_by(model.order_index.desc())
         ).scalars().first()
     else:
         adjacent = db.execute(
-            select(Lesson)
-            .where(Lesson.language == lesson.language)
-            .where(Lesson.order_index > lesson.order_index)
-            .order_by(Lesson.order_index.asc())
+            select(model)
+            .where(scope_column == scope_value)
+            .where(model.order_index > item.order_index)
+            .order_by(model.order_index.asc())
         ).scalars().first()
-    
+
     if adjacent:
         # Swap order_index values
-        temp = lesson.order_index
-        lesson.order_index = adjacent.order_index
+        temp = item.order_index
+        item.order_index = adjacent.order_index
         adjacent.order_index = temp
         db.flush()
-    
+
     return {"status": "moved", "direction": direction}
 
+
+@router.post("/lessons/{lesson_id}/move")
+def move_lesson(lesson_id: int, data: MoveRequest, _: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
+    lesson = db.get(Lesson, lesson_id)
+    if not lesson:
+        raise HTTPException(status_code=404, detail="Lesson not found")
+    return _apply_move(db, lesson, Lesson.language, lesson.language, data)
+
+
+@router.put("/languages/{lang_id}/lessons/order")
+def reorder_lessons(lang_id: str, data: ReorderRequest, _: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
+    reorder(db, Lesson, Lesson.language, lang_id, data.ids)
+    return {"status": "reordered", "count": len(data.ids)}
+
 @router.delete("/lessons/{lesson_id}")
 def delete_lesson(lesson_id: int, _: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
     lesson = db.get(Lesson, lesson_id)
@@ -411,10 +623,7 @@ def create_task(lesson_id: int, data: dict, _: dict = Depends(get_current_admin)
     test_spec = data.get("test_spec")
     
     # Compute next order_index for this lesson
-    last_task = db.execute(
-        select(Task).where(Task.lesson_id == lesson_id).order_by(Task.order_index.desc())
-    ).scalars().first()
-    order_index = (last_task.order_index + 1) if last_task else 1
+    order_index = next_order_index(db, Task, Task.lesson_id, lesson_id)
     
     task = Task(lesson_id=lesson_id, title=title, description=description, kind=kind, test_spec=json.dumps(test_spec) if isinstance(test_spec, (dict, list)) else test_spec, order_index=order_index)
     db.add(task)
@@ -434,7 +643,7 @@ def create_task_auto(data: dict, _: dict = Depends(get_current_admin), db: Sessi
         lesson = db.execute(select(Lesson).where(Lesson.language == language).order_by(Lesson.order_index)).scalars().first()
     if not lesson:
         # create auto lesson
-        lesson = Lesson(language=language, title=f"{language.title()} Auto Lesson", order_index=1)
+        lesson = Lesson(language=language, title=f"{language.title()} Auto Lesson", order_index=next_order_index(db, Lesson, Lesson.language, language))
         db.add(lesson)
         db.flush()
     title = str(data.get("title", "Task"))
@@ -443,10 +652,7 @@ def create_task_auto(data: dict, _: dict = Depends(get_current_admin), db: Sessi
     test_spec = data.get("test_spec")
     
     # Compute next order_index for this lesson
-    last_task = db.execute(
-        select(Task).where(Task.lesson_id == lesson.id).order_by(Task.order_index.desc())
-    ).scalars().first()
-    order_index = (last_task.order_index + 1) if last_task else 1
+    order_index = next_order_index(db, Task, Task.lesson_id, lesson.id)
     
     task = Task(lesson_id=lesson.id, title=title, description=description, kind=kind, test_spec=json.dumps(test_spec) if isinstance(test_spec, (dict, list)) else test_spec, order_index=order_index)
     db.add(task)
@@ -464,104 +670,261 @@ def delete_task(task_id: int, _: dict = Depends(get_current_admin), db: Session
     db.flush()
     return {"status": "deleted"}
 
+@router.get("/tasks/{task_id}/similarity-clusters")
+def get_task_similarity_clusters(task_id: int, threshold: float = 0.7, _: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
+    """Groups of near-identical submissions from different students to one task, largest first."""
+    if db.get(Task, task_id) is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return ORJSONResponse({"data": task_clusters(db, task_id, threshold)})
+
+
 @router.post("/tasks/{task_id}/move")
-def move_task(task_id: int, data: dict, _: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
+def move_task(task_id: int, data: MoveRequest, _: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
     task = db.get(Task, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
-    
-    direction = data.get("direction")  # "up" or "down"
-    if direction not in ["up", "down"]:
-        raise HTTPException(status_code=400, detail="Direction must be 'up' or 'down'")
-    
-    # Find adjacent task with same lesson_id
-    if direction == "up":
-        adjacent = db.execute(
-            select(Task)
-            .where(Task.lesson_id == task.lesson_id)
-            .where(Task.order_index < task.order_index)
-            .order_by(Task.order_index.desc())
-        ).scalars().first()
-    else:
-        adjacent = db.execute(
-            select(Task)
-            .where(Task.lesson_id == task.lesson_id)
-            .where(Task.order_index > task.order_index)
-            .order_by(Task.order_index.asc())
-        ).scalars().first()
-    
-    if adjacent:
-        # Swap order_index values
-        temp = task.order_index
-        task.order_index = adjacent.order_index
-        adjacent.order_index = temp
-        db.flush()
-    
-    return {"status": "moved", "direction": direction}
+    return _apply_move(db, task, Task.lesson_id, task.lesson_id, data)
+
+
+@router.put("/lessons/{lesson_id}/tasks/order")
+def reorder_tasks(lesson_id: int, data: ReorderRequest, _: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
+    reorder(db, Task, Task.lesson_id, lesson_id, data.ids)
+    return {"status": "reordered", "count": len(data.ids)}
 
 @router.get("/export/submissions.csv")
-def export_submissions_csv(_: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
+def export_submissions_csv(_: dict = Depends(get_current_admin)):
     import io, csv
-    rows = db.execute(select(Submission).order_by(Submission.created_at)).scalars().all()
-    buf = io.StringIO()
-    writer = csv.writer(buf)
-    writer.writerow(["id", "user_id", "task_id", "is_correct", "result", "created_at"])
-    for r in rows:
-        writer.writerow([r.id, r.user_id, r.task_id, int(r.is_correct), r.result or "", r.created_at.isoformat()])
-    csv_text = buf.getvalue()
-    return Response(content=csv_text, media_type="text/csv")
+
+    def generate():
+        # The request session is closed before a streaming body runs, so use our own
+        with get_session() as session:
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            writer.writerow(["id", "user_id", "task_id", "is_correct", "result", "created_at"])
+            stmt = select(
+                Submission.id, Submission.user_id, Submission.task_id, Submission.is_correct, Submission.result, Submission.created_at
+            ).order_by(Submission.created_at)
+            for i, (sid, user_id, task_id, is_correct, result, created_at) in enumerate(session.execute(stmt.execution_options(yield_per=1000)), 1):
+                writer.writerow([sid, user_id, task_id, int(is_correct), result or "", created_at.isoformat()])
+                if i % 1000 == 0:
+                    yield buf.getvalue()
+                    buf.seek(0)
+                    buf.truncate()
+            yield buf.getvalue()
+
+    return StreamingResponse(generate(), media_type="text/csv")
+
+
+@router.get("/languages/{lang_id}/content.ndjson")
+def export_language_content(lang_id: str, _: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
+    """Stream a language's lessons as NDJSON, one lesson with its tasks per line."""
+    if not db.get(Language, lang_id):
+        raise HTTPException(status_code=404, detail="Language not found")
+
+    def generate():
+        with get_session() as session:
+            lesson_rows = session.execute(
+                select(Lesson.id, Lesson.title, Lesson.order_index, Lesson.additional_info)
+                .where(Lesson.language == lang_id)
+                .order_by(Lesson.order_index)
+            ).all()
+            # Tasks are fetched for a chunk of lessons at a time rather than per lesson
+            for start in range(0, len(lesson_rows), 200):
+                chunk = lesson_rows[start:start + 200]
+                tasks_by_lesson: dict[int, list[dict]] = {}
+                task_rows = session.execute(
+                    select(Task.lesson_id, Task.title, Task.description, Task.kind, Task.test_spec, Task.order_index)
+                    .where(Task.lesson_id.in_([row.id for row in chunk]))
+                    .order_by(Task.lesson_id, Task.order_index)
+                )
+                for task in task_rows:
+                    item = task._asdict()
+                    tasks_by_lesson.setdefault(item.pop("lesson_id"), []).append(item)
+                lines = []
+                for row in chunk:
+                    lesson = row._asdict()
+                    lesson["tasks"] = tasks_by_lesson.get(lesson.pop("id"), [])
+                    lines.append(json.dumps(lesson, ensure_ascii=False))
+                yield "\n".join(lines) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+def _import_errors(e: ValidationError) -> list[dict]:
+    # JSON-safe and without the offending input echoed back
+    return e.errors(include_url=False, include_context=False, include_input=False)
+
+
+def _parse_import_line(line: bytes, line_no: int) -> LessonImport:
+    try:
+        return LessonImport.model_validate_json(line)
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail={"line": line_no, "errors": _import_errors(e)})
+
+
+def _import_language_content(lang_id: str, lessons: list[LessonImport], replace: bool) -> dict:
+    with get_session() as session:
+        if not session.get(Language, lang_id):
+            raise HTTPException(status_code=404, detail="Language not found")
+        if replace:
+            lesson_ids = select(Lesson.id).where(Lesson.language == lang_id)
+            task_ids = select(Task.id).where(Task.lesson_id.in_(lesson_ids))
+            session.execute(delete(Submission).where(Submission.task_id.in_(task_ids)))
+            session.execute(delete(Task).where(Task.lesson_id.in_(lesson_ids)))
+            session.execute(delete(Lesson).where(Lesson.language == lang_id))
+            base = 0
+        else:
+            base = session.execute(select(func.max(Lesson.order_index)).where(Lesson.language == lang_id)).scalar() or 0
+
+        lesson_rows = [
+            {
+                "language": lang_id,
+                "language_id": lang_id,
+                "title": lesson.title,
+                "order_index": lesson.order_index if lesson.order_index is not None else base + i * ORDER_GAP,
+                "additional_info": lesson.additional_info,
+            }
+            for i, lesson in enumerate(lessons, 1)
+        ]
+        lesson_ids = []
+        if lesson_rows:
+            lesson_ids = session.execute(
+                insert(Lesson).returning(Lesson.id, sort_by_parameter_order=True), lesson_rows
+            ).scalars().all()
+
+        task_rows = []
+        for lesson_id, lesson in zip(lesson_ids, lessons):
+            for i, task in enumerate(lesson.tasks, 1):
+                task_rows.append({
+                    "lesson_id": lesson_id,
+                    "title": task.title,
+                    "description": task.description,
+                    "kind": task.kind,
+                    "test_spec": json.dumps(task.test_spec) if isinstance(task.test_spec, (dict, list)) else task.test_spec,
+                    "order_index": task.order_index if task.order_index is not None else i * ORDER_GAP,
+                })
+        for start in range(0, len(task_rows), 1000):
+            session.execute(insert(Task), task_rows[start:start + 1000])
+        return {"status": "imported", "lessons": len(lesson_rows), "tasks": len(task_rows)}
+
+
+@router.post("/languages/{lang_id}/content")
+async def import_language_content(lang_id: str, request: Request, replace: bool = False, _: dict = Depends(get_current_admin)):
+    """Bulk-import lessons and tasks.
+
+    Accepts NDJSON (one LessonImport per line, parsed as the body streams in)
+    or a JSON array of lessons. Everything is validated before anything is
+    written, then inserted in one transaction.
+    """
+    lessons: list[LessonImport] = []
+    if "ndjson" in request.headers.get("content-type", ""):
+        pending = b""
+        line_no = 0
+        async for chunk in request.stream():
+            pending += chunk
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                line_no += 1
+                if line.strip():
+                    lessons.append(_parse_import_line(line, line_no))
+        if pending.strip():
+            lessons.append(_parse_import_line(pending, line_no + 1))
+    else:
+        try:
+            data = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be NDJSON or a JSON array of lessons")
+        if not isinstance(data, list):
+            raise HTTPException(status_code=400, detail="Body must be NDJSON or a JSON array of lessons")
+        for i, item in enumerate(data, 1):
+            try:
+                lessons.append(LessonImport.model_validate(item))
+            except ValidationError as e:
+                raise HTTPException(status_code=400, detail={"item": i, "errors": _import_errors(e)})
+    return await run_in_threadpool(_import_language_content, lang_id, lessons, replace)
 
 
 # Competition endpoints
-@router.get("/competition/room")
-def get_competition_room(_: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
-    room = db.execute(select(CompetitionRoom)).scalars().first()
-    if not room:
-        room = CompetitionRoom()
-        db.add(room)
-        db.flush()
+def _room_out(room: CompetitionRoom) -> dict:
     return {
         "id": room.id,
         "name": room.name,
+        "join_code": room.join_code,
         "game_time": room.game_time,
         "difficulty": room.difficulty,
-        "is_active": room.is_active
+        "is_active": room.is_active,
+        "worker": room_worker(room.id),
     }
 
 
-@router.put("/competition/room")
-def update_competition_room(data: dict, _: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
-    room = db.execute(select(CompetitionRoom)).scalars().first()
+def _get_room(db: Session, room_id: int) -> CompetitionRoom:
+    room = db.get(CompetitionRoom, room_id)
     if not room:
-        room = CompetitionRoom()
-        db.add(room)
+        raise HTTPException(status_code=404, detail="Room not found")
+    return room
+
+
+@router.get("/competition/rooms")
+def list_competition_rooms(_: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
+    rooms = db.execute(select(CompetitionRoom).order_by(CompetitionRoom.created_at.desc())).scalars().all()
+    return [_room_out(room) for room in rooms]
+
+
+@router.post("/competition/rooms")
+def create_competition_room(data: dict, _: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
+    room = CompetitionRoom(
+        name=str(data.get("name") or "Typing Competition").strip(),
+        game_time=int(data.get("game_time", 60)),
+        difficulty=int(data.get("difficulty", 2)),
+        is_active=False,
+    )
+    # Codes are random; retry on the rare collision with an existing room
+    for _attempt in range(10):
+        code = generate_join_code()
+        if db.execute(select(CompetitionRoom.id).where(CompetitionRoom.join_code == code)).first() is None:
+            room.join_code = code
+            break
+    else:
+        raise HTTPException(status_code=500, detail="Could not allocate a join code")
+    db.add(room)
+    db.flush()
+    return _room_out(room)
+
 
+@router.get("/competition/rooms/{room_id}")
+def get_competition_room(room_id: int, _: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
+    return _room_out(_get_room(db, room_id))
+
+
+@router.put("/competition/rooms/{room_id}")
+def update_competition_room(room_id: int, data: dict, _: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
+    require_room_owner(room_id)
+    room = _get_room(db, room_id)
+    if "name" in data:
+        room.name = str(data["name"]).strip()
     room.game_time = data.get("game_time", room.game_time)
     room.difficulty = data.get("difficulty", room.difficulty)
+    if data.get("is_active") and not room.is_active:
+        room.started_at = datetime.utcnow()
     room.is_active = data.get("is_active", room.is_active)
     db.flush()
+    competition_engine.apply_settings_after_commit(db, room)
     return {"status": "updated"}
 
 
-@router.get("/competition/participants")
-def get_competition_participants(_: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
-    room = db.execute(select(CompetitionRoom)).scalars().first()
-    if not room:
-        return []
+@router.delete("/competition/rooms/{room_id}")
+def delete_competition_room(room_id: int, _: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
+    require_room_owner(room_id)
+    room = _get_room(db, room_id)
+    db.delete(room)
+    db.flush()
+    competition_engine.drop(room_id)
+    return {"status": "deleted"}
 
-    participants = db.execute(
-        select(CompetitionParticipant)
-        .where(CompetitionParticipant.room_id == room.id)
-        .order_by(CompetitionParticipant.score.desc())
-    ).scalars().all()
 
-    return [{
-        "id": p.id,
-        "user_name": p.user_name,
-        "score": p.score,
-        "is_connected": p.is_connected,
-        "user_id": p.user_id
-    } for p in participants]
+@router.get("/competition/rooms/{room_id}/participants")
+def get_competition_participants(room_id: int, _: dict = Depends(get_current_admin)):
+    return competition_engine.room(room_id).leaderboard(include_user_id=True)
 
 
 @router.get("/competition/participants/{user_id}/submissions")
@@ -597,24 +960,24 @@ def get_competition_user_submissions(
     return out
 
 
-@router.post("/competition/start")
-def start_competition(_: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
-    room = db.execute(select(CompetitionRoom)).scalars().first()
-    if not room:
-        room = CompetitionRoom()
-        db.add(room)
-
+@router.post("/competition/rooms/{room_id}/start")
+def start_competition(room_id: int, _: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
+    require_room_owner(room_id)
+    room = _get_room(db, room_id)
     room.is_active = True
+    room.started_at = datetime.utcnow()
     db.flush()
+    competition_engine.apply_settings_after_commit(db, room)
     return {"status": "started"}
 
 
-@router.post("/competition/stop")
-def stop_competition(_: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
-    room = db.execute(select(CompetitionRoom)).scalars().first()
-    if room:
-        room.is_active = False
-        db.flush()
+@router.post("/competition/rooms/{room_id}/stop")
+def stop_competition(room_id: int, _: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
+    require_room_owner(room_id)
+    room = _get_room(db, room_id)
+    room.is_active = False
+    db.flush()
+    competition_engine.apply_settings_after_commit(db, room)
+    # Final scores are written through rather than waiting for the next batch
+    competition_engine.persist(room.id, session=db)
     return {"status": "stopped"}
-
-
@@ -1,22 +1,38 @@
 from __future__ import annotations
 
 import json
+import math
 from datetime import datetime
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Header
-from sqlalchemy import select
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Header, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
-from ..auth import create_access_token, decode_token
+from ..auth import CurrentUser, create_access_token, decode_token, user_cache
+from ..config import GRADING_QUEUE_MAX, RATE_LIMITS
 from ..db import get_session
-from ..models import Language, Lesson, Task, Submission, User, CompetitionRoom, CompetitionParticipant
+from ..models import Language, Lesson, Task, Submission, User, CompetitionRoom
 from ..checker import run_python_tests
-from ..schemas import UserCreate, UserOut, LessonOut, TaskOut, SubmitQuiz, SubmitCode, SubmissionOut
+from ..images import variant_urls
+from ..metrics import registry
+from ..events import publish_submission_change, sse_response, submission_event
+from ..competition import competition_engine, leaderboard_hub, room_worker
+from ..words import get_word_pool
+from ..ratelimit import QueueAdmission, RateLimiter, parse_budgets
+from ..schemas import UserCreate, UserOut, LessonOut, TaskOut, SubmitQuiz, SubmitCode, SubmissionOut, ScoreUpdate
+from ..similarity import index_new_submission
+from ..tracing import span
 
 
 router = APIRouter(tags=["public"])
 
+WORDS_PAGE_MAX = 1000
+# Seconds a client is told to wait when the review queue is full
+QUEUE_FULL_RETRY_AFTER = 30
+
 
 def get_db() -> Session:
     with get_session() as session:
@@ -41,36 +57,90 @@ def get_user_token(user_id: int, db: Session = Depends(get_db)):
     return {"access_token": token, "token_type": "bearer"}
 
 
-def get_current_user(authorization: Annotated[str | None, Header()] = None, db: Session = Depends(get_db)) -> User:
+def get_current_user(authorization: Annotated[str | None, Header()] = None, db: Session = Depends(get_db)) -> CurrentUser:
     if not authorization or not authorization.lower().startswith("bearer "):
         raise HTTPException(status_code=401, detail="Missing token")
-    token = authorization.split(" ", 1)[1]
+    return _user_for_token(authorization.split(" ", 1)[1], db)
+
+
+def _user_for_token(token: str, db: Session) -> CurrentUser:
+    with span("auth.user", "auth") as current:
+        cached = user_cache.get(token)
+        if current is not None:
+            current.args["cached"] = cached is not None
+        return cached if cached is not None else _load_user(token, db)
+
+
+def _load_user(token: str, db: Session) -> CurrentUser:
     payload = decode_token(token)
     user_id = int(payload.get("sub"))
     user = db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid user")
-    return user
+    current = CurrentUser(id=user.id, name=user.name, is_admin=user.is_admin, created_at=user.created_at)
+    # End the read so the pooled connection goes back before the handler runs: handlers that
+    # wait on the competition engine (which opens its own session) must not hold one meanwhile
+    db.commit()
+    user_cache.put(token, current, payload.get("exp"))
+    return current
+
+
+limiter = RateLimiter(parse_budgets(RATE_LIMITS))
+
+
+def rate_limit(route_class: str):
+    """Dependency: spend one of the caller's tokens for ``route_class`` or answer 429."""
+    async def check(user: CurrentUser = Depends(get_current_user)) -> None:
+        retry_after = limiter.acquire(route_class, user.id)
+        if retry_after:
+            raise HTTPException(status_code=429, detail="Too many requests", headers={"Retry-After": str(math.ceil(retry_after))})
+    return check
+
+
+def _pending_reviews() -> int:
+    with get_session() as session:
+        return session.execute(select(func.count()).select_from(Submission).where(Submission.status == "pending")).scalar_one()
+
+
+review_queue = QueueAdmission("grading", _pending_reviews, GRADING_QUEUE_MAX)
+registry.gauge("app_review_queue_depth", "Code submissions waiting for review (cached for a few seconds).", review_queue.depth)
 
 
 @router.get("/languages")
 def list_languages(db: Session = Depends(get_db)):
-    languages = db.execute(select(Language).order_by(Language.created_at)).scalars().all()
-    return [{"id": lang.id, "name": lang.name, "image_url": lang.image_url} for lang in languages]
+    rows = db.execute(
+        select(Language.id, Language.name, Language.image_url, Language.image_variants).order_by(Language.created_at)
+    ).all()
+    return [
+        {"id": row.id, "name": row.name, "image_url": row.image_url, "image_variants": variant_urls(row.image_variants)}
+        for row in rows
+    ]
 
 
 @router.get("/lessons", response_model=list[LessonOut])
 def list_lessons(language: str, page: int = 1, page_size: int = 50, db: Session = Depends(get_db)):
     offset = (page - 1) * page_size
-    stmt = select(Lesson).where(Lesson.language == language).order_by(Lesson.order_index).offset(offset).limit(page_size)
-    return db.execute(stmt).scalars().all()
+    stmt = (
+        select(Lesson.id, Lesson.language, Lesson.title, Lesson.order_index)
+        .where(Lesson.language == language)
+        .order_by(Lesson.order_index)
+        .offset(offset)
+        .limit(page_size)
+    )
+    return ORJSONResponse([row._asdict() for row in db.execute(stmt)])
 
 
 @router.get("/lessons/{lesson_id}/tasks", response_model=list[TaskOut])
 def list_tasks(lesson_id: int, page: int = 1, page_size: int = 50, db: Session = Depends(get_db)):
     offset = (page - 1) * page_size
-    stmt = select(Task).where(Task.lesson_id == lesson_id).order_by(Task.order_index).offset(offset).limit(page_size)
-    return db.execute(stmt).scalars().all()
+    stmt = (
+        select(Task.id, Task.lesson_id, Task.title, Task.description, Task.kind, Task.test_spec, Task.order_index)
+        .where(Task.lesson_id == lesson_id)
+        .order_by(Task.order_index)
+        .offset(offset)
+        .limit(page_size)
+    )
+    return ORJSONResponse([row._asdict() for row in db.execute(stmt)])
 
 
 @router.get("/lessons/{lesson_id}", response_model=LessonOut)
@@ -82,7 +152,7 @@ def get_lesson(lesson_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/lessons/{lesson_id}/status")
-def lesson_status(lesson_id: int, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def lesson_status(lesson_id: int, user: CurrentUser = Depends(get_current_user), db: Session = Depends(get_db)):
     tasks = db.execute(select(Task).where(Task.lesson_id == lesson_id).order_by(Task.order_index)).scalars().all()
     task_ids = [t.id for t in tasks]
     if not task_ids:
@@ -106,7 +176,7 @@ def get_lesson_additional_info_public(lesson_id: int, db: Session = Depends(get_
     return {"additional_info": lesson.additional_info or ""}
 
 @router.get("/tasks/{task_id}/submission")
-def get_task_submission(task_id: int, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_task_submission(task_id: int, user: CurrentUser = Depends(get_current_user), db: Session = Depends(get_db)):
     # Get the latest submission for this user and task
     submission = db.execute(
         select(Submission)
@@ -125,16 +195,35 @@ def get_task_submission(task_id: int, user: User = Depends(get_current_user), db
         "created_at": submission.created_at,
     }
 
+def _publish_submission(db: Session, submission: Submission) -> None:
+    publish_submission_change(db, submission.user_id, submission_event(
+        submission.id, submission.task_id, submission.status, submission.is_correct, submission.result, submission.created_at,
+    ))
+
+
+@router.get("/events")
+async def user_events(token: str, db: Session = Depends(get_db)):
+    """Server-Sent Events stream of the user's submission state changes.
+
+    EventSource cannot send headers, so the access token comes in the
+    query string. Events: ``submission`` (same fields as
+    GET /tasks/{id}/submission plus task_id) and ``resync`` when the client
+    fell behind and should refetch.
+    """
+    user = await run_in_threadpool(_user_for_token, token, db)
+    return sse_response(user.id)
+
+
 @router.get("/progress")
-def get_my_progress(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_my_progress(user: CurrentUser = Depends(get_current_user), db: Session = Depends(get_db)):
     total_tasks = db.execute(select(Task)).scalars().all()
     user_subs = db.execute(select(Submission).where(Submission.user_id == user.id)).scalars().all()
     solved = sum(1 for s in user_subs if s.is_correct)
     return {"user_id": user.id, "solved": solved, "total": len(total_tasks)}
 
 
-@router.post("/tasks/{task_id}/submit-quiz", response_model=SubmissionOut)
-def submit_quiz(task_id: int, payload: SubmitQuiz, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+@router.post("/tasks/{task_id}/submit-quiz", response_model=SubmissionOut, dependencies=[Depends(rate_limit("grading"))])
+def submit_quiz(task_id: int, payload: SubmitQuiz, user: CurrentUser = Depends(get_current_user), db: Session = Depends(get_db)):
     task = db.get(Task, task_id)
     if not task or task.kind != "quiz":
         raise HTTPException(status_code=404, detail="Task not found or not a quiz")
@@ -148,11 +237,12 @@ def submit_quiz(task_id: int, payload: SubmitQuiz, user: User = Depends(get_curr
     submission = Submission(user_id=user.id, task_id=task.id, answer=payload.answer, is_correct=is_correct, result="correct" if is_correct else "incorrect")
     db.add(submission)
     db.flush()
+    _publish_submission(db, submission)
     return submission
 
 
-@router.post("/tasks/{task_id}/record-test-success")
-def record_test_success(task_id: int, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+@router.post("/tasks/{task_id}/record-test-success", dependencies=[Depends(rate_limit("grading"))])
+def record_test_success(task_id: int, user: CurrentUser = Depends(get_current_user), db: Session = Depends(get_db)):
     """Record that user successfully passed all tests for a task"""
     task = db.get(Task, task_id)
     if not task or task.kind != "code":
@@ -168,6 +258,7 @@ def record_test_success(task_id: int, user: User = Depends(get_current_user), db
     if existing_record:
         # Update existing record with current timestamp
         existing_record.created_at = datetime.utcnow()
+        _publish_submission(db, existing_record)
         db.commit()
         return {"message": "Test success record updated", "id": existing_record.id}
 
@@ -182,6 +273,7 @@ def record_test_success(task_id: int, user: User = Depends(get_current_user), db
     )
     db.add(test_record)
     db.flush()
+    _publish_submission(db, test_record)
 
     return {
         "message": "Test success recorded",
@@ -195,14 +287,25 @@ def record_test_success(task_id: int, user: User = Depends(get_current_user), db
     }
 
 
-@router.post("/tasks/{task_id}/submit-code", response_model=SubmissionOut)
-def submit_code(task_id: int, payload: SubmitCode, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+@router.post("/tasks/{task_id}/submit-code", response_model=SubmissionOut, dependencies=[Depends(rate_limit("grading"))])
+def submit_code(
+    task_id: int,
+    payload: SubmitCode,
+    background_tasks: BackgroundTasks,
+    user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
     task = db.get(Task, task_id)
     if not task or task.kind != "code":
         raise HTTPException(status_code=404, detail="Task not found or not a code task")
 
     # Check if this is an auto-completed submission (from successful test run)
     is_auto_completed = "# AUTO_COMPLETED:" in payload.code
+    # Shed new review work while the queue is already deeper than reviewers can clear
+    if not is_auto_completed and not review_queue.admit():
+        raise HTTPException(
+            status_code=503, detail="Review queue is full, try again later", headers={"Retry-After": str(QUEUE_FULL_RETRY_AFTER)},
+        )
 
     if is_auto_completed:
         # Auto-confirm the submission as correct
@@ -227,6 +330,9 @@ def submit_code(task_id: int, payload: SubmitCode, user: User = Depends(get_curr
 
     db.add(submission)
     db.flush()
+    _publish_submission(db, submission)
+    # Fingerprinting for similarity search runs after the response, in its own transaction
+    background_tasks.add_task(index_new_submission, submission.id, submission.task_id, submission.code)
 
     # Return appropriate response
     if is_auto_completed:
@@ -255,101 +361,69 @@ def submit_code(task_id: int, payload: SubmitCode, user: User = Depends(get_curr
 
 
 # Competition endpoints for users
-@router.get("/competition/room")
-def get_competition_room_public(db: Session = Depends(get_db)):
-    room = db.execute(select(CompetitionRoom)).scalars().first()
-    if not room:
-        room = CompetitionRoom()
-        db.add(room)
-        db.flush()
-    return {
-        "id": room.id,
-        "name": room.name,
-        "game_time": room.game_time,
-        "difficulty": room.difficulty,
-        "is_active": room.is_active
-    }
+@router.get("/competition/rooms/by-code/{join_code}")
+def find_competition_room(join_code: str, db: Session = Depends(get_db)):
+    room_id = db.execute(select(CompetitionRoom.id).where(CompetitionRoom.join_code == join_code.strip().upper())).scalar()
+    if room_id is None:
+        raise HTTPException(status_code=404, detail="Room not found")
+    return {"id": room_id, "worker": room_worker(room_id)}
 
 
-@router.post("/competition/join")
-def join_competition_room(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    room = db.execute(select(CompetitionRoom)).scalars().first()
-    if not room:
-        room = CompetitionRoom()
-        db.add(room)
-        db.flush()
+@router.get("/competition/rooms/{room_id}")
+def get_competition_room_public(room_id: int):
+    return competition_engine.room(room_id).room_dict()
 
-    # Check if user is already in the room
-    existing = db.execute(
-        select(CompetitionParticipant)
-        .where(CompetitionParticipant.room_id == room.id, CompetitionParticipant.user_id == user.id)
-    ).scalars().first()
-
-    if not existing:
-        participant = CompetitionParticipant(
-            room_id=room.id,
-            user_id=user.id,
-            user_name=user.name,
-            score=0,
-            is_connected=True
-        )
-        db.add(participant)
-        db.flush()
-    else:
-        existing.is_connected = True
-        db.flush()
 
+@router.post("/competition/rooms/{room_id}/join")
+def join_competition_room(room_id: int, user: CurrentUser = Depends(get_current_user)):
+    competition_engine.join(room_id, user.id, user.name)
     return {"status": "joined"}
 
 
-@router.get("/competition/participants")
-def get_competition_participants_public(db: Session = Depends(get_db)):
-    room = db.execute(select(CompetitionRoom)).scalars().first()
-    if not room:
-        return []
-
-    participants = db.execute(
-        select(CompetitionParticipant)
-        .where(CompetitionParticipant.room_id == room.id)
-        .order_by(CompetitionParticipant.score.desc())
-    ).scalars().all()
-
-    return [{
-        "id": p.id,
-        "user_name": p.user_name,
-        "score": p.score,
-        "is_connected": p.is_connected
-    } for p in participants]
-
-
-@router.post("/competition/update-score")
-def update_competition_score(data: dict, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    room = db.execute(select(CompetitionRoom)).scalars().first()
-    if not room or not room.is_active:
-        raise HTTPException(status_code=400, detail="No active competition")
-
-    participant = db.execute(
-        select(CompetitionParticipant)
-        .where(CompetitionParticipant.room_id == room.id, CompetitionParticipant.user_id == user.id)
-    ).scalars().first()
-
-    if not participant:
-        raise HTTPException(status_code=404, detail="Participant not found")
-
-    participant.score = data.get("score", participant.score)
-    db.flush()
+@router.get("/competition/rooms/{room_id}/participants")
+def get_competition_participants_public(room_id: int):
+    return competition_engine.room(room_id).leaderboard()
+
+
+@router.websocket("/competition/rooms/{room_id}/ws")
+async def competition_leaderboard_ws(websocket: WebSocket, room_id: int):
+    """Push the room state and leaderboard: a snapshot on connect, then diffs."""
+    await websocket.accept()
+    try:
+        await run_in_threadpool(competition_engine.room, room_id)
+    except HTTPException as e:
+        await websocket.close(code=4000 + e.status_code)
+        return
+    await leaderboard_hub.subscribe(room_id, websocket)
+    try:
+        while True:
+            # Clients only send keep-alives; the server never needs to read them
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        leaderboard_hub.unsubscribe(room_id, websocket)
+
+
+@router.post("/competition/rooms/{room_id}/update-score", dependencies=[Depends(rate_limit("score"))])
+def update_competition_score(room_id: int, data: ScoreUpdate, user: CurrentUser = Depends(get_current_user)):
+    competition_engine.update_score(room_id, user.id, data.score)
     return {"status": "updated"}
 
 
-@router.get("/competition/words")
-def get_competition_words(db: Session = Depends(get_db)):
-    # Simple word list - in real implementation, this could be more sophisticated
-    words = [
-        "hello", "world", "typing", "speed", "competition", "keyboard", "practice", "challenge",
-        "python", "javascript", "programming", "developer", "software", "computer", "algorithm",
-        "function", "variable", "string", "integer", "boolean", "array", "object", "class",
-        "method", "property", "interface", "inheritance", "polymorphism", "encapsulation"
-    ]
-    return {"words": words}
+@router.get("/competition/rooms/{room_id}/words")
+def get_competition_words(room_id: int, offset: int = 0, limit: int = 100):
+    """A page of the room's word stream.
+
+    The stream is seeded per game and follows the room's difficulty, so all
+    participants see the same words in the same order; clients fetch the
+    next page from ``next_offset`` as they run low.
+    """
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="offset must be >= 0")
+    limit = max(1, min(limit, WORDS_PAGE_MAX))
+    state = competition_engine.room(room_id)
+    words = get_word_pool().stream(state.word_seed, state.difficulty, offset, limit)
+    return {"words": words, "difficulty": state.difficulty, "offset": offset, "next_offset": offset + len(words)}
 
 
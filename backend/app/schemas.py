@@ -1,9 +1,9 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Optional, Union
+from typing import Literal, Optional, Union
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class Token(BaseModel):
@@ -55,6 +55,10 @@ class SubmitCode(BaseModel):
     code: str
 
 
+class ScoreUpdate(BaseModel):
+    score: int
+
+
 class SubmissionOut(BaseModel):
     id: int
     user_id: int
@@ -66,3 +70,39 @@ class SubmissionOut(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+
+
+class ReviewItem(BaseModel):
+    id: int
+    is_correct: bool = False
+    comment: str = ""
+
+
+class ReviewBatch(BaseModel):
+    items: list[ReviewItem]
+
+
+class MoveRequest(BaseModel):
+    # after_id (explicitly null = move first), position (0-based) or direction
+    after_id: Optional[int] = None
+    position: Optional[int] = None
+    direction: Optional[Literal["up", "down"]] = None
+
+
+class ReorderRequest(BaseModel):
+    ids: list[int]
+
+
+class TaskImport(BaseModel):
+    title: str = Field(min_length=1, max_length=200)
+    description: str = ""
+    kind: Literal["quiz", "code"] = "quiz"
+    test_spec: Optional[Union[str, dict, list]] = None
+    order_index: Optional[int] = None
+
+
+class LessonImport(BaseModel):
+    title: str = Field(min_length=1, max_length=200)
+    order_index: Optional[int] = None
+    additional_info: Optional[str] = None
+    tasks: list[TaskImport] = []
@@ -4,6 +4,11 @@ from sqlalchemy import select
 
 from .db import get_session
 from .models import Language, Lesson, Task
+from .ordering import ORDER_GAP
+
+# Bump when the default languages or starter lessons below change, so the
+# next startup runs seed_initial_data again instead of taking the fast path
+SEED_VERSION = 1
 
 
 def seed_initial_data() -> None:
@@ -33,7 +38,7 @@ def seed_initial_data() -> None:
         lessons: list[Lesson] = []
         for language in ("python", "csharp"):
             for i in range(1, 6):  # 5 lessons per language
-                lesson = Lesson(language=language, language_id=language, title=f"{language.title()} Lesson {i}", order_index=i)
+                lesson = Lesson(language=language, language_id=language, title=f"{language.title()} Lesson {i}", order_index=i * ORDER_GAP)
                 lessons.append(lesson)
                 # two tasks per lesson: one quiz, one code
                 quiz = Task(
@@ -41,12 +46,14 @@ def seed_initial_data() -> None:
                     description="Select the correct answer (placeholder)",
                     kind="quiz",
                     test_spec="{\"correct\": \"A\"}",
+                    order_index=ORDER_GAP,
                 )
                 code = Task(
                     title=f"Code Task {i}",
                     description="Write a function add(a, b) that returns a + b",
                     kind="code",
                     test_spec="{\"function\": \"add\", \"tests\": [[1,2,3],[5,7,12]]}",
+                    order_index=2 * ORDER_GAP,
                 )
                 lesson.tasks.extend([quiz, code])
 
@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import builtins
+import hashlib
+import io
+import keyword
+import random
+import struct
+import tokenize
+import zlib
+from typing import Any
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from .db import get_session
+from .models import Submission, SubmissionFingerprint, SubmissionLshBand, Task, User
+from .tracing import traced
+
+# Signature length and LSH banding: 16 bands of 4 rows make two submissions
+# with Jaccard similarity s share a bucket with probability 1 - (1 - s^4)^16,
+# about 0.65 at s = 0.5 and 0.999 at s = 0.8
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+# Shingles are runs of this many normalized tokens
+SHINGLE_SIZE = 5
+# Candidates fetched per query; keeps lookups bounded even when one bucket is huge
+# (many identical solutions to a trivial task)
+MAX_CANDIDATES = 500
+# Signatures per LSH bucket that the others are compared with when clustering a task
+MAX_BUCKET_LEADERS = 8
+# Only this much of a submission is fingerprinted; hashing time grows with
+# code size, and a copied solution is recognizable long before this
+MAX_INDEXED_CHARS = 20000
+# Markers written by record-test-success; not code
+NOT_CODE_PREFIX = "AUTO_TEST_SUCCESS"
+
+_PRIME = (1 << 61) - 1
+_MASK = 0xFFFFFFFF
+# Fixed seed: signatures stored in the database must stay comparable across restarts
+_rng = random.Random(0x5EED)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+_SIGNATURE = struct.Struct(f"<{NUM_PERM}I")
+_KEPT_NAMES = frozenset(keyword.kwlist) | frozenset(dir(builtins))
+_DROPPED_TOKENS = frozenset({tokenize.COMMENT, tokenize.NL, tokenize.ENCODING, tokenize.ENDMARKER})
+
+
+def code_tokens(code: str) -> list[str]:
+    """Python tokens with the student's own names, numbers and strings normalized away.
+
+    Keywords, builtins and attribute names (``.append``) are kept, since
+    renaming variables is the usual way to disguise a copy. Code that does
+    not tokenize completely keeps the tokens read before the error.
+    """
+    tokens: list[str] = []
+    previous = ""
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(code).readline):
+            if tok.type in _DROPPED_TOKENS:
+                continue
+            if tok.type == tokenize.NAME:
+                value = tok.string if tok.string in _KEPT_NAMES or previous == "." else "ID"
+            elif tok.type == tokenize.NUMBER:
+                value = "NUM"
+            elif tok.type == tokenize.STRING:
+                value = "STR"
+            elif tok.type in (tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT):
+                value = tokenize.tok_name[tok.type]
+            else:
+                value = tok.string
+            tokens.append(value)
+            previous = tok.string
+    except (tokenize.TokenError, SyntaxError):
+        pass
+    return tokens
+
+
+def shingles(tokens: list[str]) -> set[int]:
+    if len(tokens) <= SHINGLE_SIZE:
+        return {zlib.crc32(" ".join(tokens).encode())} if tokens else set()
+    return {zlib.crc32(" ".join(tokens[i:i + SHINGLE_SIZE]).encode()) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+
+def signature(code: str | None) -> list[int] | None:
+    """MinHash signature of the code's shingles, or None for code with nothing to compare.
+
+    Code beyond MAX_INDEXED_CHARS is ignored.
+    """
+    if not code or code.startswith(NOT_CODE_PREFIX):
+        return None
+    hashed = shingles(code_tokens(code[:MAX_INDEXED_CHARS]))
+    if not hashed:
+        return None
+    return [min(((a * x + b) % _PRIME) & _MASK for x in hashed) for a, b in _PERMUTATIONS]
+
+
+def similarity(a: list[int], b: list[int]) -> float:
+    """Estimated Jaccard similarity of the two submissions' shingle sets."""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def buckets(task_id: int, sig: list[int]) -> list[int]:
+    """One LSH bucket per band, as signed 64-bit ints (SQLite INTEGER).
+
+    The task is part of the key: a copied solution answers the same task,
+    and per-task buckets keep popular tasks from crowding out the rest.
+    """
+    keys = []
+    for band in range(BANDS):
+        raw = struct.pack(f"<qB{ROWS}I", task_id, band, *sig[band * ROWS:(band + 1) * ROWS])
+        keys.append(int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), "little", signed=True))
+    return keys
+
+
+def index_submission(db: Session, submission_id: int, task_id: int, code: str | None) -> bool:
+    """Fingerprint a stored code submission inside the caller's transaction.
+
+    Returns False for submissions without comparable code.
+    """
+    sig = signature(code)
+    if sig is None:
+        return False
+    db.execute(insert(SubmissionFingerprint), [{
+        "submission_id": submission_id, "task_id": task_id, "signature": _SIGNATURE.pack(*sig),
+    }])
+    db.execute(insert(SubmissionLshBand), [{"bucket": key, "submission_id": submission_id} for key in buckets(task_id, sig)])
+    return True
+
+
+@traced("similarity.index", "background")
+def index_new_submission(submission_id: int, task_id: int, code: str) -> None:
+    """Background task: fingerprint a submission after its request committed.
+
+    Keeps hashing off the submit request and out of its transaction.
+    """
+    with get_session() as session:
+        index_submission(session, submission_id, task_id, code)
+
+
+def _member_columns():
+    return (
+        Submission.id,
+        Submission.user_id,
+        User.name.label("user_name"),
+        Submission.task_id,
+        Task.title.label("task_title"),
+        Submission.status,
+        Submission.is_correct,
+        Submission.created_at,
+    )
+
+
+def similar_submissions(db: Session, submission_id: int, threshold: float = 0.5, limit: int = 20, include_same_user: bool = False) -> list[dict[str, Any]] | None:
+    """Submissions to the same task whose code is at least ``threshold`` similar.
+
+    Cost depends on the size of the submission's buckets (capped at
+    MAX_CANDIDATES), not on the number of submissions. A submission that
+    was never fingerprinted (older than the index, see
+    build_similarity_index.py) is compared using a signature computed on
+    the fly. Returns None if the submission does not exist.
+    """
+    target = db.execute(select(Submission.user_id, Submission.task_id, Submission.code).where(Submission.id == submission_id)).first()
+    if target is None:
+        return None
+    stored = db.get(SubmissionFingerprint, submission_id)
+    sig = list(_SIGNATURE.unpack(stored.signature)) if stored is not None else signature(target.code)
+    if sig is None:
+        return []
+    candidates = (
+        select(SubmissionLshBand.submission_id)
+        .where(SubmissionLshBand.bucket.in_(buckets(target.task_id, sig)), SubmissionLshBand.submission_id != submission_id)
+        .distinct()
+        .limit(MAX_CANDIDATES)
+    )
+    stmt = (
+        select(SubmissionFingerprint.signature, *_member_columns())
+        .join(Submission, Submission.id == SubmissionFingerprint.submission_id)
+        .join(User, User.id == Submission.user_id)
+        .join(Task, Task.id == Submission.task_id)
+        .where(SubmissionFingerprint.submission_id.in_(candidates))
+    )
+    if not include_same_user:
+        stmt = stmt.where(Submission.user_id != target.user_id)
+    matches = []
+    for row in db.execute(stmt):
+        score = similarity(sig, _SIGNATURE.unpack(row.signature))
+        if score >= threshold:
+            item = row._asdict()
+            del item["signature"]
+            item["similarity"] = round(score, 3)
+            matches.append(item)
+    matches.sort(key=lambda m: (-m["similarity"], m["id"]))
+    return matches[:limit]
+
+
+def task_clusters(db: Session, task_id: int, threshold: float = 0.7) -> list[dict[str, Any]]:
+    """Groups of a task's submissions linked by similarity >= ``threshold``.
+
+    Submissions with identical signatures are linked outright. Within each
+    LSH bucket, every other signature is compared with at most
+    MAX_BUCKET_LEADERS "leaders" (the first dissimilar signatures seen
+    there), and joins the first one it matches. Pairs already in the same
+    cluster are not compared again. Work per task is therefore linear in
+    its submissions, not quadratic in a bucket's size. A signature that
+    matches only non-leaders of one bucket can still be linked through the
+    other bands. Clusters made of a single student's attempts are left
+    out. Largest clusters first.
+    """
+    fingerprints = dict(db.execute(
+        select(SubmissionFingerprint.submission_id, SubmissionFingerprint.signature).where(SubmissionFingerprint.task_id == task_id)
+    ).all())
+    if not fingerprints:
+        return []
+    shared: dict[int, list[int]] = {}
+    for bucket, submission_id in db.execute(
+        select(SubmissionLshBand.bucket, SubmissionLshBand.submission_id)
+        .join(SubmissionFingerprint, SubmissionFingerprint.submission_id == SubmissionLshBand.submission_id)
+        .where(SubmissionFingerprint.task_id == task_id)
+    ):
+        shared.setdefault(bucket, []).append(submission_id)
+
+    parent = {submission_id: submission_id for submission_id in fingerprints}
+
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    # Identical signatures (the usual case for copies) are similarity 1.0
+    by_signature: dict[bytes, list[int]] = {}
+    for submission_id, raw in fingerprints.items():
+        by_signature.setdefault(raw, []).append(submission_id)
+    best: dict[int, float] = {}
+    for same in by_signature.values():
+        if len(same) > 1:
+            for submission_id in same:
+                parent[find(submission_id)] = find(same[0])
+                best[submission_id] = 1.0
+
+    signatures = {raw: list(_SIGNATURE.unpack(raw)) for raw in by_signature}
+    for members in shared.values():
+        distinct = list(dict.fromkeys(fingerprints[submission_id] for submission_id in members))
+        if len(distinct) < 2:
+            continue
+        leaders: list[bytes] = []
+        for raw in distinct:
+            root = find(by_signature[raw][0])
+            for leader in leaders:
+                if find(by_signature[leader][0]) == root:
+                    break
+                score = similarity(signatures[raw], signatures[leader])
+                if score >= threshold:
+                    parent[root] = find(by_signature[leader][0])
+                    for submission_id in by_signature[raw] + by_signature[leader]:
+                        best[submission_id] = max(best.get(submission_id, 0.0), score)
+                    break
+            else:
+                if len(leaders) < MAX_BUCKET_LEADERS:
+                    leaders.append(raw)
+
+    clusters: dict[int, list[int]] = {}
+    for submission_id in best:
+        clusters.setdefault(find(submission_id), []).append(submission_id)
+    linked = [ids for ids in clusters.values() if len(ids) > 1]
+    if not linked:
+        return []
+    rows = {
+        row.id: row._asdict()
+        for row in db.execute(
+            select(*_member_columns())
+            .join(User, User.id == Submission.user_id)
+            .join(Task, Task.id == Submission.task_id)
+            .where(Submission.id.in_([submission_id for ids in linked for submission_id in ids]))
+        )
+    }
+    out = []
+    for ids in linked:
+        members = [dict(rows[submission_id], similarity=round(best[submission_id], 3)) for submission_id in sorted(ids) if submission_id in rows]
+        users = {m["user_id"] for m in members}
+        if len(users) > 1:
+            out.append({"size": len(members), "users": len(users), "submissions": members})
+    out.sort(key=lambda c: (-c["size"], c["submissions"][0]["id"]))
+    return out
@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import functools
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator
+
+import orjson
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import logs
+from .metrics import registry, route_template
+
+# W3C Trace Context: version-traceid-parentid-flags
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+_WHITESPACE = re.compile(r"\s+")
+# Longest statement text kept on a database span
+MAX_STATEMENT_CHARS = 500
+# perf_counter() is monotonic but has no epoch; trace viewers want absolute microseconds
+_EPOCH_OFFSET = time.time() - time.perf_counter()
+
+spans_dropped = registry.counter("app_trace_spans_dropped_total", "Finished spans dropped because the export queue was full.")
+
+
+class Span:
+    """One timed operation of a trace. Times are ``time.perf_counter()`` values."""
+
+    __slots__ = ("name", "category", "trace_id", "span_id", "parent_id", "start", "args")
+
+    def __init__(self, name: str, category: str, trace_id: str, parent_id: str | None, args: dict[str, Any] | None = None) -> None:
+        self.name = name
+        self.category = category
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start = time.perf_counter()
+        self.args = args or {}
+
+    def finish(self, end: float | None = None) -> None:
+        if _exporter is not None:
+            _exporter.export(self, time.perf_counter() if end is None else end)
+
+
+_current: ContextVar[Span | None] = ContextVar("trace_span", default=None)
+_exporter: SpanExporter | None = None
+
+
+@contextmanager
+def span(name: str, category: str = "app", **args: Any) -> Iterator[Span | None]:
+    """Time the block as a child of the current span.
+
+    Outside a sampled trace (or with tracing off) this yields None and
+    costs one context variable lookup.
+    """
+    parent = _current.get()
+    if parent is None or _exporter is None:
+        yield None
+        return
+    current = Span(name, category, parent.trace_id, parent.span_id, args)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.args["error"] = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        current.finish()
+
+
+def traced(name: str, category: str = "app") -> Callable:
+    """Decorator form of ``span`` for functions such as background tasks."""
+    def decorate(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, category):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class SpanExporter:
+    """Writes finished spans as Chrome trace events from a background thread.
+
+    The file is a JSON array of complete ("X") events, which Perfetto
+    (ui.perfetto.dev) and chrome://tracing open directly; the closing
+    bracket is optional in that format, so the file stays valid while it
+    grows and across restarts. Each trace gets its own row (tid), named
+    after its request. When the queue is full, spans are dropped and
+    counted instead of blocking the request.
+    """
+
+    def __init__(self, path: str, queue_size: int = 100000) -> None:
+        self.path = path
+        self.pid = os.getpid()
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(b"[\n")
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def lane(trace_id: str) -> int:
+        return int(trace_id[-8:], 16) & 0x7FFFFFFF
+
+    def export(self, finished: Span, end: float) -> None:
+        entry = {
+            "name": finished.name,
+            "cat": finished.category,
+            "ph": "X",
+            "ts": round((finished.start + _EPOCH_OFFSET) * 1e6, 1),
+            "dur": round((end - finished.start) * 1e6, 1),
+            "pid": self.pid,
+            "tid": self.lane(finished.trace_id),
+            "args": {"trace_id": finished.trace_id, "span_id": finished.span_id, "parent_id": finished.parent_id, **finished.args},
+        }
+        self._put(entry)
+
+    def name_lane(self, trace_id: str, name: str) -> None:
+        self._put({"name": "thread_name", "ph": "M", "pid": self.pid, "tid": self.lane(trace_id), "args": {"name": name}})
+
+    def _put(self, entry: dict[str, Any]) -> None:
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            spans_dropped.inc()
+
+    def _run(self) -> None:
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                break
+            lines = [orjson.dumps(entry, default=str)]
+            # Drain whatever else is waiting so a burst becomes one write
+            while True:
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is None:
+                    self._file.write(b",\n".join(lines) + b",\n")
+                    return
+                lines.append(orjson.dumps(entry, default=str))
+            self._file.write(b",\n".join(lines) + b",\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        global _exporter
+        if _exporter is self:
+            _exporter = None
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+        self._file.close()
+
+
+def setup_tracing(path: str, engine: Engine) -> SpanExporter:
+    """Start exporting spans to ``path`` and trace every statement run on ``engine``."""
+    global _exporter
+    _exporter = SpanExporter(path)
+    event.listen(engine, "before_cursor_execute", _before_statement)
+    event.listen(engine, "after_cursor_execute", _after_statement)
+    event.listen(engine, "handle_error", _failed_statement)
+    return _exporter
+
+
+def _before_statement(conn, cursor, statement, parameters, context, executemany) -> None:
+    parent = _current.get()
+    started = None
+    if parent is not None and _exporter is not None:
+        text = _WHITESPACE.sub(" ", statement).strip()
+        started = Span(f"db {text.split(' ', 1)[0].upper()}", "db", parent.trace_id, parent.span_id, {"sql": text[:MAX_STATEMENT_CHARS]})
+        if executemany:
+            started.args["executemany"] = True
+    conn.info.setdefault("trace_span", []).append(started)
+
+
+def _after_statement(conn, cursor, statement, parameters, context, executemany) -> None:
+    finished = conn.info["trace_span"].pop()
+    if finished is not None:
+        finished.finish()
+
+
+def _failed_statement(exception_context) -> None:
+    conn = exception_context.connection
+    spans = conn.info.get("trace_span") if conn is not None else None
+    if spans:
+        failed = spans.pop()
+        if failed is not None:
+            failed.args["error"] = type(exception_context.original_exception).__name__
+            failed.finish()
+
+
+class TracingMiddleware:
+    """Open a root span for each sampled HTTP request (opt-in, APP_TRACING_FILE).
+
+    A request carrying a W3C ``traceparent`` header joins that trace and
+    follows its sampled flag; other requests are sampled at
+    ``sample_rate``. Statements, commits, auth and background tasks
+    started while handling the request become its child spans. Sampled
+    responses carry the trace id in ``X-Trace-Id``.
+    """
+
+    def __init__(self, app: ASGIApp, sample_rate: float = 1.0) -> None:
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or _exporter is None:
+            await self.app(scope, receive, send)
+            return
+        match = _TRACEPARENT.match(Headers(scope=scope).get("traceparent", ""))
+        if match:
+            trace_id, parent_id, flags = match.groups()
+            sampled = int(flags, 16) & 1
+        else:
+            trace_id, parent_id = os.urandom(16).hex(), None
+            sampled = random.random() < self.sample_rate
+        if not sampled:
+            await self.app(scope, receive, send)
+            return
+        root = Span("request", "http", trace_id, parent_id, {"path": scope["path"], "request_id": logs.request_id.get()})
+        token = _current.set(root)
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message)["X-Trace-Id"] = trace_id
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            root.name = f"{scope['method']} {route_template(scope)}"
+            root.args["status"] = status
+            root.finish()
+            if _exporter is not None:
+                _exporter.name_lane(trace_id, f"{root.name} {trace_id[:8]}")
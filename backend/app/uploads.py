@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import tempfile
+
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from fastapi.staticfiles import StaticFiles
+from sqlalchemy import select
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .db import get_session
+from .images import VARIANT_SIZES, variant_filename
+from .models import Language
+from .tracing import traced
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Stored names are the first 32 hex digits of the content's sha256 plus the extension;
+# resized variants add a _<size> suffix (see images.variant_filename)
+HASHED_NAME = re.compile(r"^[0-9a-f]{32}(_\d+)?\.[a-z0-9]+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Multipart framing (boundary lines, part headers, the file name) allowed on top of the file itself
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
+
+
+async def save_upload(file: UploadFile, directory: str, extension: str, max_bytes: int) -> str:
+    """Store ``file`` in ``directory`` under a content-hash name; returns the name.
+
+    By the time this runs Starlette has already spooled the whole form, so
+    this is not what bounds how much a client can send: that is
+    UploadSizeLimitMiddleware. Here the file is copied in UPLOAD_CHUNK_SIZE
+    chunks while hashing, and rejected with 413 if the file itself exceeds
+    ``max_bytes``. Identical content maps to the same name, so re-uploading
+    an image reuses the stored file.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=413, detail=f"File is larger than {max_bytes} bytes")
+                digest.update(chunk)
+                await run_in_threadpool(out.write, chunk)
+        filename = f"{digest.hexdigest()[:32]}{extension}"
+        final_path = os.path.join(directory, filename)
+        if os.path.exists(final_path):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, final_path)
+        return filename
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        await file.close()
+
+
+@traced("uploads.cleanup", "background")
+def remove_unreferenced_upload(directory: str, image_url: str) -> None:
+    """Delete an uploaded file once no language points at it any more.
+
+    Meant to run as a background task after the request committed;
+    content-hashed names can be shared by several languages.
+    """
+    if not image_url or not image_url.startswith("/uploads/"):
+        return
+    with get_session() as session:
+        in_use = session.execute(select(Language.id).where(Language.image_url == image_url).limit(1)).first()
+    if in_use is not None:
+        return
+    filename = os.path.basename(image_url)
+    for name in [filename] + [variant_filename(filename, size) for size in VARIANT_SIZES]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass  # already gone, or no variant of that size
+
+
+class UploadSizeLimitMiddleware:
+    """Refuse upload request bodies larger than ``max_bytes`` before they are parsed.
+
+    FastAPI parses a multipart form (spooling each file to disk) before the
+    route runs, so a limit checked in the handler only fires after the whole
+    body was received. For paths matching ``path_pattern``, a declared
+    Content-Length over the limit is answered 413 without reading the body;
+    a body without one is counted as it arrives and cut off with 413 once
+    it passes the limit.
+    """
+
+    def __init__(self, app: ASGIApp, path_pattern: str, max_bytes: int) -> None:
+        self.app = app
+        self.paths = re.compile(path_pattern)
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.paths.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        too_large = f"Request body is larger than {self.max_bytes} bytes"
+        length = Headers(scope=scope).get("content-length", "")
+        if length.isdigit() and int(length) > self.max_bytes:
+            await JSONResponse({"detail": too_large}, status_code=413, headers={"Connection": "close"})(scope, receive, send)
+            return
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # FastAPI passes HTTPExceptions raised while reading the form through unchanged;
+                    # closing the connection keeps the server from draining the rest of the body
+                    raise HTTPException(status_code=413, detail=too_large, headers={"Connection": "close"})
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """StaticFiles that lets browsers cache content-hashed files forever.
+
+    Hashed names never change content, so they get a year-long immutable
+    Cache-Control; anything else (files from before hashing) must be
+    revalidated against its ETag.
+    """
+
+    def file_response(self, full_path, stat_result, scope: Scope, status_code: int = 200) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if HASHED_NAME.match(os.path.basename(full_path)):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+        return response
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import bisect
+import os
+import threading
+from array import array
+from typing import Iterable
+
+from .config import COMPETITION_WORDS_FILE
+
+# CompetitionRoom.difficulty runs 0-5
+DIFFICULTY_LEVELS = 6
+RARE_LETTERS = frozenset("jkqvxz")
+MIN_WORD_LENGTH = 2
+MAX_WORD_LENGTH = 20
+
+_MASK64 = (1 << 64) - 1
+
+
+def word_difficulty(word: str) -> int:
+    """Difficulty bucket of a word: longer words and rare letters are harder."""
+    n = len(word)
+    if n <= 3:
+        level = 0
+    elif n <= 4:
+        level = 1
+    elif n <= 6:
+        level = 2
+    elif n <= 8:
+        level = 3
+    elif n <= 10:
+        level = 4
+    else:
+        level = 5
+    if not RARE_LETTERS.isdisjoint(word):
+        level += 1
+    return min(level, DIFFICULTY_LEVELS - 1)
+
+
+def _mix(seed: int, index: int) -> int:
+    # splitmix64 finalizer: the i-th word of a stream is a pure function of (seed, i)
+    z = (seed * 0x9E3779B97F4A7C15 + index + 1) & _MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return z ^ (z >> 31)
+
+
+class WordPool:
+    """A dictionary packed into a few flat arrays for cheap sampling.
+
+    Words are sorted by (difficulty bucket, word) and concatenated into
+    one string; ``_offsets`` marks where each word starts and
+    ``_bucket_start`` where each bucket begins. A difficulty level maps to
+    a contiguous index range, so picking a word is one hash and one slice.
+    """
+
+    def __init__(self, words: Iterable[str]) -> None:
+        cleaned = {
+            w for w in (word.strip().lower() for word in words)
+            if MIN_WORD_LENGTH <= len(w) <= MAX_WORD_LENGTH and w.isascii() and w.isalpha()
+        }
+        keyed = sorted((word_difficulty(w), w) for w in cleaned)
+        self._blob = "".join(w for _, w in keyed)
+        self._offsets = array("I", [0])
+        position = 0
+        for _, w in keyed:
+            position += len(w)
+            self._offsets.append(position)
+        buckets = [bucket for bucket, _ in keyed]
+        self._bucket_start = array("I", (bisect.bisect_left(buckets, b) for b in range(DIFFICULTY_LEVELS + 1)))
+
+    @classmethod
+    def from_file(cls, path: str) -> WordPool:
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            return cls(f)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def word(self, index: int) -> str:
+        return self._blob[self._offsets[index]:self._offsets[index + 1]]
+
+    def level_range(self, difficulty: int) -> tuple[int, int]:
+        """Index range drawn from at ``difficulty``: that bucket plus the one below it.
+
+        Widens towards easier buckets when a small dictionary leaves the
+        range empty, and falls back to the whole pool.
+        """
+        difficulty = max(0, min(difficulty, DIFFICULTY_LEVELS - 1))
+        lo_bucket = max(0, difficulty - 1)
+        while lo_bucket > 0 and self._bucket_start[lo_bucket] == self._bucket_start[difficulty + 1]:
+            lo_bucket -= 1
+        lo, hi = self._bucket_start[lo_bucket], self._bucket_start[difficulty + 1]
+        if lo == hi:
+            return 0, len(self)
+        return lo, hi
+
+    def stream(self, seed: int, difficulty: int, offset: int, limit: int) -> list[str]:
+        """Words ``offset .. offset+limit`` of the stream identified by (seed, difficulty).
+
+        Every position is computed independently, so any page of the stream
+        costs the same and two callers with the same seed see the same words.
+        """
+        lo, hi = self.level_range(difficulty)
+        size = hi - lo
+        if size == 0:
+            return []
+        blob, offsets = self._blob, self._offsets
+        words = []
+        for i in range(offset, offset + limit):
+            index = lo + _mix(seed, i) % size
+            words.append(blob[offsets[index]:offsets[index + 1]])
+        return words
+
+
+_pool: WordPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_word_pool() -> WordPool:
+    """The process-wide pool, loaded from COMPETITION_WORDS_FILE on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                path = COMPETITION_WORDS_FILE or os.path.join(os.path.dirname(__file__), "data", "words.txt")
+                _pool = WordPool.from_file(path)
+    return _pool
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Benchmark many competition rooms running at the same time.
+
+Creates N rooms with M participants each against a throwaway database,
+then drives score updates for every room concurrently, first straight
+through the CompetitionEngine and then over HTTP through the ASGI app.
+
+Usage: python bench_competition_rooms.py [--rooms 50] [--participants 30] [--updates 200]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+_tmpdir = tempfile.mkdtemp(prefix="lp_bench_")
+os.environ.setdefault("APP_DATABASE_URL", f"sqlite:///{os.path.join(_tmpdir, 'bench.sqlite3')}")
+
+import httpx  # noqa: E402
+
+from app.auth import create_access_token  # noqa: E402
+from app.competition import competition_engine  # noqa: E402
+from app.db import get_session, init_db  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import CompetitionRoom, User  # noqa: E402
+
+
+def setup(n_rooms: int, n_participants: int) -> tuple[list[int], dict[int, list[int]]]:
+    init_db()
+    with get_session() as session:
+        rooms = [CompetitionRoom(name=f"Room {i}", join_code=f"B{i:05d}", is_active=True) for i in range(n_rooms)]
+        users = [User(name=f"typist{i}") for i in range(n_rooms * n_participants)]
+        session.add_all(rooms + users)
+        session.flush()
+        room_ids = [room.id for room in rooms]
+        members = {
+            room_id: [user.id for user in users[i * n_participants:(i + 1) * n_participants]]
+            for i, room_id in enumerate(room_ids)
+        }
+    for room_id, user_ids in members.items():
+        for user_id in user_ids:
+            competition_engine.join(room_id, user_id, f"typist{user_id}")
+    return room_ids, members
+
+
+def bench_engine(room_ids: list[int], members: dict[int, list[int]], updates: int) -> None:
+    def drive(room_id: int) -> None:
+        user_ids = members[room_id]
+        for k in range(updates * len(user_ids)):
+            competition_engine.update_score(room_id, user_ids[k % len(user_ids)], k)
+            if k % 50 == 0:
+                competition_engine.room(room_id).leaderboard()
+
+    total = updates * sum(len(u) for u in members.values())
+    start = time.perf_counter()
+    drive(room_ids[0])
+    single = time.perf_counter() - start
+    print(f"engine, 1 room:          {updates * len(members[room_ids[0]]) / single:12.0f} updates/s")
+
+    threads = [threading.Thread(target=drive, args=(room_id,)) for room_id in room_ids]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    print(f"engine, {len(room_ids)} rooms parallel: {total / elapsed:12.0f} updates/s")
+
+
+async def bench_http(room_ids: list[int], members: dict[int, list[int]], updates: int) -> None:
+    tokens = {
+        user_id: {"Authorization": f"Bearer {create_access_token({'sub': str(user_id), 'role': 'user'})}"}
+        for user_ids in members.values()
+        for user_id in user_ids
+    }
+    latencies: list[float] = []
+
+    async def drive(client: httpx.AsyncClient, room_id: int) -> None:
+        user_ids = members[room_id]
+        for k in range(updates):
+            user_id = user_ids[k % len(user_ids)]
+            t0 = time.perf_counter()
+            res = await client.post(f"/api/competition/rooms/{room_id}/update-score", json={"score": k}, headers=tokens[user_id])
+            latencies.append(time.perf_counter() - t0)
+            res.raise_for_status()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(drive(client, room_id) for room_id in room_ids))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"http, {len(room_ids)} rooms concurrent:  {len(latencies) / elapsed:10.0f} req/s  p50 {p50:.1f} ms  p99 {p99:.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rooms", type=int, default=50)
+    parser.add_argument("--participants", type=int, default=30)
+    parser.add_argument("--updates", type=int, default=200)
+    args = parser.parse_args()
+
+    room_ids, members = setup(args.rooms, args.participants)
+    bench_engine(room_ids, members, args.updates)
+    asyncio.run(bench_http(room_ids, members, max(1, args.updates // 10)))
+    written = competition_engine.persist()
+    print(f"persisted {written} participant rows in one write-behind pass")
+
+
+if __name__ == "__main__":
+    main()
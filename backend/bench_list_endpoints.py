@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Benchmark the admin list endpoints against a throwaway database.
+
+Usage: python bench_list_endpoints.py [--submissions N] [--tasks N] [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+_tmpdir = tempfile.mkdtemp(prefix="lp_bench_")
+os.environ.setdefault("APP_DATABASE_URL", f"sqlite:///{os.path.join(_tmpdir, 'bench.sqlite3')}")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from app.auth import create_access_token  # noqa: E402
+from app.db import engine, init_db  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import Language, Lesson, Submission, Task, User  # noqa: E402
+
+
+def populate(n_tasks: int, n_submissions: int, n_users: int = 200) -> None:
+    init_db()
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(Language), [{"id": "python", "name": "Python", "is_custom": False}])
+        conn.execute(insert(Lesson), [
+            {"id": i, "language": "python", "language_id": "python", "title": f"Lesson {i}", "order_index": i}
+            for i in range(1, 51)
+        ])
+        conn.execute(insert(Task), [
+            {"id": i, "lesson_id": (i % 50) + 1, "title": f"Task {i}", "description": "Write a function add(a, b) " * 8,
+             "kind": "code", "test_spec": '{"function": "add", "tests": [[1,2,3]]}', "order_index": i}
+            for i in range(1, n_tasks + 1)
+        ])
+        conn.execute(insert(User), [{"id": i, "name": f"student{i}", "is_admin": False, "created_at": now} for i in range(1, n_users + 1)])
+        conn.execute(insert(Submission), [
+            {"user_id": (i % n_users) + 1, "task_id": (i % n_tasks) + 1, "code": "def add(a, b):\n    return a + b\n",
+             "is_correct": i % 3 == 0, "result": "ok", "status": "pending" if i % 5 == 0 else "completed",
+             "created_at": now - timedelta(seconds=i)}
+            for i in range(n_submissions)
+        ])
+
+
+def bench(client: TestClient, url: str, headers: dict, repeat: int) -> float:
+    client.get(url, headers=headers)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        res = client.get(url, headers=headers)
+        res.raise_for_status()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--submissions", type=int, default=20000)
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    populate(args.tasks, args.submissions)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'admin', 'role': 'admin'})}"}
+    with TestClient(app) as client:
+        for url in (
+            "/api/admin/tasks",
+            "/api/admin/users",
+            "/api/admin/submissions?page_size=500",
+            "/api/lessons/1/tasks?page_size=500",
+        ):
+            print(f"{url:45s} {bench(client, url, headers, args.repeat):8.2f} ms/request")
+
+
+if __name__ == "__main__":
+    main()
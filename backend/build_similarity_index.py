@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Fingerprint code submissions for near-duplicate detection (app/similarity.py).
+
+New code submissions are fingerprinted shortly after they arrive; this backfills the
+ones submitted before the index existed, in id order and in batches, so
+it can be stopped and re-run. --rebuild drops all fingerprints first
+(needed after changing the signature parameters in app/similarity.py).
+
+Usage: python build_similarity_index.py [--batch-size 2000] [--rebuild]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import delete, select  # noqa: E402
+
+from app.db import get_session, init_db  # noqa: E402
+from app.models import Submission, SubmissionFingerprint, SubmissionLshBand  # noqa: E402
+from app.similarity import index_submission  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--rebuild", action="store_true", help="drop existing fingerprints and index everything again")
+    args = parser.parse_args()
+
+    init_db()
+    if args.rebuild:
+        with get_session() as session:
+            session.execute(delete(SubmissionLshBand))
+            session.execute(delete(SubmissionFingerprint))
+        print("Existing fingerprints dropped")
+
+    t0 = time.perf_counter()
+    last_id, seen, indexed = 0, 0, 0
+    while True:
+        with get_session() as session:
+            rows = session.execute(
+                select(Submission.id, Submission.task_id, Submission.code)
+                .outerjoin(SubmissionFingerprint, SubmissionFingerprint.submission_id == Submission.id)
+                .where(Submission.id > last_id, Submission.code.is_not(None), SubmissionFingerprint.submission_id.is_(None))
+                .order_by(Submission.id)
+                .limit(args.batch_size)
+            ).all()
+            if not rows:
+                break
+            for row in rows:
+                indexed += index_submission(session, row.id, row.task_id, row.code)
+            last_id = rows[-1].id
+            seen += len(rows)
+        print(f"  {seen} submissions read, {indexed} fingerprinted", end="\r", flush=True)
+    print(f"\n{indexed} submissions fingerprinted in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""Bulk-load a production-shaped dataset for scale testing.
+
+Generates languages, lessons and tasks, then users (one INSERT ... SELECT
+over a recursive CTE) and submissions (batched executemany with the
+secondary indexes dropped during the load and rebuilt afterwards).
+
+Submissions follow skewed distributions: a few very active students
+produce most attempts (Pareto activity), early lessons are attempted far
+more than late ones, tasks have their own pass rates, and pending code
+submissions cluster towards the recent end of the time window, like a
+review queue that is being worked through.
+
+The target is APP_DATABASE_URL or --database; rows are appended after the
+existing ids, so it can also top up a database.
+
+Usage: python generate_data.py --database big.sqlite3 [--users 50000] [--tasks 5000]
+                               [--submissions 5000000] [--pending-ratio 0.02] [--seed 1]
+"""
+
+import argparse
+import bisect
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", help="SQLite file to fill (default: APP_DATABASE_URL)")
+    parser.add_argument("--languages", type=int, default=4)
+    parser.add_argument("--tasks", type=int, default=5000)
+    parser.add_argument("--tasks-per-lesson", type=int, default=10)
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--submissions", type=int, default=5000000)
+    parser.add_argument("--pending-ratio", type=float, default=0.02, help="share of code submissions still pending")
+    parser.add_argument("--days", type=int, default=365, help="time window the activity is spread over")
+    parser.add_argument("--batch-size", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+
+ARGS = _parse_args() if __name__ == "__main__" else None
+if ARGS is not None and ARGS.database:
+    os.environ["APP_DATABASE_URL"] = f"sqlite:///{os.path.abspath(ARGS.database)}"
+
+from sqlalchemy import insert, text  # noqa: E402
+
+from app.db import engine, init_db, schema_version, store_schema_version  # noqa: E402
+from app.models import Language, Lesson, Submission, Task, User  # noqa: E402
+from app.ordering import ORDER_GAP  # noqa: E402
+from app.seed import SEED_VERSION  # noqa: E402
+
+DEFAULT_LANGUAGES = [("python", "Python"), ("csharp", "C#"), ("javascript", "JavaScript"), ("go", "Go"), ("rust", "Rust"), ("java", "Java")]
+QUIZ_SHARE = 0.6
+# Attempts on lesson k are proportional to 1 / (1 + LESSON_DECAY * k): most students drop off early
+LESSON_DECAY = 0.15
+PENDING_RESULT = "Ожидает проверки администратором"
+CODE_TEMPLATE = "def add(a, b):\n    return a + b  # attempt {}\n"
+
+
+def _timestamp(dt: datetime) -> str:
+    # Same text format SQLAlchemy's SQLite DateTime type writes
+    return dt.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def _max_id(conn, table) -> int:
+    return conn.execute(text(f"SELECT COALESCE(MAX(id), 0) FROM {table.name}")).scalar()
+
+
+def load_content(conn, n_languages: int, n_tasks: int, tasks_per_lesson: int, rng: random.Random) -> list[tuple[int, str, float, float]]:
+    """Languages, lessons and tasks; returns (task id, kind, popularity, pass rate) per task."""
+    languages = DEFAULT_LANGUAGES[:n_languages] + [(f"lang{i}", f"Language {i}") for i in range(len(DEFAULT_LANGUAGES), n_languages)]
+    existing = {row[0] for row in conn.execute(text("SELECT id FROM languages"))}
+    missing = [
+        {"id": lang_id, "name": name, "is_custom": lang_id not in ("python", "csharp")}
+        for lang_id, name in languages if lang_id not in existing
+    ]
+    if missing:
+        conn.execute(insert(Language), missing)
+
+    lesson_id, task_id = _max_id(conn, Lesson.__table__), _max_id(conn, Task.__table__)
+    n_lessons = max(1, -(-n_tasks // tasks_per_lesson))
+    lessons, tasks, profile = [], [], []
+    for k in range(n_lessons):
+        language = languages[k % len(languages)][0]
+        position = k // len(languages)
+        lesson_id += 1
+        lessons.append({"id": lesson_id, "language": language, "language_id": language,
+                        "title": f"{language} lesson {position + 1}", "order_index": (position + 1) * ORDER_GAP})
+        popularity = 1.0 / (1.0 + LESSON_DECAY * position)
+        for j in range(min(tasks_per_lesson, n_tasks - len(tasks))):
+            task_id += 1
+            kind = "quiz" if rng.random() < QUIZ_SHARE else "code"
+            tasks.append({
+                "id": task_id, "lesson_id": lesson_id, "title": f"Task {j + 1}", "kind": kind,
+                "description": "Select the correct answer" if kind == "quiz" else "Write a function add(a, b) that returns a + b",
+                "test_spec": '{"correct": "A"}' if kind == "quiz" else '{"function": "add", "tests": [[1,2,3],[5,7,12]]}',
+                "order_index": (j + 1) * ORDER_GAP,
+            })
+            pass_rate = rng.uniform(0.4, 0.9) if kind == "quiz" else rng.uniform(0.2, 0.7)
+            profile.append((task_id, kind, popularity * rng.uniform(0.5, 1.5), pass_rate))
+    conn.execute(insert(Lesson), lessons)
+    conn.execute(insert(Task), tasks)
+    return profile
+
+
+def load_users(conn, n_users: int, start: datetime, days: int) -> tuple[int, int]:
+    """Insert users entirely inside SQLite; returns the new id range [first, last]."""
+    base = _max_id(conn, User.__table__)
+    conn.execute(text(
+        "INSERT INTO users (id, name, is_admin, created_at) "
+        "WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < :count) "
+        "SELECT :base + n, 'student' || (:base + n), 0, "
+        "strftime('%Y-%m-%d %H:%M:%f', :start, '+' || (n * :step) || ' seconds') FROM seq"
+    ), {"count": n_users, "base": base, "start": _timestamp(start), "step": days * 86400 / 2 / max(n_users, 1)})
+    return base + 1, base + n_users
+
+
+def load_submissions(conn, args, tasks: list[tuple[int, str, float, float]], users: tuple[int, int], start: datetime, rng: random.Random) -> dict[str, int]:
+    table = Submission.__table__
+    first_user, last_user = users
+    # Pareto activity: a small share of students submits most of the attempts
+    user_cum, total = [], 0.0
+    for _ in range(first_user, last_user + 1):
+        total += rng.paretovariate(1.2)
+        user_cum.append(total)
+    task_cum, task_total = [], 0.0
+    for _, _, popularity, _ in tasks:
+        task_total += popularity
+        task_cum.append(task_total)
+
+    base = _max_id(conn, table)
+    # Appended rows must sort after every existing change, or /admin/submissions/changes?since=
+    # pollers (which only ask for change_seq above what they have seen) would never see them
+    seq_base = conn.execute(text("SELECT COALESCE(MAX(change_seq), 0) FROM submissions")).scalar()
+    n = args.submissions
+    window = timedelta(days=args.days).total_seconds()
+    counts = {"quiz": 0, "code": 0, "pending": 0, "correct": 0}
+    # Plain DBAPI executemany with tuples: SQLAlchemy's per-row parameter processing would dominate
+    sql = (
+        "INSERT INTO submissions (id, user_id, task_id, answer, code, is_correct, result, status, created_at, change_seq) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    )
+    batch = []
+    random_, bisect_ = rng.random, bisect.bisect_left
+    for i in range(n):
+        sid = base + i + 1
+        seq = seq_base + i + 1
+        user_id = first_user + min(bisect_(user_cum, random_() * total), len(user_cum) - 1)
+        task_id, kind, _, pass_rate = tasks[min(bisect_(task_cum, random_() * task_total), len(tasks) - 1)]
+        # Ids grow with time, as they do in production; pending rows lean towards the recent end
+        progress = i / n
+        created_at = _timestamp(start + timedelta(seconds=progress * window + random_()))
+        if kind == "quiz":
+            is_correct = random_() < pass_rate
+            row = (sid, user_id, task_id, "A" if is_correct else "B", None, is_correct,
+                   "correct" if is_correct else "incorrect", "completed", created_at, seq)
+        elif random_() < args.pending_ratio * 2 * progress:
+            is_correct = False
+            row = (sid, user_id, task_id, None, CODE_TEMPLATE.format(sid), False, PENDING_RESULT, "pending", created_at, seq)
+            counts["pending"] += 1
+        else:
+            is_correct = random_() < pass_rate
+            row = (sid, user_id, task_id, None, CODE_TEMPLATE.format(sid), is_correct,
+                   "Правильно" if is_correct else "Неправильно", "completed", created_at, seq)
+        counts[kind] += 1
+        counts["correct"] += is_correct
+        batch.append(row)
+        if len(batch) >= args.batch_size:
+            conn.exec_driver_sql(sql, batch)
+            batch = []
+            print(f"  submissions: {i + 1}/{n}", end="\r", flush=True)
+    if batch:
+        conn.exec_driver_sql(sql, batch)
+    print()
+    return counts
+
+
+def main() -> None:
+    args = ARGS
+    rng = random.Random(args.seed)
+    start = datetime.utcnow() - timedelta(days=args.days)
+    print(f"Target: {engine.url}")
+    init_db()
+
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        conn.exec_driver_sql("PRAGMA synchronous = OFF")
+        tasks = load_content(conn, args.languages, args.tasks, args.tasks_per_lesson, rng)
+        print(f"{len(tasks)} tasks in {-(-len(tasks) // args.tasks_per_lesson)} lessons ({time.perf_counter() - t0:.1f}s)")
+        users = load_users(conn, args.users, start, args.days)
+        print(f"{args.users} users ({time.perf_counter() - t0:.1f}s)")
+
+        # Maintaining four secondary indexes row by row is most of the cost; rebuild them once instead
+        indexes = list(Submission.__table__.indexes)
+        for index in indexes:
+            index.drop(conn, checkfirst=True)
+        counts = load_submissions(conn, args, tasks, users, start, rng)
+        print(f"{args.submissions} submissions ({time.perf_counter() - t0:.1f}s): "
+              f"{counts['quiz']} quiz, {counts['code']} code, {counts['pending']} pending, {counts['correct']} correct")
+        for index in indexes:
+            index.create(conn)
+        print(f"indexes rebuilt ({time.perf_counter() - t0:.1f}s)")
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    # The app's startup would otherwise re-run create_all and the seed check on this database
+    store_schema_version(schema_version(str(SEED_VERSION)))
+    print(f"Done in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""Build the downscaled icon variants for every language image already uploaded.
+
+New uploads get their variants automatically; this backfills images
+uploaded before the thumbnail pipeline existed. Requires Pillow.
+
+Usage: python generate_language_thumbnails.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import select  # noqa: E402
+
+from app.config import UPLOAD_DIR  # noqa: E402
+from app.db import get_session  # noqa: E402
+from app.images import generate_language_variants, pillow_available  # noqa: E402
+from app.models import Language  # noqa: E402
+
+
+def main() -> None:
+    if not pillow_available():
+        print("Pillow is not installed: pip install Pillow")
+        sys.exit(1)
+    with get_session() as session:
+        languages = session.execute(
+            select(Language.id, Language.image_url).where(Language.image_url.like("/uploads/%"))
+        ).all()
+    for lang_id, image_url in languages:
+        if not os.path.exists(os.path.join(UPLOAD_DIR, os.path.basename(image_url))):
+            print(f"{lang_id}: {image_url} is missing, skipped")
+            continue
+        generate_language_variants(UPLOAD_DIR, lang_id, image_url)
+        print(f"{lang_id}: {image_url}")
+
+
+if __name__ == "__main__":
+    main()
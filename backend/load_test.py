@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""Load-test the API with classroom-shaped traffic.
+
+Scenarios:
+  browse       N students enter, browse lessons and tasks, submit quizzes and code
+  review       students fill the review queue, then an admin clears it page by page
+  competition  N typists join a room, fetch words and post scores concurrently
+
+By default the app runs in-process (httpx ASGI transport, throwaway
+database); --base-url drives a running server over HTTP instead. Reports
+throughput and p50/p95/p99 latency per endpoint. --save-baseline writes
+the results as JSON; --baseline compares against such a file and exits
+with status 1 when an endpoint's p95 or a scenario's throughput regressed
+by more than --tolerance.
+
+Usage: python load_test.py [--scenario all] [--students 30] [--typists 100] [--rounds 5]
+                           [--base-url http://127.0.0.1:8000] [--baseline load_baseline.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx  # noqa: E402
+
+SCENARIOS = ("browse", "review", "competition")
+# p95 regressions smaller than this are noise at sub-millisecond latencies
+P95_SLACK_MS = 5.0
+
+
+class Recorder:
+    """Latency samples per endpoint label for one scenario."""
+
+    def __init__(self) -> None:
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    async def call(self, client: httpx.AsyncClient, label: str, method: str, url: str, **kwargs) -> httpx.Response:
+        t0 = time.perf_counter()
+        res = await client.request(method, url, **kwargs)
+        self.samples[label].append(time.perf_counter() - t0)
+        if res.status_code >= 400:
+            self.errors[label] += 1
+        return res
+
+    def finish(self) -> None:
+        self.elapsed = time.perf_counter() - self.started
+
+    def summary(self) -> dict:
+        endpoints = {}
+        for label, samples in sorted(self.samples.items()):
+            samples.sort()
+            endpoints[label] = {
+                "count": len(samples),
+                "errors": self.errors.get(label, 0),
+                "rps": round(len(samples) / self.elapsed, 1),
+                "p50_ms": round(_percentile(samples, 0.50) * 1000, 2),
+                "p95_ms": round(_percentile(samples, 0.95) * 1000, 2),
+                "p99_ms": round(_percentile(samples, 0.99) * 1000, 2),
+            }
+        total = sum(len(s) for s in self.samples.values())
+        return {"requests": total, "seconds": round(self.elapsed, 3), "rps": round(total / self.elapsed, 1), "endpoints": endpoints}
+
+
+def _percentile(sorted_samples: list[float], q: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * q))]
+
+
+def _bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def enter_student(client: httpx.AsyncClient, rec: Recorder, name: str) -> dict:
+    res = await rec.call(client, "POST /api/enter", "POST", "/api/enter", json={"name": name})
+    res.raise_for_status()
+    return _bearer(res.json()["access_token"])
+
+
+async def admin_headers(client: httpx.AsyncClient) -> dict:
+    # Imported late: app.config reads the environment, which main() prepares first
+    from app.config import ADMIN_PASSWORD, ADMIN_USERNAME
+    res = await client.post("/api/admin/login", json={"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD})
+    res.raise_for_status()
+    return _bearer(res.json()["access_token"])
+
+
+async def student_session(client: httpx.AsyncClient, rec: Recorder, index: int, rounds: int, submit_code: bool = True) -> None:
+    headers = await enter_student(client, rec, f"student{index}")
+    languages = (await rec.call(client, "GET /api/languages", "GET", "/api/languages")).json()
+    for round_no in range(rounds):
+        language = languages[(index + round_no) % len(languages)]["id"]
+        lessons = (await rec.call(client, "GET /api/lessons", "GET", "/api/lessons", params={"language": language})).json()
+        if not lessons:
+            continue
+        lesson_id = lessons[(index + round_no) % len(lessons)]["id"]
+        await rec.call(client, "GET /api/lessons/{lesson_id}", "GET", f"/api/lessons/{lesson_id}")
+        tasks = (await rec.call(client, "GET /api/lessons/{lesson_id}/tasks", "GET", f"/api/lessons/{lesson_id}/tasks")).json()
+        await rec.call(client, "GET /api/lessons/{lesson_id}/status", "GET", f"/api/lessons/{lesson_id}/status", headers=headers)
+        for task in tasks:
+            await rec.call(client, "GET /api/tasks/{task_id}/submission", "GET", f"/api/tasks/{task['id']}/submission", headers=headers)
+            if task["kind"] == "quiz":
+                await rec.call(client, "POST /api/tasks/{task_id}/submit-quiz", "POST", f"/api/tasks/{task['id']}/submit-quiz",
+                               json={"answer": "A" if (index + round_no) % 3 else "B"}, headers=headers)
+            elif submit_code:
+                await rec.call(client, "POST /api/tasks/{task_id}/submit-code", "POST", f"/api/tasks/{task['id']}/submit-code",
+                               json={"code": f"def add(a, b):\n    return a + b  # {index}/{round_no}\n"}, headers=headers)
+        await rec.call(client, "GET /api/progress", "GET", "/api/progress", headers=headers)
+
+
+async def scenario_browse(client: httpx.AsyncClient, args) -> Recorder:
+    rec = Recorder()
+    await asyncio.gather(*(student_session(client, rec, i, args.rounds) for i in range(args.students)))
+    rec.finish()
+    return rec
+
+
+async def scenario_review(client: httpx.AsyncClient, args) -> Recorder:
+    # Fill the queue first (not measured), then time the admin working through it
+    filler = Recorder()
+    await asyncio.gather(*(student_session(client, filler, 1000 + i, args.rounds) for i in range(args.students)))
+    headers = await admin_headers(client)
+    rec = Recorder()
+    reviewed = 0
+    while True:
+        page = (await rec.call(client, "GET /api/admin/submissions/pending", "GET", "/api/admin/submissions/pending",
+                               params={"limit": 50}, headers=headers)).json()
+        rows = page["data"] if isinstance(page, dict) else page
+        if not rows:
+            break
+        # Open a few submissions the way a reviewer would before deciding
+        await asyncio.gather(*(
+            rec.call(client, "GET /api/admin/submissions/{submission_id}", "GET", f"/api/admin/submissions/{row['id']}", headers=headers)
+            for row in rows[:5]
+        ))
+        items = [{"id": row["id"], "is_correct": row["id"] % 4 != 0, "comment": ""} for row in rows]
+        await rec.call(client, "POST /api/admin/submissions/review-batch", "POST", "/api/admin/submissions/review-batch",
+                       json={"items": items}, headers=headers)
+        reviewed += len(items)
+    rec.finish()
+    print(f"  review: cleared {reviewed} pending submissions")
+    return rec
+
+
+async def scenario_competition(client: httpx.AsyncClient, args) -> Recorder:
+    headers = await admin_headers(client)
+    room = (await client.post("/api/admin/competition/rooms", json={"name": "Load test", "game_time": 60, "difficulty": 2}, headers=headers)).json()
+    room_id = room["id"]
+    await client.post(f"/api/admin/competition/rooms/{room_id}/start", headers=headers)
+    rec = Recorder()
+
+    async def typist(index: int) -> None:
+        student = await enter_student(client, rec, f"typist{index}")
+        await rec.call(client, "POST /api/competition/rooms/{room_id}/join", "POST", f"/api/competition/rooms/{room_id}/join", headers=student)
+        words = (await rec.call(client, "GET /api/competition/rooms/{room_id}/words", "GET", f"/api/competition/rooms/{room_id}/words",
+                                params={"offset": 0, "limit": 100})).json()
+        score = 0
+        for k in range(args.rounds * 10):
+            score += len(words["words"][k % len(words["words"])])
+            await rec.call(client, "POST /api/competition/rooms/{room_id}/update-score", "POST",
+                           f"/api/competition/rooms/{room_id}/update-score", json={"score": score}, headers=student)
+            if k % 10 == 9:
+                await rec.call(client, "GET /api/competition/rooms/{room_id}/participants", "GET",
+                               f"/api/competition/rooms/{room_id}/participants")
+
+    await asyncio.gather(*(typist(i) for i in range(args.typists)))
+    rec.finish()
+    await client.post(f"/api/admin/competition/rooms/{room_id}/stop", headers=headers)
+    return rec
+
+
+def print_summary(name: str, summary: dict) -> None:
+    print(f"\n{name}: {summary['requests']} requests in {summary['seconds']:.2f}s, {summary['rps']:.0f} req/s")
+    print(f"  {'endpoint':<58} {'count':>6} {'err':>4} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for label, row in summary["endpoints"].items():
+        print(f"  {label:<58} {row['count']:>6} {row['errors']:>4} {row['rps']:>8.0f}"
+              f" {row['p50_ms']:>7.1f}ms {row['p95_ms']:>6.1f}ms {row['p99_ms']:>6.1f}ms")
+
+
+def regressions(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    problems = []
+    for name, summary in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if summary["rps"] < base["rps"] * (1 - tolerance):
+            problems.append(f"{name}: throughput {summary['rps']:.0f} req/s < baseline {base['rps']:.0f} req/s")
+        for label, row in summary["endpoints"].items():
+            base_row = base["endpoints"].get(label)
+            if base_row is None:
+                continue
+            limit = base_row["p95_ms"] * (1 + tolerance) + P95_SLACK_MS
+            if row["p95_ms"] > limit:
+                problems.append(f"{name}: {label} p95 {row['p95_ms']:.1f}ms > {limit:.1f}ms (baseline {base_row['p95_ms']:.1f}ms)")
+            if row["errors"] > base_row["errors"]:
+                problems.append(f"{name}: {label} {row['errors']} errors (baseline {base_row['errors']})")
+    return problems
+
+
+async def run(args) -> dict:
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=30.0)
+    else:
+        from app.main import app, on_startup
+        on_startup()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=30.0)
+    scenarios = {"browse": scenario_browse, "review": scenario_review, "competition": scenario_competition}
+    names = SCENARIOS if args.scenario == "all" else (args.scenario,)
+    results = {}
+    async with client:
+        for name in names:
+            rec = await scenarios[name](client, args)
+            results[name] = rec.summary()
+            print_summary(name, results[name])
+    if not args.base_url:
+        from app.competition import competition_engine
+        competition_engine.shutdown()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=("all",) + SCENARIOS, default="all")
+    parser.add_argument("--students", type=int, default=30)
+    parser.add_argument("--typists", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--base-url", default="", help="drive a running server instead of the in-process app")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--save-baseline", help="write this run's results as JSON")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression (default 0.25)")
+    args = parser.parse_args()
+
+    if not args.base_url:
+        # The in-process app gets a throwaway database; set before anything imports app.config
+        tmpdir = tempfile.mkdtemp(prefix="lp_load_")
+        os.environ.setdefault("APP_DATABASE_URL", f"sqlite:///{os.path.join(tmpdir, 'load.sqlite3')}")
+        os.environ.setdefault("APP_UPLOAD_DIR", os.path.join(tmpdir, "uploads"))
+        # Students here submit far faster than real ones; measure the endpoints, not the limiter
+        os.environ.setdefault("RATE_LIMITS", "")
+
+    results = asyncio.run(run(args))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nbaseline written to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        problems = regressions(results, baseline, args.tolerance)
+        if problems:
+            print("\nREGRESSIONS:")
+            for problem in problems:
+                print(f"  {problem}")
+            sys.exit(1)
+        print("\nno regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Measure how long the backend takes to import and to run its startup hook.
+
+Each measurement runs in a fresh interpreter (like a worker restart or a
+--reload cycle). Import time is broken down with ``python -X importtime``;
+the startup hook is timed against an empty database (full create_all and
+seeding) and again against the now-initialised one (schema-version fast path).
+
+Usage: python measure_startup.py [--runs 5] [--top 15]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_STARTUP_SNIPPET = """
+import time
+t0 = time.perf_counter()
+from app.main import on_startup
+t1 = time.perf_counter()
+on_startup()
+t2 = time.perf_counter()
+print(f"{(t1 - t0) * 1000:.1f} {(t2 - t1) * 1000:.1f}")
+"""
+
+
+def run_startup(database_url: str) -> tuple[float, float]:
+    env = dict(os.environ, APP_DATABASE_URL=database_url)
+    out = subprocess.run(
+        [sys.executable, "-c", _STARTUP_SNIPPET], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    import_ms, startup_ms = out.split()[-2:]
+    return float(import_ms), float(startup_ms)
+
+
+def import_breakdown(top: int) -> list[tuple[int, str]]:
+    """(self microseconds, module) of the slowest modules imported by app.main."""
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _cumulative, module = line[len("import time:"):].split("|")
+        rows.append((int(self_us), module.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="lp_startup_")
+    cold, warm, imports = [], [], []
+    for i in range(args.runs):
+        url = f"sqlite:///{os.path.join(tmpdir, f'startup{i}.sqlite3')}"
+        import_ms, startup_ms = run_startup(url)
+        imports.append(import_ms)
+        cold.append(startup_ms)
+        warm.append(run_startup(url)[1])
+
+    print(f"import app.main:           median {statistics.median(imports):7.1f} ms")
+    print(f"startup hook, empty db:    median {statistics.median(cold):7.1f} ms")
+    print(f"startup hook, current db:  median {statistics.median(warm):7.1f} ms")
+    print("\nslowest modules (self time):")
+    for self_us, module in import_breakdown(args.top):
+        print(f"  {self_us / 1000:7.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
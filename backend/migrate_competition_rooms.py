@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Migration script to add join_code column to competition_rooms table
+"""
+
+import secrets
+import sqlite3
+import os
+
+JOIN_CODE_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+
+def migrate_database():
+    # Get the database path
+    db_path = os.path.join(os.path.dirname(__file__), '..', 'backend_data.sqlite3')
+
+    if not os.path.exists(db_path):
+        print(f"Database file not found at {db_path}")
+        return
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("PRAGMA table_info(competition_rooms)")
+        columns = [column[1] for column in cursor.fetchall()]
+
+        if 'join_code' not in columns:
+            print("Adding join_code column to competition_rooms table...")
+            cursor.execute("ALTER TABLE competition_rooms ADD COLUMN join_code VARCHAR(12)")
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_competition_rooms_join_code ON competition_rooms (join_code)")
+
+        # Give existing rooms a code so students can join them
+        used = {row[0] for row in cursor.execute("SELECT join_code FROM competition_rooms WHERE join_code IS NOT NULL").fetchall()}
+        for (room_id,) in cursor.execute("SELECT id FROM competition_rooms WHERE join_code IS NULL").fetchall():
+            code = "".join(secrets.choice(JOIN_CODE_ALPHABET) for _ in range(6))
+            while code in used:
+                code = "".join(secrets.choice(JOIN_CODE_ALPHABET) for _ in range(6))
+            used.add(code)
+            cursor.execute("UPDATE competition_rooms SET join_code = ? WHERE id = ?", (code, room_id))
+            print(f"Room {room_id}: join code {code}")
+
+        conn.commit()
+        print("Migration completed successfully!")
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate_database()
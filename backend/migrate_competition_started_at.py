@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the started_at column (per-game word stream seed) to competition_rooms table
+"""
+
+import sqlite3
+import os
+
+def migrate_database():
+    # Get the database path
+    db_path = os.path.join(os.path.dirname(__file__), '..', 'backend_data.sqlite3')
+
+    if not os.path.exists(db_path):
+        print(f"Database file not found at {db_path}")
+        return
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("PRAGMA table_info(competition_rooms)")
+        columns = [column[1] for column in cursor.fetchall()]
+
+        if 'started_at' not in columns:
+            print("Adding started_at column to competition_rooms table...")
+            cursor.execute("ALTER TABLE competition_rooms ADD COLUMN started_at DATETIME")
+            conn.commit()
+            print("Migration completed successfully!")
+        else:
+            print("started_at column already exists")
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate_database()
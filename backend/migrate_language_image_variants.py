@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the image_variants column to languages table
+"""
+
+import sqlite3
+import os
+
+def migrate_database():
+    # Get the database path
+    db_path = os.path.join(os.path.dirname(__file__), '..', 'backend_data.sqlite3')
+
+    if not os.path.exists(db_path):
+        print(f"Database file not found at {db_path}")
+        return
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("PRAGMA table_info(languages)")
+        columns = [column[1] for column in cursor.fetchall()]
+
+        if 'image_variants' not in columns:
+            print("Adding image_variants column to languages table...")
+            cursor.execute("ALTER TABLE languages ADD COLUMN image_variants TEXT")
+            conn.commit()
+            print("Migration completed successfully! Run generate_language_thumbnails.py to build variants for existing images.")
+        else:
+            print("image_variants column already exists")
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate_database()
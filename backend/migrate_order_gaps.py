@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Migration script to add ordering indexes and respace order_index values
+for gap-based ordering of lessons and tasks
+"""
+
+import sqlite3
+import os
+
+ORDER_GAP = 1024
+
+def respace(cursor, table, scope_column):
+    cursor.execute(f"SELECT DISTINCT {scope_column} FROM {table}")
+    for (scope_value,) in cursor.fetchall():
+        cursor.execute(
+            f"SELECT id FROM {table} WHERE {scope_column} = ? ORDER BY order_index, id",
+            (scope_value,),
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+        cursor.executemany(
+            f"UPDATE {table} SET order_index = ? WHERE id = ?",
+            [((i + 1) * ORDER_GAP, item_id) for i, item_id in enumerate(ids)],
+        )
+
+def migrate_database():
+    # Get the database path
+    db_path = os.path.join(os.path.dirname(__file__), '..', 'backend_data.sqlite3')
+
+    if not os.path.exists(db_path):
+        print(f"Database file not found at {db_path}")
+        return
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    try:
+        print("Creating ordering indexes...")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_lessons_language_order_index ON lessons (language, order_index)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_tasks_lesson_id_order_index ON tasks (lesson_id, order_index)")
+
+        print(f"Respacing order_index values by {ORDER_GAP}...")
+        respace(cursor, "lessons", "language")
+        respace(cursor, "tasks", "lesson_id")
+
+        conn.commit()
+        print("Migration completed successfully!")
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate_database()
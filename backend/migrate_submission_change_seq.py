@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the change_seq column (admin change feed) to submissions table
+"""
+
+import sqlite3
+import os
+
+def migrate_database():
+    # Get the database path
+    db_path = os.path.join(os.path.dirname(__file__), '..', 'backend_data.sqlite3')
+
+    if not os.path.exists(db_path):
+        print(f"Database file not found at {db_path}")
+        return
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("PRAGMA table_info(submissions)")
+        columns = [column[1] for column in cursor.fetchall()]
+
+        if 'change_seq' not in columns:
+            print("Adding change_seq column to submissions table...")
+            cursor.execute("ALTER TABLE submissions ADD COLUMN change_seq INTEGER")
+
+        # Existing rows get distinct sequence numbers in insertion order
+        cursor.execute("UPDATE submissions SET change_seq = id WHERE change_seq IS NULL")
+        print(f"Backfilled change_seq for {cursor.rowcount} submissions")
+
+        print("Creating ix_submissions_change_seq index...")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_submissions_change_seq ON submissions (change_seq, id)")
+        conn.commit()
+        print("Migration completed successfully!")
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate_database()
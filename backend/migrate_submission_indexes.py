@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the pending-review queue index to submissions table
+"""
+
+import sqlite3
+import os
+
+def migrate_database():
+    # Get the database path
+    db_path = os.path.join(os.path.dirname(__file__), '..', 'backend_data.sqlite3')
+
+    if not os.path.exists(db_path):
+        print(f"Database file not found at {db_path}")
+        return
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    try:
+        print("Creating ix_submissions_status_created_at index...")
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS ix_submissions_status_created_at "
+            "ON submissions (status, created_at, id)"
+        )
+        cursor.execute("ANALYZE submissions")
+        conn.commit()
+        print("Migration completed successfully!")
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate_database()
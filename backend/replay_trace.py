@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""Replay a recorded request trace against a running instance.
+
+Traces come from the opt-in recorder (APP_TRACE_FILE, see app/recorder.py).
+Every recorded user bucket is mapped to a fresh user created through
+/api/enter and admin requests use a real admin login, so a trace from one
+deployment can be replayed against any local build. Requests are issued
+at their recorded offsets divided by --speed (--speed 0: as fast as
+--concurrency allows); each caller's requests stay in recorded order.
+Uploads, event streams and unmatched paths are skipped. Ids in paths and
+bodies are replayed as recorded, so replay against the same data (a copy
+of the database, or generate_data.py with the same seed).
+
+Latency per route is reported like load_test.py and can be saved and
+compared between builds:
+
+  python replay_trace.py trace.ndjson.gz --base-url http://127.0.0.1:8000 --speed 10 --save-results a.json
+  python replay_trace.py trace.ndjson.gz --base-url http://127.0.0.1:8001 --speed 10 --baseline a.json
+  python replay_trace.py --compare a.json b.json
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx  # noqa: E402
+
+from app.config import ADMIN_PASSWORD, ADMIN_USERNAME  # noqa: E402
+from load_test import Recorder, print_summary, regressions  # noqa: E402
+
+SKIP_ROUTES = ("<unmatched>", "/metrics", "/uploads")
+
+
+def read_trace(path: str) -> tuple[dict, list[dict]]:
+    opener = gzip.open if path.endswith(".gz") else open
+    header, entries = {}, []
+    base = 0.0
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "v" in record:
+                # A new header starts a new recording appended to the same file; keep offsets increasing
+                header = record
+                base = entries[-1]["t"] if entries else 0.0
+                continue
+            record["t"] += base
+            entries.append(record)
+    # Entries are written when a request finishes; replay needs them in arrival order
+    entries.sort(key=lambda e: e["t"])
+    return header, entries
+
+
+def replayable(entry: dict) -> bool:
+    return "skip" not in entry and "sse" not in entry and entry["r"] not in SKIP_ROUTES and entry["r"].startswith("/")
+
+
+async def create_users(client: httpx.AsyncClient, entries: list[dict]) -> dict[int, tuple[int, dict]]:
+    """One replay user per recorded bucket: bucket -> (user id, auth headers)."""
+    buckets = {e["u"] for e in entries if "u" in e} | {e["pp"]["user_id"] for e in entries if "user_id" in e.get("pp", {})}
+    users = {}
+    for bucket in sorted(buckets):
+        res = await client.post("/api/enter", json={"name": f"replay-{bucket}"})
+        res.raise_for_status()
+        data = res.json()
+        users[bucket] = (data["user"]["id"], {"Authorization": f"Bearer {data['access_token']}"})
+    return users
+
+
+async def replay(args) -> dict:
+    header, entries = read_trace(args.trace)
+    todo = [e for e in entries if replayable(e)]
+    print(f"{len(entries)} recorded requests (started {header.get('started', '?')}), replaying {len(todo)} at {args.speed or 'max'}x")
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60.0) as client:
+        users = await create_users(client, todo)
+        res = await client.post("/api/admin/login", json={"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD})
+        res.raise_for_status()
+        admin = {"Authorization": f"Bearer {res.json()['access_token']}"}
+
+        rec = Recorder()
+        semaphore = asyncio.Semaphore(args.concurrency)
+        first = todo[0]["t"] if todo else 0.0
+        start = time.perf_counter()
+        lag = 0.0
+
+        async def issue(entry: dict) -> None:
+            nonlocal lag
+            if args.speed:
+                delay = (entry["t"] - first) / args.speed - (time.perf_counter() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    lag = max(lag, -delay)
+            params = dict(entry.get("pp", {}))
+            if "user_id" in params:
+                params["user_id"] = users[params["user_id"]][0]
+            headers = admin if entry.get("role") == "admin" else users[entry["u"]][1] if "u" in entry else {}
+            body = entry.get("b")
+            if entry["r"] == "/api/admin/login":
+                body = {"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD}
+            kwargs = {"params": entry.get("q") or None, "headers": headers}
+            if body is not None:
+                kwargs["json"] = body
+            async with semaphore:
+                await rec.call(client, f"{entry['m']} {entry['r']}", entry["m"], entry["r"].format(**params), **kwargs)
+
+        async def session(entries: list[dict]) -> None:
+            for entry in entries:
+                await issue(entry)
+
+        # Each caller's requests stay in order (a client waits for its previous response, and
+        # e.g. "start room" must not overtake "create room"); different callers overlap freely
+        sessions: dict[object, list[dict]] = {}
+        for i, entry in enumerate(todo):
+            caller = "admin" if entry.get("role") == "admin" else entry.get("u", ("anonymous", i))
+            sessions.setdefault(caller, []).append(entry)
+        await asyncio.gather(*(session(entries) for entries in sessions.values()))
+        rec.finish()
+    if lag > 0.5:
+        print(f"  warning: fell up to {lag:.1f}s behind the recorded schedule; results understate the offered load")
+    return {"replay": rec.summary()}
+
+
+def print_comparison(a: dict, b: dict) -> None:
+    for name in a.keys() & b.keys():
+        print(f"\n{name}: {a[name]['rps']:.0f} -> {b[name]['rps']:.0f} req/s")
+        print(f"  {'endpoint':<58} {'p50':>17} {'p95':>17} {'p99':>17}")
+        for label, row_a in a[name]["endpoints"].items():
+            row_b = b[name]["endpoints"].get(label)
+            if row_b is None:
+                continue
+            cells = [f"{row_a[k]:>6.1f}->{row_b[k]:>6.1f}ms" for k in ("p50_ms", "p95_ms", "p99_ms")]
+            print(f"  {label:<58} {' '.join(cells)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trace", nargs="?", help="trace file written by the recorder")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--speed", type=float, default=1.0, help="time compression factor; 0 = no pacing")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--save-results", help="write this replay's latency summary as JSON")
+    parser.add_argument("--baseline", help="results of another build to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--compare", nargs=2, metavar=("A", "B"), help="compare two saved results and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0], encoding="utf-8") as fa, open(args.compare[1], encoding="utf-8") as fb:
+            print_comparison(json.load(fa), json.load(fb))
+        return
+    if not args.trace:
+        parser.error("a trace file is required unless --compare is given")
+
+    results = asyncio.run(replay(args))
+    print_summary("replay", results["replay"])
+    if args.save_results:
+        with open(args.save_results, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print_comparison(baseline, results)
+        problems = regressions(results, baseline, args.tolerance)
+        if problems:
+            print("\nREGRESSIONS:")
+            for problem in problems:
+                print(f"  {problem}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""Run the API as several single-worker processes with competition rooms sharded between them.
+
+Each competition room's live state is owned by one process (see
+app/competition.py: room_worker). ``uvicorn --workers N`` cannot provide
+that: every worker would get the same APP_WORKER_INDEX. This launcher
+starts N uvicorn processes on consecutive ports, each with its own
+APP_WORKER_INDEX and the shared APP_WORKER_COUNT. --nginx-config writes
+the matching reverse-proxy config (an ``include`` for nginx's http block).
+That config sends every room's requests to the room's owner and all other
+traffic to any worker, listening on the port the frontend already uses.
+
+Usage: python run_workers.py [--workers 4] [--host 127.0.0.1] [--base-port 8001]
+                             [--nginx-config workers.nginx.conf] [--listen-port 8000]
+"""
+
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+NGINX_TEMPLATE = """\
+# Generated by run_workers.py for {count} workers on {host}:{first_port}-{last_port}.
+# Include from nginx's http block and reload nginx after changing the worker count.
+
+upstream app_workers {{
+    least_conn;
+{servers}
+}}
+
+# Workers must be listed in APP_WORKER_INDEX order with equal weights: nginx's
+# (non-consistent) hash is the same function as app.competition.room_worker, so each
+# room is sent to its owner. max_fails=0 keeps nginx from rehashing to another worker.
+upstream room_workers {{
+    hash $room_id;
+{room_servers}
+}}
+
+map $http_upgrade $connection_upgrade {{
+    default upgrade;
+    ''      close;
+}}
+
+server {{
+    listen {listen_port};
+
+    proxy_http_version 1.1;
+    proxy_set_header Host $host;
+    proxy_set_header Upgrade $http_upgrade;
+    proxy_set_header Connection $connection_upgrade;
+    proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
+    # Event streams and the leaderboard WebSocket stay open
+    proxy_buffering off;
+    proxy_read_timeout 1h;
+
+    location ~ ^/api/(?:admin/)?competition/rooms/(?<room_id>\\d+)(?:/|$) {{
+        proxy_next_upstream off;
+        proxy_pass http://room_workers;
+    }}
+
+    location / {{
+        proxy_pass http://app_workers;
+    }}
+}}
+"""
+
+
+def nginx_config(count: int, host: str, base_port: int, listen_port: int) -> str:
+    ports = range(base_port, base_port + count)
+    return NGINX_TEMPLATE.format(
+        count=count,
+        host=host,
+        first_port=base_port,
+        last_port=base_port + count - 1,
+        listen_port=listen_port,
+        servers="\n".join(f"    server {host}:{port};" for port in ports),
+        room_servers="\n".join(f"    server {host}:{port} max_fails=0;  # APP_WORKER_INDEX={i}" for i, port in enumerate(ports)),
+    )
+
+
+def wait_for_port(host: str, port: int, process: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and process.poll() is None:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--base-port", type=int, default=8001, help="worker i listens on base-port + i")
+    parser.add_argument("--nginx-config", help="write the matching nginx config to this file")
+    parser.add_argument("--listen-port", type=int, default=8000, help="port nginx listens on (--nginx-config)")
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    if args.nginx_config:
+        with open(args.nginx_config, "w", encoding="utf-8") as f:
+            f.write(nginx_config(args.workers, args.host, args.base_port, args.listen_port))
+        print(f"nginx config written to {args.nginx_config}")
+
+    processes = []
+    for index in range(args.workers):
+        env = dict(os.environ, APP_WORKER_COUNT=str(args.workers), APP_WORKER_INDEX=str(index))
+        port = args.base_port + index
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", args.host, "--port", str(port)],
+            cwd=BACKEND_DIR,
+            env=env,
+        ))
+        print(f"worker {index} on {args.host}:{port} (pid {processes[-1].pid})")
+        if index == 0:
+            # The first worker creates and seeds a fresh database; the rest start once it is up
+            wait_for_port(args.host, port, processes[0])
+
+    # One worker exiting takes its rooms offline; stop the others so the failure is visible.
+    # SIGTERM stops all of them; Ctrl+C already reached every worker (same console), so then just wait.
+    terminated = []
+    worker_exited = False
+    signal.signal(signal.SIGTERM, lambda signum, frame: terminated.append(signum))
+    try:
+        while not terminated and all(p.poll() is None for p in processes):
+            time.sleep(0.5)
+        worker_exited = not terminated
+        for p in processes:
+            if p.poll() is None:
+                p.terminate()
+    except KeyboardInterrupt:
+        pass
+    for p in processes:
+        try:
+            p.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            p.kill()
+            p.wait()
+    sys.exit(1 if worker_exited else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Structured logging must work however the app is started.
+
+README and start.bat run ``uvicorn backend.app.main:app`` from the
+repository root, so module loggers are ``backend.app.*`` there and
+``app.*`` when started from backend/. Each case runs in a fresh
+interpreter because logging setup is process-wide.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(BACKEND_DIR)
+
+_SNIPPET = """
+import logging
+import {package}.main
+from {package}.logs import request_id, shutdown_logging
+
+request_id.set("req-1")
+logging.getLogger("{package}.profiler").warning("Slow statement", extra={{"duration_ms": 12.5}})
+logging.getLogger("{package}.images").info("kept at INFO")
+shutdown_logging()
+"""
+
+
+@pytest.mark.parametrize("package, cwd", [("backend.app", REPO_ROOT), ("app", BACKEND_DIR)])
+def test_module_logger_records_are_json(package, cwd):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            APP_DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'db.sqlite3')}",
+            APP_UPLOAD_DIR=os.path.join(tmp, "uploads"),
+            LOG_LEVEL="INFO",
+        )
+        out = subprocess.run(
+            [sys.executable, "-c", _SNIPPET.format(package=package)],
+            cwd=cwd, env=env, capture_output=True, text=True, check=True, timeout=60,
+        ).stdout
+
+    records = [json.loads(line) for line in out.splitlines() if line.startswith("{")]
+    slow = next(r for r in records if r["msg"] == "Slow statement")
+    assert slow["logger"] == f"{package}.profiler"
+    assert slow["level"] == "WARNING"
+    assert slow["request_id"] == "req-1"
+    assert slow["duration_ms"] == 12.5
+    assert any(r["msg"] == "kept at INFO" for r in records)
@@ -83,3 +83,51 @@ export async function getTaskSubmission(taskId: number) {
 }
 
 
+
+// Follows the admin submission change feed: the SSE stream only nudges,
+// the changed rows are pulled from /admin/submissions/changes starting at `since`
+export function followSubmissionChanges(since: number, onChanges: (rows: any[], pendingTotal: number) => void) {
+  let cursor = since
+  let pulling = false
+  let pullAgain = false
+
+  const pull = async () => {
+    if (pulling) {
+      pullAgain = true
+      return
+    }
+    pulling = true
+    try {
+      let hasMore = true
+      while (hasMore) {
+        const res = await api.get('/admin/submissions/changes', { headers: adminHeaders(), params: { since: cursor } })
+        cursor = res.data.cursor
+        hasMore = res.data.has_more
+        if (res.data.data.length > 0) onChanges(res.data.data, res.data.pending_total)
+      }
+    } catch (error) {
+      console.error('Failed to fetch submission changes:', error)
+    } finally {
+      pulling = false
+      if (pullAgain) {
+        pullAgain = false
+        pull()
+      }
+    }
+  }
+
+  const token = localStorage.getItem('admin_token') || ''
+  const source = new EventSource(`/api/admin/submissions/stream?token=${encodeURIComponent(token)}`)
+  source.addEventListener('submissions_changed', pull)
+  source.addEventListener('resync', pull)
+  // Catch up on anything missed while (re)connecting
+  source.onopen = pull
+  return () => source.close()
+}
+
+// srcSet for a language icon's server-generated variants ({"64": url, ...}); the original stays the fallback src
+export function variantSrcSet(variants?: Record<string, string>) {
+  if (!variants) return undefined
+  const entries = Object.entries(variants)
+  return entries.length > 0 ? entries.map(([size, url]) => `${url} ${size}w`).join(', ') : undefined
+}
@@ -14,13 +14,27 @@ interface Asteroid {
   size: number
 }
 
+interface Participant {
+  id: number
+  user_name: string
+  score: number
+  is_connected: boolean
+}
+
+const WORDS_PAGE_SIZE = 100
+
 export default function CompetitionRoom() {
+  const [roomId, setRoomId] = useState<number | null>(() => {
+    const saved = localStorage.getItem('competition_room_id')
+    return saved ? Number(saved) : null
+  })
+  const [joinCode, setJoinCode] = useState('')
+  const [joinError, setJoinError] = useState('')
   const [connectedUsers, setConnectedUsers] = useState<string[]>([])
   const [gameStarted, setGameStarted] = useState(false)
   const [scores, setScores] = useState<Record<string, number>>({})
   const [timeLeft, setTimeLeft] = useState(60)
   const [roomData, setRoomData] = useState<any>(null)
-  const [words, setWords] = useState<string[]>([])
   const [asteroids, setAsteroids] = useState<Asteroid[]>([])
   const [shipDisabled, setShipDisabled] = useState(false)
   const [disabledTimeLeft, setDisabledTimeLeft] = useState(0)
@@ -29,17 +43,43 @@ export default function CompetitionRoom() {
   const [bullets, setBullets] = useState<Array<{id: number, x: number, y: number, targetX: number, targetY: number, progress: number}>>([])
   const canvasRef = useRef<HTMLCanvasElement>(null)
   const animationRef = useRef<number>()
+  const participantsRef = useRef<Map<number, Participant>>(new Map())
+  // The room's shared word stream: fetched page by page, consumed in order
+  const wordsRef = useRef<string[]>([])
+  const wordIndexRef = useRef(0)
+  const wordsLoadingRef = useRef(false)
   const navigate = useNavigate()
 
   useEffect(() => {
+    if (roomId === null) return
     joinRoom()
-    loadWords()
-    const interval = setInterval(checkGameStatus, 2000) // Poll every 2 seconds
-    return () => clearInterval(interval)
-  }, [])
+    // The server pushes a snapshot on connect and then leaderboard/room diffs
+    let interval: ReturnType<typeof setInterval> | undefined
+    const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws'
+    const ws = new WebSocket(`${protocol}://${window.location.host}/api/competition/rooms/${roomId}/ws`)
+    ws.onmessage = event => {
+      const message = JSON.parse(event.data)
+      if (message.type === 'closed') {
+        leaveRoom()
+        return
+      }
+      applyLeaderboardMessage(message)
+    }
+    ws.onerror = () => {
+      // Fall back to polling when WebSockets are unavailable
+      if (!interval) interval = setInterval(checkGameStatus, 2000)
+    }
+    return () => {
+      ws.close()
+      if (interval) clearInterval(interval)
+    }
+  }, [roomId])
 
   useEffect(() => {
     if (gameStarted) {
+      wordsRef.current = []
+      wordIndexRef.current = 0
+      loadWords(0)
       startGameLoop()
       spawnAsteroids()
       const spawnInterval = setInterval(spawnAsteroids, 3000)
@@ -61,51 +101,100 @@ export default function CompetitionRoom() {
     }
   }, [shipDisabled, disabledTimeLeft])
 
+  const findRoom = async () => {
+    setJoinError('')
+    try {
+      const res = await axios.get(`/api/competition/rooms/by-code/${encodeURIComponent(joinCode.trim())}`)
+      localStorage.setItem('competition_room_id', String(res.data.id))
+      setRoomId(res.data.id)
+    } catch (error) {
+      setJoinError('Комната с таким кодом не найдена')
+    }
+  }
+
+  const leaveRoom = () => {
+    localStorage.removeItem('competition_room_id')
+    participantsRef.current.clear()
+    setRoomId(null)
+  }
+
   const joinRoom = async () => {
     try {
-      await axios.post('/api/competition/join', {}, { headers: authHeaders() })
+      await axios.post(`/api/competition/rooms/${roomId}/join`, {}, { headers: authHeaders() })
       loadParticipants()
     } catch (error) {
       console.error('Failed to join room:', error)
+      if (axios.isAxiosError(error) && error.response?.status === 404) leaveRoom()
     }
   }
 
+  const setParticipants = (participants: Participant[]) => {
+    const sorted = [...participants].sort((a, b) => b.score - a.score)
+    setConnectedUsers(sorted.map(p => p.user_name))
+    setScores(Object.fromEntries(sorted.map(p => [p.user_name, p.score])))
+  }
+
+  const applyRoomState = (room: any) => {
+    setRoomData(room)
+    setGameStarted(prev => {
+      if (room.is_active && !prev) {
+        // Game just started
+        setTimeLeft(room.game_time)
+      }
+      return room.is_active
+    })
+  }
+
+  const applyLeaderboardMessage = (message: any) => {
+    if (message.room) applyRoomState(message.room)
+    const participants = participantsRef.current
+    if (message.type === 'snapshot') participants.clear()
+    for (const p of message.participants || message.upsert || []) participants.set(p.id, p)
+    for (const id of message.remove || []) participants.delete(id)
+    setParticipants([...participants.values()])
+  }
+
   const loadParticipants = async () => {
     try {
-      const res = await axios.get('/api/competition/participants')
-      const users = res.data.map((p: any) => p.user_name)
-      const scoresObj = res.data.reduce((acc: any, p: any) => {
-        acc[p.user_name] = p.score
-        return acc
-      }, {})
-      setConnectedUsers(users)
-      setScores(scoresObj)
+      const res = await axios.get(`/api/competition/rooms/${roomId}/participants`)
+      setParticipants(res.data)
     } catch (error) {
       console.error('Failed to load participants:', error)
     }
   }
 
-  const loadWords = async () => {
+  const loadWords = async (offset: number) => {
+    if (wordsLoadingRef.current) return
+    wordsLoadingRef.current = true
     try {
-      const res = await axios.get('/api/competition/words')
-      setWords(res.data.words)
+      const res = await axios.get(`/api/competition/rooms/${roomId}/words`, {
+        params: { offset, limit: WORDS_PAGE_SIZE }
+      })
+      wordsRef.current = [...wordsRef.current, ...res.data.words]
     } catch (error) {
       console.error('Failed to load words:', error)
       // Fallback words
-      setWords(['hello', 'world', 'typing', 'speed', 'competition'])
+      if (wordsRef.current.length === 0) {
+        wordsRef.current = ['hello', 'world', 'typing', 'speed', 'competition']
+      }
+    } finally {
+      wordsLoadingRef.current = false
     }
   }
 
+  const nextWord = () => {
+    const words = wordsRef.current
+    if (words.length === 0) return null
+    if (words.length - wordIndexRef.current < WORDS_PAGE_SIZE / 4) loadWords(words.length)
+    const word = words[wordIndexRef.current % words.length]
+    wordIndexRef.current += 1
+    return word
+  }
+
   const checkGameStatus = async () => {
     try {
-      const res = await axios.get('/api/competition/room')
-      setRoomData(res.data)
-      setGameStarted(res.data.is_active)
-      if (res.data.is_active && !gameStarted) {
-        // Game just started
-        setTimeLeft(res.data.game_time)
-        generateNewWord()
-      }
+      const res = await axios.get(`/api/competition/rooms/${roomId}`)
+      applyRoomState(res.data)
       loadParticipants()
     } catch (error) {
       console.error('Failed to check game status:', error)
@@ -172,11 +261,13 @@ export default function CompetitionRoom() {
   }
 
   const spawnAsteroids = useCallback(() => {
-    if (!gameStarted || words.length === 0) return
+    if (!gameStarted) return
+    const word = nextWord()
+    if (word === null) return
 
     const newAsteroid: Asteroid = {
       id: Date.now() + Math.random(),
-      word: words[Math.floor(Math.random() * words.length)],
+      word,
       typedLetters: '',
       x: Math.random() * 800,
       y: -50,
@@ -186,7 +277,7 @@ export default function CompetitionRoom() {
     }
 
     setAsteroids(prev => [...prev, newAsteroid])
-  }, [gameStarted, words])
+  }, [gameStarted])
 
   const startGameLoop = useCallback(() => {
     const gameLoop = () => {
@@ -255,7 +346,7 @@ export default function CompetitionRoom() {
 
   const updateScore = async (newScore: number) => {
     try {
-      await axios.post('/api/competition/update-score', { score: newScore }, { headers: authHeaders() })
+      await axios.post(`/api/competition/rooms/${roomId}/update-score`, { score: newScore }, { headers: authHeaders() })
     } catch (error) {
       console.error('Failed to update score:', error)
     }
@@ -290,6 +381,34 @@ export default function CompetitionRoom() {
     updateScore(newScore)
   }
 
+  if (roomId === null) {
+    return (
+      <div className="container">
+        <div className="card">
+          <h1 className="title">Комната соревнований</h1>
+          <p>Введите код комнаты, который сообщил преподаватель:</p>
+          <div style={{ display: 'flex', gap: 10 }}>
+            <input
+              className="input"
+              value={joinCode}
+              onChange={e => setJoinCode(e.target.value.toUpperCase())}
+              onKeyDown={e => { if (e.key === 'Enter') findRoom() }}
+              placeholder="ABC123"
+              maxLength={12}
+            />
+            <button className="btn" onClick={findRoom} disabled={!joinCode.trim()}>
+              Войти
+            </button>
+          </div>
+          {joinError && <div style={{ color: 'red', marginTop: 10 }}>{joinError}</div>}
+          <button className="btn" onClick={() => navigate('/')} style={{ marginTop: 20 }}>
+            Назад
+          </button>
+        </div>
+      </div>
+    )
+  }
+
   if (!gameStarted) {
     return (
       <div className="container">
@@ -310,6 +429,9 @@ export default function CompetitionRoom() {
             ))}
           </div>
           <p>Ожидание начала игры администратором...</p>
+          <button className="btn" onClick={leaveRoom} style={{ marginTop: 20, marginRight: 10 }}>
+            Сменить комнату
+          </button>
           <button className="btn" onClick={() => navigate('/')} style={{ marginTop: 20 }}>
             Назад
           </button>
@@ -1,9 +1,9 @@
 import { useEffect, useState } from 'react'
-import { listLanguages } from '../api'
+import { listLanguages, variantSrcSet } from '../api'
 import { useNavigate } from 'react-router-dom'
 import { t } from '../i18n'
 
-type Language = { id: string; name: string; image_url?: string }
+type Language = { id: string; name: string; image_url?: string; image_variants?: Record<string, string> }
 
 export default function LanguageSelect() {
   const [langs, setLangs] = useState<Language[]>([])
@@ -69,6 +69,8 @@ export default function LanguageSelect() {
               {l.image_url ? (
                 <img 
                   src={l.image_url} 
+                  srcSet={variantSrcSet(l.image_variants)}
+                  sizes="100px"
                   alt={l.name}
                   style={{ 
                     width: '100px', 
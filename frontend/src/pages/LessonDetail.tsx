@@ -1,4 +1,4 @@
-import { useEffect, useState } from 'react'
+import { useEffect, useRef, useState } from 'react'
 import { useParams, useNavigate } from 'react-router-dom'
 import { listTasks, submitQuiz, submitCode, lessonStatus, getTaskSubmission, getLesson } from '../api'
 import { t } from '../i18n'
@@ -33,9 +33,8 @@ export default function LessonDetail() {
 
   // State for submission details including admin comments
   const [submissionDetails, setSubmissionDetails] = useState<Record<number, SubmissionDetails | null>>({})
-
-  // State to track if we have pending submissions that need polling
-  const [hasPendingSubmissions, setHasPendingSubmissions] = useState(false)
+  const submissionDetailsRef = useRef(submissionDetails)
+  submissionDetailsRef.current = submissionDetails
 
   // State for additional information modal
   const [showInfoModal, setShowInfoModal] = useState(false)
@@ -48,22 +47,17 @@ export default function LessonDetail() {
   // Function to fetch submission details for all tasks
   const fetchSubmissionDetails = async (taskList: Task[]) => {
     const details: Record<number, SubmissionDetails | null> = {}
-    let hasPending = false
     
     for (const task of taskList) {
       try {
         const submission = await getTaskSubmission(task.id)
         details[task.id] = submission
-        if (submission?.status === 'pending') {
-          hasPending = true
-        }
       } catch (error) {
         details[task.id] = null
       }
     }
     
     setSubmissionDetails(details)
-    setHasPendingSubmissions(hasPending)
     return details
   }
 
@@ -116,54 +110,66 @@ export default function LessonDetail() {
     }
   }, [lessonId])
 
-  // Polling effect for pending submissions
+  // Submission state changes are pushed by the server over Server-Sent Events
   useEffect(() => {
-    if (!hasPendingSubmissions || tasks.length === 0) return
+    const token = localStorage.getItem('token')
+    if (!token || tasks.length === 0) return
 
-    const pollInterval = setInterval(async () => {
-      try {
-        const details = await fetchSubmissionDetails(tasks)
-        
-        // Check if any pending submission became completed
-        let statusChanged = false
-        for (const task of tasks) {
-          const oldDetails = submissionDetails[task.id]
-          const newDetails = details[task.id]
-          
-          if (oldDetails?.status === 'pending' && newDetails?.status === 'completed') {
-            statusChanged = true
+    const refreshLessonStatus = async () => {
+      const id = Number(lessonId)
+      if (!id) return
+      const s = await lessonStatus(id)
+      const conv: Record<number, boolean | null> = {}
+      Object.entries(s).forEach(([k, v]) => conv[Number(k)] = v as any)
+      setStatus(conv)
+
+      // Check for auto-progression
+      for (const task of tasks) {
+        if (s[task.id] === true) {
+          const currentTaskIndex = tasks.findIndex(t => t.id === task.id)
+          if (currentTaskIndex !== -1 && currentTaskIndex < tasks.length - 1) {
+            setActiveIdx(currentTaskIndex + 1)
             break
           }
         }
-        
-        // If status changed, refresh lesson status
-        if (statusChanged) {
-          const id = Number(lessonId)
-          if (id) {
-            const s = await lessonStatus(id)
-            const conv: Record<number, boolean | null> = {}
-            Object.entries(s).forEach(([k, v]) => conv[Number(k)] = v as any)
-            setStatus(conv)
-            
-            // Check for auto-progression
-            for (const task of tasks) {
-              if (s[task.id] === true) {
-                const currentTaskIndex = tasks.findIndex(t => t.id === task.id)
-                if (currentTaskIndex !== -1 && currentTaskIndex < tasks.length - 1) {
-                  setActiveIdx(currentTaskIndex + 1)
-                  break
-                }
-              }
-            }
-          }
+      }
+    }
+
+    const source = new EventSource(`/api/events?token=${encodeURIComponent(token)}`)
+    source.addEventListener('submission', (e) => {
+      const event = JSON.parse((e as MessageEvent).data)
+      if (!tasks.some(t => t.id === event.task_id)) return
+      const wasPending = submissionDetailsRef.current[event.task_id]?.status === 'pending'
+      setSubmissionDetails(prev => ({
+        ...prev,
+        [event.task_id]: {
+          id: event.id,
+          is_correct: event.is_correct,
+          result: event.result,
+          status: event.status,
+          created_at: event.created_at
         }
-      } catch (error) {
-        console.error('Error polling for submission updates:', error)
+      }))
+      // A pending submission was reviewed by the admin
+      if (wasPending && event.status === 'completed') {
+        refreshLessonStatus().catch(error => console.error('Failed to refresh lesson status:', error))
       }
-    }, 3000) // Poll every 3 seconds
+    })
+    const resync = () => {
+      fetchSubmissionDetails(tasks)
+      refreshLessonStatus().catch(error => console.error('Failed to refresh lesson status:', error))
+    }
+    source.addEventListener('resync', resync)
+    // EventSource reconnects on its own; events sent while it was down (e.g. a review verdict) are lost,
+    // so refetch after every reconnect. The first open needs nothing: state was just loaded.
+    let opened = false
+    source.onopen = () => {
+      if (opened) resync()
+      opened = true
+    }
 
-    return () => clearInterval(pollInterval)
-  }, [hasPendingSubmissions, tasks, submissionDetails, lessonId])
+    return () => source.close()
+  }, [tasks, lessonId])
 
   async function onSubmit(task: Task, quizAnswer?: string) {
     // Shuffle options on submit only if answer is not correct
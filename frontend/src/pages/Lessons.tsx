@@ -1,9 +1,9 @@
 import { useEffect, useState } from 'react'
 import { useNavigate, useParams } from 'react-router-dom'
-import { listLessons, listLanguages } from '../api'
+import { listLessons, listLanguages, variantSrcSet } from '../api'
 import { t } from '../i18n'
 
-type Language = { id: string; name: string; image_url?: string }
+type Language = { id: string; name: string; image_url?: string; image_variants?: Record<string, string> }
 
 export default function Lessons() {
   const { language } = useParams()
@@ -42,6 +42,8 @@ export default function Lessons() {
           {langInfo?.image_url ? (
             <img 
               src={langInfo.image_url} 
+              srcSet={variantSrcSet(langInfo.image_variants)}
+              sizes="50px"
               alt={langInfo.name}
               style={{ 
                 width: '50px', 
@@ -10,6 +10,15 @@ type Participant = {
   user_id: number
 }
 
+type Room = {
+  id: number
+  name: string
+  join_code: string | null
+  game_time: number
+  difficulty: number
+  is_active: boolean
+}
+
 type Submission = {
   id: number
   task_title: string
@@ -24,6 +33,9 @@ type Submission = {
 }
 
 export default function AdminCompetitionRoom() {
+  const [rooms, setRooms] = useState<Room[]>([])
+  const [roomId, setRoomId] = useState<number | null>(null)
+  const [newRoomName, setNewRoomName] = useState('')
   const [participants, setParticipants] = useState<Participant[]>([])
   const [gameStarted, setGameStarted] = useState(false)
   const [gameTime, setGameTime] = useState(60)
@@ -34,13 +46,59 @@ export default function AdminCompetitionRoom() {
   const [userSubmissions, setUserSubmissions] = useState<Submission[]>([])
 
   useEffect(() => {
+    loadRooms()
+  }, [])
+
+  useEffect(() => {
+    if (roomId === null) return
     loadRoomData()
     loadParticipants()
-  }, [])
+  }, [roomId])
+
+  const loadRooms = async () => {
+    try {
+      const res = await axios.get('/api/admin/competition/rooms', { headers: adminHeaders() })
+      setRooms(res.data)
+      if (roomId === null && res.data.length > 0) setRoomId(res.data[0].id)
+    } catch (error) {
+      console.error('Failed to load rooms:', error)
+    }
+  }
+
+  const createRoom = async () => {
+    try {
+      const res = await axios.post('/api/admin/competition/rooms', {
+        name: newRoomName || 'Typing Competition',
+        game_time: gameTime,
+        difficulty: difficulty
+      }, { headers: adminHeaders() })
+      setNewRoomName('')
+      setRooms([res.data, ...rooms])
+      setRoomId(res.data.id)
+    } catch (error) {
+      console.error('Failed to create room:', error)
+      alert('Ошибка при создании комнаты')
+    }
+  }
+
+  const deleteRoom = async () => {
+    if (roomId === null || !confirm('Удалить комнату?')) return
+    try {
+      await axios.delete(`/api/admin/competition/rooms/${roomId}`, { headers: adminHeaders() })
+      const rest = rooms.filter(r => r.id !== roomId)
+      setRooms(rest)
+      setRoomId(rest.length > 0 ? rest[0].id : null)
+      setParticipants([])
+      setRoomData(null)
+    } catch (error) {
+      console.error('Failed to delete room:', error)
+      alert('Ошибка при удалении комнаты')
+    }
+  }
 
   const loadRoomData = async () => {
     try {
-      const res = await axios.get('/api/admin/competition/room', { headers: adminHeaders() })
+      const res = await axios.get(`/api/admin/competition/rooms/${roomId}`, { headers: adminHeaders() })
       setRoomData(res.data)
       setGameTime(res.data.game_time)
       setDifficulty(res.data.difficulty)
@@ -52,7 +110,7 @@ export default function AdminCompetitionRoom() {
 
   const loadParticipants = async () => {
     try {
-      const res = await axios.get('/api/admin/competition/participants', { headers: adminHeaders() })
+      const res = await axios.get(`/api/admin/competition/rooms/${roomId}/participants`, { headers: adminHeaders() })
       setParticipants(res.data)
     } catch (error) {
       console.error('Failed to load participants:', error)
@@ -84,12 +142,12 @@ export default function AdminCompetitionRoom() {
 
   const startGame = async () => {
     try {
-      await axios.put('/api/admin/competition/room', {
+      await axios.put(`/api/admin/competition/rooms/${roomId}`, {
         game_time: gameTime,
         difficulty: difficulty,
         is_active: true
       }, { headers: adminHeaders() })
-      await axios.post('/api/admin/competition/start', {}, { headers: adminHeaders() })
+      await axios.post(`/api/admin/competition/rooms/${roomId}/start`, {}, { headers: adminHeaders() })
       setGameStarted(true)
       setTimeLeft(gameTime)
       loadParticipants()
@@ -101,7 +159,7 @@ export default function AdminCompetitionRoom() {
 
   const stopGame = async () => {
     try {
-      await axios.post('/api/admin/competition/stop', {}, { headers: adminHeaders() })
+      await axios.post(`/api/admin/competition/rooms/${roomId}/stop`, {}, { headers: adminHeaders() })
       setGameStarted(false)
       loadParticipants()
     } catch (error) {
@@ -117,9 +175,40 @@ export default function AdminCompetitionRoom() {
 
   return (
     <div>
-      <h3>Комната соревнований (Админ)</h3>
+      <h3>Комнаты соревнований (Админ)</h3>
+
+      <div style={{ display: 'flex', gap: 10, alignItems: 'center', marginBottom: 20, flexWrap: 'wrap' }}>
+        <select
+          value={roomId ?? ''}
+          onChange={(e) => setRoomId(e.target.value ? Number(e.target.value) : null)}
+        >
+          {rooms.length === 0 && <option value="">Нет комнат</option>}
+          {rooms.map(r => (
+            <option key={r.id} value={r.id}>
+              {r.name} ({r.join_code}){r.is_active ? ' — идет игра' : ''}
+            </option>
+          ))}
+        </select>
+        <input
+          value={newRoomName}
+          onChange={(e) => setNewRoomName(e.target.value)}
+          placeholder="Название новой комнаты"
+        />
+        <button className="btn" onClick={createRoom}>
+          Создать комнату
+        </button>
+        {roomId !== null && (
+          <button className="btn" onClick={deleteRoom}>
+            Удалить комнату
+          </button>
+        )}
+      </div>
+
+      {roomData && (
+        <p>Код для входа: <strong style={{ fontSize: 20, letterSpacing: 2 }}>{roomData.join_code}</strong></p>
+      )}
 
-      {!gameStarted ? (
+      {roomId === null ? null : !gameStarted ? (
         <div style={{ marginBottom: 20 }}>
           <h4>Настройки игры</h4>
           <div style={{ display: 'flex', gap: 20, alignItems: 'center', marginBottom: 16 }}>
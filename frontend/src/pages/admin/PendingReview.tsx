@@ -1,37 +1,118 @@
-import { useEffect, useState } from 'react'
+import { useEffect, useRef, useState } from 'react'
 import axios from 'axios'
-import { adminHeaders } from '../../api'
+import { adminHeaders, followSubmissionChanges } from '../../api'
 
 type PendingSubmission = {
   id: number
   user_name: string
   lesson_title: string
   task_title: string
+  created_at: string
+  age_seconds: number
+}
+
+type SubmissionDetail = PendingSubmission & {
   task_description: string
   code: string
+}
+
+type SimilarSubmission = {
+  id: number
+  user_name: string
+  status: string
+  similarity: number
   created_at: string
 }
 
 export default function PendingReview() {
   const [submissions, setSubmissions] = useState<PendingSubmission[]>([])
-  const [selectedSubmission, setSelectedSubmission] = useState<PendingSubmission | null>(null)
+  const [total, setTotal] = useState(0)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [selectedSubmission, setSelectedSubmission] = useState<SubmissionDetail | null>(null)
   const [comment, setComment] = useState('')
   const [loading, setLoading] = useState(false)
   const [copiedCode, setCopiedCode] = useState(false)
+  const [similar, setSimilar] = useState<SimilarSubmission[]>([])
+  const nextCursorRef = useRef<string | null>(null)
+  nextCursorRef.current = nextCursor
 
   useEffect(() => {
-    loadPendingSubmissions()
+    let stopFollowing: (() => void) | undefined
+    let cancelled = false
+    loadPendingSubmissions().then(syncCursor => {
+      if (!cancelled && syncCursor !== undefined) stopFollowing = followSubmissionChanges(syncCursor, applyChanges)
+    })
+    return () => {
+      cancelled = true
+      if (stopFollowing) stopFollowing()
+    }
   }, [])
 
-  async function loadPendingSubmissions() {
+  // Merge rows from the change feed instead of reloading the queue
+  function applyChanges(rows: any[], pendingTotal: number) {
+    const now = Date.now()
+    setSubmissions(prev => {
+      const changed = new Map(rows.map(row => [row.id, row]))
+      const kept = prev.filter(s => !changed.has(s.id) || changed.get(s.id).status === 'pending')
+      const known = new Set(kept.map(s => s.id))
+      // New items sort last; only append them once the loaded list reaches the end of the queue
+      const added = nextCursorRef.current === null
+        ? rows
+            .filter(row => row.status === 'pending' && !known.has(row.id))
+            .map(row => ({
+              id: row.id,
+              user_name: row.user_name,
+              lesson_title: row.lesson_title,
+              task_title: row.task_title,
+              created_at: row.created_at,
+              age_seconds: Math.max(0, Math.floor((now - new Date(row.created_at + 'Z').getTime()) / 1000))
+            }))
+        : []
+      return [...kept, ...added]
+    })
+    setTotal(pendingTotal)
+  }
+
+  async function loadPendingSubmissions(cursor?: string) {
     try {
-      const res = await axios.get('/api/admin/submissions/pending', { headers: adminHeaders() })
-      setSubmissions(res.data)
+      const res = await axios.get('/api/admin/submissions/pending', {
+        headers: adminHeaders(),
+        params: cursor ? { cursor } : {}
+      })
+      setSubmissions(prev => {
+        if (!cursor) return res.data.data
+        // Skip rows the change feed already appended
+        const known = new Set(prev.map(s => s.id))
+        return [...prev, ...res.data.data.filter((s: PendingSubmission) => !known.has(s.id))]
+      })
+      setTotal(res.data.total)
+      setNextCursor(res.data.next_cursor)
+      return res.data.sync_cursor as number
     } catch (error) {
       console.error('Failed to load pending submissions:', error)
     }
   }
 
+  async function openSubmission(submissionId: number) {
+    try {
+      const res = await axios.get(`/api/admin/submissions/${submissionId}`, { headers: adminHeaders() })
+      setSelectedSubmission(res.data)
+      setSimilar([])
+      loadSimilar(submissionId)
+    } catch (error) {
+      console.error('Failed to load submission:', error)
+    }
+  }
+
+  async function loadSimilar(submissionId: number) {
+    try {
+      const res = await axios.get(`/api/admin/submissions/${submissionId}/similar`, { headers: adminHeaders() })
+      setSimilar(res.data.data)
+    } catch (error) {
+      console.error('Failed to load similar submissions:', error)
+    }
+  }
+
   async function reviewSubmission(submissionId: number, isCorrect: boolean) {
     setLoading(true)
     try {
@@ -42,6 +123,7 @@ export default function PendingReview() {
       
       // Remove reviewed submission from list
       setSubmissions(prev => prev.filter(s => s.id !== submissionId))
+      setTotal(prev => Math.max(0, prev - 1))
       setSelectedSubmission(null)
       setComment('')
     } catch (error) {
@@ -148,6 +230,26 @@ export default function PendingReview() {
               {selectedSubmission.code}
             </pre>
           </div>
+
+          {similar.length > 0 && (
+            <div style={{ marginTop: '20px' }}>
+              <h4>Похожие решения других студентов:</h4>
+              {similar.map(s => (
+                <div key={s.id} style={{ display: 'flex', alignItems: 'center', gap: '10px', marginBottom: '6px' }}>
+                  <span style={{ color: s.similarity >= 0.9 ? '#dc3545' : '#fd7e14', fontWeight: 'bold', minWidth: '48px' }}>
+                    {Math.round(s.similarity * 100)}%
+                  </span>
+                  <span>{s.user_name}</span>
+                  <span style={{ color: '#6c757d' }}>
+                    {s.status === 'pending' ? 'ожидает проверки' : 'проверено'} · {new Date(s.created_at + 'Z').toLocaleString('ru-RU')}
+                  </span>
+                  <button className="btn" onClick={() => openSubmission(s.id)} style={{ padding: '4px 10px' }}>
+                    Открыть
+                  </button>
+                </div>
+              ))}
+            </div>
+          )}
           
           <div style={{ marginTop: '20px' }}>
             <label>
@@ -188,7 +290,7 @@ export default function PendingReview() {
 
   return (
     <div>
-      <h3>Ожидают проверки ({submissions.length})</h3>
+      <h3>Ожидают проверки ({total})</h3>
 
       {submissions.length === 0 ? (
         <p>Нет решений, ожидающих проверки</p>
@@ -298,7 +400,7 @@ export default function PendingReview() {
                   }}>
                     <button
                       className="btn"
-                      onClick={() => setSelectedSubmission(submission)}
+                      onClick={() => openSubmission(submission.id)}
                       style={{
                         backgroundColor: '#007bff',
                         color: 'white',
@@ -316,6 +418,13 @@ export default function PendingReview() {
               ))}
             </tbody>
           </table>
+          {nextCursor && (
+            <div style={{ padding: '12px 16px' }}>
+              <button className="btn" onClick={() => loadPendingSubmissions(nextCursor)}>
+                Загрузить ещё
+              </button>
+            </div>
+          )}
         </div>
       )}
     </div>
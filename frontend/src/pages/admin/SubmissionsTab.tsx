@@ -1,6 +1,6 @@
-import { useEffect, useState } from 'react'
+import { useEffect, useRef, useState } from 'react'
 import axios from 'axios'
-import { adminHeaders, getTask } from '../../api'
+import { adminHeaders, followSubmissionChanges, getTask } from '../../api'
 import { useNavigate } from 'react-router-dom'
 
 type Submission = {
@@ -30,13 +30,46 @@ export default function SubmissionsTab() {
   const [copiedCode, setCopiedCode] = useState(false)
   const navigate = useNavigate()
 
-  useEffect(() => { refresh() }, [page])
+  const submissionsRef = useRef(submissions)
+  submissionsRef.current = submissions
+  // Highest submission id that existed when the page was loaded (or seen since)
+  const maxIdRef = useRef(0)
+
+  useEffect(() => {
+    let stopFollowing: (() => void) | undefined
+    let cancelled = false
+    refresh().then(syncCursor => {
+      if (!cancelled) stopFollowing = followSubmissionChanges(syncCursor, applyChanges)
+    })
+    return () => {
+      cancelled = true
+      if (stopFollowing) stopFollowing()
+    }
+  }, [page])
 
   async function refresh() {
     const res = await axios.get('/api/admin/submissions', { headers: adminHeaders(), params: { page, page_size: pageSize } })
     setSubmissions(res.data.data)
     setTotal(res.data.total)
     setPageSize(res.data.page_size)
+    maxIdRef.current = res.data.max_id
+    return res.data.sync_cursor as number
+  }
+
+  // Update rows in place from the change feed; brand-new submissions go on top of the first page
+  function applyChanges(rows: Submission[]) {
+    const prev = submissionsRef.current
+    const changed = new Map(rows.map(row => [row.id, row]))
+    const updated = prev.map(s => changed.get(s.id) ?? s)
+    // New means inserted after the load, judged against the global high-water id: on later
+    // pages a review of an existing, newer submission must not count as a new one
+    const shown = new Set(prev.map(s => s.id))
+    const fresh = rows.filter(row => row.id > maxIdRef.current && !shown.has(row.id)).sort((a, b) => b.id - a.id)
+    maxIdRef.current = rows.reduce((max, row) => Math.max(max, row.id), maxIdRef.current)
+    if (fresh.length > 0) setTotal(t => (t ?? 0) + fresh.length)
+    const next = page === 1 && fresh.length > 0 ? [...fresh, ...updated].slice(0, pageSize) : updated
+    submissionsRef.current = next
+    setSubmissions(next)
   }
 
   function onUserClick(userName: string) {